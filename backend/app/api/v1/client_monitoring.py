@@ -1,18 +1,24 @@
 # backend/app/api/v1/client_monitoring.py
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Query, Header
+from sse_starlette.sse import EventSourceResponse
+from typing import List, Literal, Optional, Dict, Any, Tuple
 from datetime import datetime
 from pydantic import BaseModel
+import base64
+import json
 import logging
 
-from ...core.database import supabase_client
-from ...services.client_monitoring_service import ClientMonitoringService
-from ...services.telegram_service import telegram_service
+from ...core.config import settings
+from ...core.database import supabase_client, db_execute
+from ...services.container import services
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Режимы сопоставления ключевых слов (см. services.keyword_matcher)
+KeywordMatchMode = Literal['substring', 'stem']
+
 # Pydantic модели для валидации
 class ProductTemplateCreate(BaseModel):
     name: str
@@ -20,6 +26,8 @@ class ProductTemplateCreate(BaseModel):
     monitored_chats: Optional[List[str]] = []
     check_interval_minutes: Optional[int] = 5
     lookback_minutes: Optional[int] = 60
+    match_mode: Optional[KeywordMatchMode] = None  # None - глобальная настройка KEYWORD_MATCH_MODE
+    max_check_interval_minutes: Optional[int] = None  # None - глобальная настройка CHAT_POLL_MAX_INTERVAL_MINUTES
     ai_prompt: str
 
 class ProductTemplateUpdate(BaseModel):
@@ -28,6 +36,8 @@ class ProductTemplateUpdate(BaseModel):
     monitored_chats: Optional[List[str]] = None
     check_interval_minutes: Optional[int] = None
     lookback_minutes: Optional[int] = None
+    match_mode: Optional[KeywordMatchMode] = None  # Явный null - вернуть глобальную настройку
+    max_check_interval_minutes: Optional[int] = None  # Явный null - вернуть глобальную настройку
     ai_prompt: Optional[str] = None
     is_active: Optional[bool] = None
 
@@ -38,11 +48,24 @@ class MonitoringSettingsUpdate(BaseModel):
 class ClientStatusUpdate(BaseModel):
     status: str  # 'new', 'contacted', 'ignored', 'converted'
 
-# Инициализируем сервис мониторинга
-monitoring_service = ClientMonitoringService()
-
 # ==================== PRODUCT TEMPLATES ====================
 
+def _split_conversion_results(conversion_results: Dict[str, Optional[str]]):
+    """chat_ids без повторов (разные ссылки на один чат) и ссылки, которые не удалось найти"""
+    chat_ids = []
+    conversion_errors = []
+    
+    for link, chat_id in conversion_results.items():
+        if chat_id:
+            if chat_id not in chat_ids:
+                chat_ids.append(chat_id)
+            logger.info(f"✅ Converted {link} -> {chat_id}")
+        else:
+            conversion_errors.append(link)
+            logger.warning(f"❌ Failed to convert {link}")
+    
+    return chat_ids, conversion_errors
+
 @router.post("/product-templates")
 async def create_product_template(template: ProductTemplateCreate, user_id: int = 1):
     """Создать новый шаблон продукта с конвертацией ссылок"""
@@ -57,22 +80,18 @@ async def create_product_template(template: ProductTemplateCreate, user_id: int
         # === НОВОЕ: Конвертация ссылок в chat_ids ===
         chat_ids = []
         conversion_errors = []
+        conversion_results = {}
+        pending_links = []
         
         if template.monitored_chats:
             logger.info(f"Converting {len(template.monitored_chats)} chat links to IDs...")
             
-            conversion_results = await telegram_service.resolve_multiple_chat_links(template.monitored_chats)
-            
-            for link, chat_id in conversion_results.items():
-                if chat_id:
-                    chat_ids.append(chat_id)
-                    logger.info(f"✅ Converted {link} -> {chat_id}")
-                else:
-                    conversion_errors.append(link)
-                    logger.warning(f"❌ Failed to convert {link}")
+            # Большой список без кэша резолвится в фоне после создания шаблона
+            conversion_results, pending_links = await services.link_resolver.resolve(template.monitored_chats)
+            chat_ids, conversion_errors = _split_conversion_results(conversion_results)
         
         # Создаем запись с обеими версиями данных
-        result = supabase_client.table('product_templates').insert({
+        result = await db_execute(supabase_client.table('product_templates').insert({
             'user_id': user_id,
             'name': template.name,
             'keywords': template.keywords,
@@ -80,11 +99,13 @@ async def create_product_template(template: ProductTemplateCreate, user_id: int
             'chat_ids': chat_ids,  # Конвертированные ID
             'check_interval_minutes': template.check_interval_minutes,
             'lookback_minutes': template.lookback_minutes,
+            'match_mode': template.match_mode,
+            'max_check_interval_minutes': template.max_check_interval_minutes,
             'ai_prompt': template.ai_prompt,
             'is_active': True,
             'created_at': datetime.now().isoformat(),
             'updated_at': datetime.now().isoformat()
-        }).execute()
+        }))
         
         if result.data:
             response_data = result.data[0]
@@ -96,7 +117,13 @@ async def create_product_template(template: ProductTemplateCreate, user_id: int
                     'message': f'Не удалось найти {len(conversion_errors)} чат(ов). Проверьте ссылки.'
                 }
             
+            if pending_links:
+                response_data['resolution_job'] = services.link_resolver.start_job(
+                    response_data['id'], user_id, template.monitored_chats, conversion_results, pending_links
+                )
+            
             logger.info(f"Created product template: {template.name} with {len(chat_ids)} converted chats")
+            services.scheduler.notify_settings_changed(user_id)
             return {"status": "success", "data": response_data}
         else:
             raise HTTPException(status_code=400, detail="Failed to create template")
@@ -109,7 +136,7 @@ async def create_product_template(template: ProductTemplateCreate, user_id: int
 async def get_product_templates(user_id: int = 1):
     """Получить все шаблоны продуктов пользователя"""
     try:
-        result = supabase_client.table('product_templates').select('*').eq('user_id', user_id).order('created_at', desc=True).execute()
+        result = await db_execute(supabase_client.table('product_templates').select('*').eq('user_id', user_id).order('created_at', desc=True))
         
         return {"status": "success", "data": result.data}
         
@@ -127,20 +154,20 @@ async def update_product_template(template_id: int, template: ProductTemplateUpd
         }
         
         conversion_errors = []
+        conversion_results = {}
+        pending_links = []
         
         # Если обновляются чаты - конвертируем их
         if template.monitored_chats is not None:
             logger.info(f"Converting {len(template.monitored_chats)} chat links for update...")
             
+            # Старый фоновый резолв перезаписал бы chat_ids по прежним ссылкам
+            services.link_resolver.cancel_job(template_id)
+            
             chat_ids = []
             if template.monitored_chats:
-                conversion_results = await telegram_service.resolve_multiple_chat_links(template.monitored_chats)
-                
-                for link, chat_id in conversion_results.items():
-                    if chat_id:
-                        chat_ids.append(chat_id)
-                    else:
-                        conversion_errors.append(link)
+                conversion_results, pending_links = await services.link_resolver.resolve(template.monitored_chats)
+                chat_ids, conversion_errors = _split_conversion_results(conversion_results)
             
             update_data['monitored_chats'] = template.monitored_chats
             update_data['chat_ids'] = chat_ids
@@ -156,6 +183,10 @@ async def update_product_template(template_id: int, template: ProductTemplateUpd
             update_data['check_interval_minutes'] = template.check_interval_minutes
         if template.lookback_minutes is not None:
             update_data['lookback_minutes'] = template.lookback_minutes
+        if 'match_mode' in template.model_fields_set:
+            update_data['match_mode'] = template.match_mode
+        if 'max_check_interval_minutes' in template.model_fields_set:
+            update_data['max_check_interval_minutes'] = template.max_check_interval_minutes
         if template.ai_prompt is not None:
             if not template.ai_prompt.strip():
                 raise HTTPException(status_code=400, detail="AI prompt cannot be empty")
@@ -164,7 +195,7 @@ async def update_product_template(template_id: int, template: ProductTemplateUpd
             update_data['is_active'] = template.is_active
         
         # Выполняем обновление
-        result = supabase_client.table('product_templates').update(update_data).eq('id', template_id).eq('user_id', user_id).execute()
+        result = await db_execute(supabase_client.table('product_templates').update(update_data).eq('id', template_id).eq('user_id', user_id))
         
         if result.data:
             response_data = result.data[0]
@@ -175,7 +206,13 @@ async def update_product_template(template_id: int, template: ProductTemplateUpd
                     'message': f'Не удалось найти {len(conversion_errors)} чат(ов). Проверьте ссылки.'
                 }
             
+            if pending_links:
+                response_data['resolution_job'] = services.link_resolver.start_job(
+                    template_id, user_id, template.monitored_chats, conversion_results, pending_links
+                )
+            
             logger.info(f"Updated product template {template_id}")
+            services.scheduler.notify_settings_changed(user_id)
             return {"status": "success", "data": response_data}
         else:
             raise HTTPException(status_code=404, detail="Template not found")
@@ -189,10 +226,12 @@ async def update_product_template(template_id: int, template: ProductTemplateUpd
 async def delete_product_template(template_id: int, user_id: int = 1):
     """Удалить шаблон продукта"""
     try:
-        result = supabase_client.table('product_templates').delete().eq('id', template_id).eq('user_id', user_id).execute()
+        result = await db_execute(supabase_client.table('product_templates').delete().eq('id', template_id).eq('user_id', user_id))
         
         if result.data:
+            services.link_resolver.cancel_job(template_id)
             logger.info(f"Deleted product template {template_id}")
+            services.scheduler.notify_settings_changed(user_id)
             return {"status": "success", "message": "Template deleted"}
         else:
             raise HTTPException(status_code=404, detail="Template not found")
@@ -201,13 +240,28 @@ async def delete_product_template(template_id: int, user_id: int = 1):
         logger.error(f"Error deleting product template: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/product-templates/{template_id}/resolution")
+async def get_template_resolution_status(template_id: int):
+    """Состояние фонового резолва ссылок шаблона"""
+    try:
+        job = services.link_resolver.get_job(template_id)
+        
+        return {
+            "status": "success",
+            "data": job or {'template_id': template_id, 'status': 'idle'}
+        }
+        
+    except Exception as e:
+        logger.error(f"Error fetching resolution status: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ==================== MONITORING SETTINGS ====================
 
 @router.get("/monitoring/settings")
 async def get_monitoring_settings(user_id: int = 1):
     """Получить настройки мониторинга пользователя"""
     try:
-        result = supabase_client.table('monitoring_settings').select('*').eq('user_id', user_id).execute()
+        result = await db_execute(supabase_client.table('monitoring_settings').select('*').eq('user_id', user_id))
         
         if result.data:
             return {"status": "success", "data": result.data[0]}
@@ -221,7 +275,7 @@ async def get_monitoring_settings(user_id: int = 1):
                 'updated_at': datetime.now().isoformat()
             }
             
-            create_result = supabase_client.table('monitoring_settings').insert(default_settings).execute()
+            create_result = await db_execute(supabase_client.table('monitoring_settings').insert(default_settings))
             return {"status": "success", "data": create_result.data[0]}
             
     except Exception as e:
@@ -266,10 +320,11 @@ async def update_monitoring_settings(settings: MonitoringSettingsUpdate, user_id
             update_data['is_active'] = settings.is_active
         
         # Обновляем или создаем настройки
-        result = supabase_client.table('monitoring_settings').update(update_data).eq('user_id', user_id).execute()
+        result = await db_execute(supabase_client.table('monitoring_settings').update(update_data).eq('user_id', user_id))
         
         if result.data:
             logger.info(f"Updated monitoring settings for user {user_id}")
+            services.scheduler.notify_settings_changed(user_id)
             return {"status": "success", "data": result.data[0]}
         else:
             raise HTTPException(status_code=404, detail="Settings not found")
@@ -285,7 +340,7 @@ async def start_monitoring(user_id: int = 1):
     """Запустить мониторинг для пользователя"""
     try:
         # ИСПРАВЛЕНО: Только включаем глобальный мониторинг
-        # Планировщик автоматически подхватит изменения
+        # Планировщик подхватит изменения сразу (update_monitoring_settings его будит)
         await update_monitoring_settings(MonitoringSettingsUpdate(is_active=True), user_id)
         
         logger.info(f"Started global monitoring for user {user_id}")
@@ -311,28 +366,126 @@ async def stop_monitoring(user_id: int = 1):
     
 # ==================== POTENTIAL CLIENTS ====================
 
+# Колонки для списков: без полного текста сообщения и объяснения ИИ
+POTENTIAL_CLIENT_LIST_FIELDS = (
+    'id,user_id,author_id,author_username,chat_id,chat_name,message_id,'
+    'product_template_id,template_name,matched_keywords,client_status,notification_send,duplicate_count,created_at'
+)
+
+def _encode_clients_cursor(row: Dict[str, Any]) -> str:
+    """Курсор страницы: (created_at, id) последней строки"""
+    raw = json.dumps([row['created_at'], row['id']])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode_clients_cursor(cursor: str) -> Tuple[str, int]:
+    padded = cursor + '=' * (-len(cursor) % 4)
+    created_at, client_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    # Значение попадает в фильтр PostgREST - принимаем только корректную дату
+    return datetime.fromisoformat(created_at).isoformat(), int(client_id)
+
 @router.get("/potential-clients")
 async def get_potential_clients(
     user_id: int = 1,
     status: Optional[str] = None,
-    limit: int = 50,
-    offset: int = 0
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Literal['full', 'list'] = 'full',
+    template_id: Optional[int] = None,
+    chat_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
 ):
-    """Получить список найденных потенциальных клиентов"""
+    """
+    Получить список найденных потенциальных клиентов
+    
+    Keyset-пагинация по (created_at, id): следующая страница запрашивается
+    с next_cursor из ответа, и ее цена не зависит от глубины (offset оставлен
+    для совместимости). fields=list - без message_text и ai_explanation_text.
+    Фильтры по шаблону, чату и периоду [date_from, date_to) выполняются в БД.
+    
+    Индекс: potential_clients (user_id, created_at DESC, id DESC)
+    (migrations/006_potential_clients_keyset_index.sql)
+    """
+    try:
+        after = _decode_clients_cursor(cursor) if cursor else None
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
     try:
-        query = supabase_client.table('potential_clients').select('*').eq('user_id', user_id)
+        select = '*' if fields == 'full' else POTENTIAL_CLIENT_LIST_FIELDS
+        query = supabase_client.table('potential_clients').select(select).eq('user_id', user_id)
         
         if status:
             query = query.eq('client_status', status)
+        if template_id is not None:
+            query = query.eq('product_template_id', template_id)
+        if chat_id:
+            query = query.eq('chat_id', chat_id)
+        if date_from:
+            query = query.gte('created_at', date_from.isoformat())
+        if date_to:
+            query = query.lt('created_at', date_to.isoformat())
+        
+        if after:
+            created_at, last_id = after
+            query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{last_id})')
+        
+        query = query.order('created_at', desc=True).order('id', desc=True)
+        
+        # Лишняя строка показывает, есть ли следующая страница
+        if after or not offset:
+            query = query.limit(limit + 1)
+        else:
+            query = query.range(offset, offset + limit)
         
-        result = query.order('created_at', desc=True).range(offset, offset + limit - 1).execute()
+        result = await db_execute(query)
+        rows = result.data or []
         
-        return {"status": "success", "data": result.data}
+        next_cursor = _encode_clients_cursor(rows[limit - 1]) if len(rows) > limit else None
+        
+        return {"status": "success", "data": rows[:limit], "next_cursor": next_cursor}
         
     except Exception as e:
         logger.error(f"Error fetching potential clients: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/leads/stream")
+async def stream_leads(
+    user_id: int = 1,
+    last_event_id: Optional[int] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """
+    SSE-поток новых потенциальных клиентов (вместо опроса /potential-clients)
+    
+    event: lead - записанный клиент (id события - для Last-Event-ID),
+    event: resync - часть событий потеряна, список нужно перечитать.
+    При переподключении браузер сам присылает Last-Event-ID; при первом
+    подключении его можно передать параметром last_event_id.
+    """
+    if last_event_id_header and last_event_id_header.isdigit():
+        last_event_id = int(last_event_id_header)
+    
+    async def event_generator():
+        async with services.lead_events.subscribe(user_id, last_event_id) as subscription:
+            if subscription.gap:
+                # С id браузер не получит resync повторно при следующем переподключении
+                yield {"id": str(subscription.resync_id), "event": "resync", "data": "{}"}
+            
+            for event_id, row in subscription.replay:
+                yield {"id": str(event_id), "event": "lead", "data": json.dumps(row, ensure_ascii=False, default=str)}
+            
+            while True:
+                event = await subscription.next_event()
+                if event is None:
+                    # Подписчик отстал - закрываем поток, клиент переподключится и дочитает
+                    break
+                event_id, row = event
+                yield {"id": str(event_id), "event": "lead", "data": json.dumps(row, ensure_ascii=False, default=str)}
+    
+    return EventSourceResponse(event_generator(), ping=settings.LEAD_EVENTS_PING_SECONDS)
+
 @router.put("/potential-clients/{client_id}/status")
 async def update_client_status(client_id: int, status_update: ClientStatusUpdate, user_id: int = 1):
     """Обновить статус потенциального клиента"""
@@ -342,11 +495,12 @@ async def update_client_status(client_id: int, status_update: ClientStatusUpdate
         if status_update.status not in valid_statuses:
             raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
         
-        result = supabase_client.table('potential_clients').update({
+        result = await db_execute(supabase_client.table('potential_clients').update({
             'client_status': status_update.status
-        }).eq('id', client_id).eq('user_id', user_id).execute()
+        }).eq('id', client_id).eq('user_id', user_id))
         
         if result.data:
+            services.lead_stats.invalidate(user_id)
             logger.info(f"Updated client {client_id} status to {status_update.status}")
             return {"status": "success", "data": result.data[0]}
         else:
@@ -358,33 +512,146 @@ async def update_client_status(client_id: int, status_update: ClientStatusUpdate
 
 @router.get("/monitoring/stats")
 async def get_monitoring_stats(user_id: int = 1):
-    """Получить статистику мониторинга"""
+    """Получить статистику мониторинга (один агрегирующий запрос, короткий кэш)"""
     try:
-        # Общее количество найденных клиентов
-        total_result = supabase_client.table('potential_clients').select('id', count='exact').eq('user_id', user_id).execute()
-        total_clients = total_result.count or 0
-        
-        # Количество по статусам
-        status_stats = {}
-        for status in ['new', 'contacted', 'ignored', 'converted']:
-            status_result = supabase_client.table('potential_clients').select('id', count='exact').eq('user_id', user_id).eq('client_status', status).execute()
-            status_stats[status] = status_result.count or 0
-        
-        # Статистика за последние 7 дней
-        from datetime import datetime, timedelta
-        week_ago = (datetime.now() - timedelta(days=7)).isoformat()
-        week_result = supabase_client.table('potential_clients').select('id', count='exact').eq('user_id', user_id).gte('created_at', week_ago).execute()
-        clients_this_week = week_result.count or 0
-        
         return {
             "status": "success",
-            "data": {
-                "total_clients": total_clients,
-                "clients_this_week": clients_this_week,
-                "status_distribution": status_stats
-            }
+            "data": await services.lead_stats.get(user_id)
         }
         
     except Exception as e:
         logger.error(f"Error fetching monitoring stats: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/monitoring/match-stats")
+async def get_match_stats():
+    """Точность сопоставления ключевых слов по шаблонам (доля совпадений, подтвержденных AI)"""
+    try:
+        return {
+            "status": "success",
+            "data": services.monitoring_service.get_match_stats()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error fetching match stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/monitoring/verdict-cache-stats")
+async def get_verdict_cache_stats():
+    """Попадания в кэш вердиктов ИИ (каждое попадание - сэкономленный запрос в OpenAI)"""
+    try:
+        verdict_cache = services.monitoring_service.verdict_cache
+        return {
+            "status": "success",
+            "data": verdict_cache.stats() if verdict_cache else {"enabled": False}
+        }
+        
+    except Exception as e:
+        logger.error(f"Error fetching verdict cache stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/monitoring/near-duplicate-stats")
+async def get_near_duplicate_stats():
+    """Сколько почти-дубликатов отсечено до AI-анализа"""
+    try:
+        detector = services.monitoring_service.duplicate_detector
+        return {
+            "status": "success",
+            "data": detector.stats() if detector else {"enabled": False}
+        }
+        
+    except Exception as e:
+        logger.error(f"Error fetching near-duplicate stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/monitoring/chat-rates")
+async def get_chat_rates():
+    """Оценка потока сообщений по чатам и почему чат опрашивается с таким интервалом"""
+    try:
+        chat_rates = services.monitoring_service.chat_rates
+        return {
+            "status": "success",
+            "data": chat_rates.snapshot() if chat_rates else {"enabled": False}
+        }
+        
+    except Exception as e:
+        logger.error(f"Error fetching chat rates: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/monitoring/profile-cache-stats")
+async def get_profile_cache_stats():
+    """Попадания кэша профилей отправителей"""
+    try:
+        return {
+            "status": "success",
+            "data": services.monitoring_service.telegram_service.get_profile_cache_stats()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error fetching profile cache stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/monitoring/telegram-stats")
+async def get_telegram_stats():
+    """Аккаунты пула Telegram: здоровье, пауза FloodWait, очередь по приоритетам, счетчики методов"""
+    try:
+        return {
+            "status": "success",
+            "data": services.monitoring_service.telegram_pool.stats()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error fetching telegram stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/monitoring/scheduler-stats")
+async def get_scheduler_stats():
+    """Длительность циклов и задержка очереди по пользователям"""
+    try:
+        return {
+            "status": "success",
+            "data": services.scheduler.get_user_metrics()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error fetching scheduler stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/monitoring/lead-writer-stats")
+async def get_lead_writer_stats():
+    """Буфер записи клиентов: ожидают записи, записано, отброшено дублей, повторы"""
+    try:
+        return {
+            "status": "success",
+            "data": services.monitoring_service.lead_writer.stats()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error fetching lead writer stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/monitoring/notification-stats")
+async def get_notification_stats():
+    """Очередь уведомлений: ожидают отправки, отправлено, ошибки, дайджесты"""
+    try:
+        return {
+            "status": "success",
+            "data": services.monitoring_service.notifications.stats()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error fetching notification stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/monitoring/lead-stream-stats")
+async def get_lead_stream_stats():
+    """SSE-поток клиентов: подписчики и буферы событий по пользователям"""
+    try:
+        return {
+            "status": "success",
+            "data": services.lead_events.stats()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error fetching lead stream stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
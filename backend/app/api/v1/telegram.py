@@ -7,8 +7,9 @@ import logging
 import traceback
 from datetime import datetime
 
-from app.core.database import supabase_client
-from app.services.telegram_service import telegram_service
+from app.core.database import supabase_client, db_execute
+from app.services.container import services
+from app.services.telegram_governor import METHOD_READ
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -19,7 +20,7 @@ logger = logging.getLogger(__name__)
 async def get_telegram_groups():
     """Получить все Telegram группы"""
     try:
-        result = supabase_client.table('telegram_groups').select("*").execute()
+        result = await db_execute(supabase_client.table('telegram_groups').select("*"))
         return result.data
     except Exception as e:
         logger.error(f"Error getting telegram groups: {e}")
@@ -29,7 +30,7 @@ async def get_telegram_groups():
 async def get_telegram_group(group_id: str):
     """Получить детали конкретной группы"""
     try:
-        result = supabase_client.table('telegram_groups').select("*").eq('id', group_id).execute()
+        result = await db_execute(supabase_client.table('telegram_groups').select("*").eq('id', group_id))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Group not found")
@@ -45,14 +46,14 @@ async def get_telegram_group(group_id: str):
 async def get_group_messages(group_id: str):
     """Получить сообщения из группы"""
     try:
-        group = supabase_client.table('telegram_groups').select("*").eq('id', group_id).execute()
+        group = await db_execute(supabase_client.table('telegram_groups').select("*").eq('id', group_id))
         
         if not group.data:
             raise HTTPException(status_code=404, detail="Group not found")
             
         telegram_group_id = group.data[0]["group_id"]
         
-        messages = await telegram_service.get_group_messages(
+        messages = await services.telegram_service.get_group_messages(
             telegram_group_id, 
             limit=100,
             get_users=True
@@ -70,14 +71,14 @@ async def get_group_messages(group_id: str):
 async def get_group_moderators(group_id: str):
     """Получить модераторов группы"""
     try:
-        group = supabase_client.table('telegram_groups').select("*").eq('id', group_id).execute()
+        group = await db_execute(supabase_client.table('telegram_groups').select("*").eq('id', group_id))
         
         if not group.data:
             raise HTTPException(status_code=404, detail="Group not found")
             
         telegram_group_id = group.data[0]["group_id"]
         
-        moderators = await telegram_service.get_moderators(telegram_group_id)
+        moderators = await services.telegram_service.get_moderators(telegram_group_id)
         
         return moderators
         
@@ -93,7 +94,7 @@ async def get_group_moderators(group_id: str):
 async def test_message_retrieval_methods(group_id: str):
     """Тест различных методов получения сообщений"""
     try:
-        group = supabase_client.table('telegram_groups').select("*").eq('id', group_id).execute()
+        group = await db_execute(supabase_client.table('telegram_groups').select("*").eq('id', group_id))
         
         if not group.data:
             raise HTTPException(status_code=404, detail="Group not found")
@@ -107,8 +108,11 @@ async def test_message_retrieval_methods(group_id: str):
         
         # Тест 1: get_messages
         try:
-            entity = await telegram_service.get_entity(telegram_group_id)
-            messages_result = await telegram_service.client.get_messages(entity, limit=5)
+            entity = await services.telegram_service.get_entity(telegram_group_id)
+            messages_result = await services.telegram_service.execute_telegram_operation(
+                lambda: services.telegram_service.client.get_messages(entity, limit=5),
+                method=METHOD_READ
+            )
             
             results["methods_tested"]["get_messages"] = {
                 "status": "success",
@@ -123,12 +127,17 @@ async def test_message_retrieval_methods(group_id: str):
         
         # Тест 2: iter_messages
         try:
-            entity = await telegram_service.get_entity(telegram_group_id)
-            count = 0
-            async for message in telegram_service.client.iter_messages(entity, limit=5):
-                count += 1
-                if count >= 5:
-                    break
+            entity = await services.telegram_service.get_entity(telegram_group_id)
+            
+            async def iterate():
+                count = 0
+                async for message in services.telegram_service.client.iter_messages(entity, limit=5):
+                    count += 1
+                    if count >= 5:
+                        break
+                return count
+            
+            count = await services.telegram_service.execute_telegram_operation(iterate, method=METHOD_READ)
                     
             results["methods_tested"]["iter_messages"] = {
                 "status": "success",
@@ -15,14 +15,46 @@ class Settings(BaseSettings):
     # Supabase
     SUPABASE_URL: str = "https://ujtenbbwwdxclabytfws.supabase.co"
     SUPABASE_KEY: str
+    DB_MAX_WORKERS: int = 10  # Потоков для запросов к Supabase (не блокируют event loop)
     
     # Telegram
     TELEGRAM_API_ID: int
     TELEGRAM_API_HASH: str
     TELEGRAM_SESSION_STRING: Optional[str] = None
+    TELEGRAM_SESSION_STRINGS: Optional[str] = None  # Дополнительные аккаунты для чтения чатов (через запятую)
+    TELEGRAM_ACCOUNT_RETRY_SECONDS: int = 600  # Через сколько вернуть в ротацию аккаунт без авторизации или со сбоями
+    PEER_CACHE_ENABLED: bool = True  # Кэш chat_id/username -> input peer (без повторного резолва)
+    PEER_CACHE_PATH: str = "cache/telegram_peers.sqlite3"
+    PEER_CACHE_TTL_HOURS: int = 24  # После TTL запись обновляется запросом по id
+    PEER_CACHE_MEMORY_SIZE: int = 10000
+    PROFILE_CACHE_SIZE: int = 20000  # Профили отправителей, общие для всех чатов и циклов
+    PROFILE_CACHE_TTL_MINUTES: int = 60
+    TELEGRAM_MAX_CONCURRENT_REQUESTS: int = 3  # Одновременных запросов на аккаунт
+    TELEGRAM_READ_RPM: int = 60  # GetHistory
+    TELEGRAM_RESOLVE_RPM: int = 10  # ResolveUsername - основной источник FloodWait
+    TELEGRAM_ENTITY_RPM: int = 60  # GetChannels / GetUsers по id
+    TELEGRAM_SEND_RPM: int = 20  # Личные сообщения (уведомления)
+    TELEGRAM_DEFAULT_RPM: int = 30  # Остальные методы
+    TELEGRAM_FLOOD_MAX_RETRIES: int = 2  # Повторов запроса после FloodWait
+    TELEGRAM_FLOOD_MAX_WAIT_SECONDS: int = 600  # Более долгий FloodWait не пережидаем - запрос падает
+    CHAT_RESOLVE_SYNC_LIMIT: int = 10  # Больше ссылок без кэша - резолв фоновой задачей
+    CHAT_RESOLVE_FLUSH_EVERY: int = 10  # Фоновый резолв сохраняет chat_ids шаблона каждые N ссылок
     
     # OpenAI
     OPENAI_API_KEY: str
+    AI_WORKER_COUNT: int = 4  # Параллельных AI-запросов в стадии анализа
+    OPENAI_RPM_LIMIT: int = 500  # Квота запросов в минуту
+    OPENAI_TPM_LIMIT: int = 60000  # Квота токенов в минуту
+    OPENAI_BATCH_SIZE: int = 10  # Сообщений шаблона в одном запросе классификации (1 - без пакетов)
+    AI_MAX_RETRIES: int = 3  # Повторов запроса после лимита или сбоя OpenAI (каждый - через AI-пул)
+    AI_RETRY_BASE_SECONDS: float = 10.0  # Пауза перед повтором: 10, 20, 40... сек
+    AI_DEFERRED_MAX_CYCLES: int = 5  # Циклов мониторинга, в которых повторяется кандидат, оставшийся без вердикта AI
+    AI_DEFERRED_QUEUE_SIZE: int = 1000  # Кандидатов без вердикта AI, ждущих следующего цикла (на пользователя)
+    AI_VERDICT_CACHE_ENABLED: bool = True  # Кэш вердиктов по содержимому сообщения
+    AI_VERDICT_CACHE_PATH: str = "cache/ai_verdicts.sqlite3"
+    AI_VERDICT_CACHE_TTL_HOURS: int = 24 * 7
+    AI_VERDICT_CACHE_MEMORY_SIZE: int = 5000  # Записей в in-memory LRU
+    AI_VERDICT_CACHE_MAX_ROWS: int = 200000  # Строк в SQLite
     
     # Logging Configuration
     LOG_LEVEL: str = "INFO"  # DEBUG, INFO, WARNING, ERROR
@@ -34,6 +66,34 @@ class Settings(BaseSettings):
     ENABLE_DEBUG_LOGGING: bool = False  # Детальное логирование для разработки
     LOG_MESSAGE_CONTENT: bool = False   # Логировать содержимое сообщений (только для DEBUG)
     
+    # Monitoring
+    SCHEDULER_MAX_CONCURRENT_USERS: int = 5  # Сколько пользователей мониторится одновременно
+    SCHEDULER_RESYNC_SECONDS: int = 300  # Полная сверка расписания с monitoring_settings (изменения через API будят сразу)
+    SCHEDULER_MAX_LOOKBACK_MINUTES: int = 24 * 60  # Предел окна чтения шаблона после долгого перерыва
+    ADAPTIVE_POLLING_ENABLED: bool = True  # Тихие чаты опрашиваются реже шаблона, активные - на каждом запуске
+    CHAT_RATE_HALF_LIFE_MINUTES: float = 60.0  # Период полураспада сглаженной оценки потока сообщений чата
+    CHAT_POLL_TARGET_MESSAGES: int = 20  # Сколько новых сообщений в среднем должно приходить за опрос
+    CHAT_POLL_MAX_INTERVAL_MINUTES: float = 60.0  # Максимальный интервал опроса тихого чата (шаблон может задать max_check_interval_minutes)
+    ENABLE_REALTIME_MONITORING: bool = False  # Push-обработка через events.NewMessage, polling остается догоняющим
+    REALTIME_CATCHUP_INTERVAL_MINUTES: float = 30.0  # Интервал догоняющего опроса чатов, по которым приходят push-события
+    PROCESSED_MESSAGES_CACHE_SIZE: int = 10000  # Сколько (шаблон, чат, сообщение) помнить для дедупликации
+    KEYWORD_MATCH_MODE: str = "substring"  # substring | stem (по основам слов, шаблон может переопределить полем match_mode)
+    KEYWORD_SHADOW_MATCHING: bool = True  # Считать, что совпало бы во втором режиме (для сравнения точности режимов)
+    NEAR_DUPLICATE_ENABLED: bool = True  # Отсекать слегка измененные копии сообщений до AI-анализа
+    NEAR_DUPLICATE_MAX_DISTANCE: int = 3  # Порог расстояния Хэмминга между 64-битными SimHash
+    NEAR_DUPLICATE_WINDOW: int = 2000  # Сколько последних сообщений помнить на шаблон (все авторы)
+    NEAR_DUPLICATE_MIN_TOKENS: int = 4  # Более короткие сообщения не проверяются
+    NEAR_DUPLICATE_MAX_AGE_HOURS: float = 24.0  # Дубликатом считается копия сообщения того же автора не старше N часов
+    LEAD_WRITER_BATCH_SIZE: int = 50  # Клиентов в одном upsert в potential_clients
+    LEAD_WRITER_FLUSH_SECONDS: float = 2.0  # Максимальная задержка записи клиента в БД
+    LEAD_WRITER_MAX_RETRIES: int = 3  # Повторов upsert при ошибке БД (пауза 1, 2, 4... сек)
+    NOTIFICATION_WORKERS: int = 3  # Параллельных отправок уведомлений (темп держит регулятор Telegram)
+    NOTIFICATION_COALESCE_SECONDS: float = 0.0  # Окно сбора клиентов в один дайджест на получателя (0 - каждый отдельно)
+    STATS_CACHE_TTL_SECONDS: int = 30  # Кэш статистики клиентов (сбрасывается при записи клиентов и смене статуса)
+    LEAD_EVENTS_BUFFER_SIZE: int = 500  # Последних событий на пользователя для дочитывания по Last-Event-ID
+    LEAD_EVENTS_QUEUE_SIZE: int = 1000  # Очередь одного SSE-подписчика; переполнение - переподключение с дочитыванием
+    LEAD_EVENTS_PING_SECONDS: int = 15  # Heartbeat SSE-потока
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
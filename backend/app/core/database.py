@@ -1,6 +1,8 @@
 # backend/app/core/database.py
 from supabase import create_client, Client
+from concurrent.futures import ThreadPoolExecutor
 from .config import settings
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,4 +29,26 @@ class SupabaseClient:
         return self.client
 
 # Глобальный экземпляр
-supabase_client = SupabaseClient().db
\ No newline at end of file
+supabase_client = SupabaseClient().db
+
+# Пул потоков для запросов к Supabase: клиент синхронный, а вызывать его
+# напрямую из async-кода значит блокировать весь event loop (Telegram, HTTP API).
+# Клиент общий, поэтому HTTP-соединения переиспользуются между потоками.
+_db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_MAX_WORKERS,
+    thread_name_prefix='supabase'
+)
+
+async def db_execute(query):
+    """
+    Выполнить запрос PostgREST без блокировки event loop
+    
+    Пример:
+        result = await db_execute(supabase_client.table('x').select('*').eq('id', 1))
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, query.execute)
+
+def shutdown_db_executor():
+    """Остановить пул потоков БД (при завершении приложения)"""
+    _db_executor.shutdown(wait=True)
@@ -4,9 +4,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from .api.v1 import telegram, moderators, analytics, auth, client_monitoring
 from .core.config import settings
-from .core.database import supabase_client
-from .services.telegram_service import TelegramService
-from .services.scheduler_service import scheduler_service
+from .core.database import supabase_client, db_execute, shutdown_db_executor
+from .services.container import services
 import asyncio
 import logging
 
@@ -20,43 +19,29 @@ async def lifespan(app: FastAPI):
     # === STARTUP ===
     logger.info("Starting ClientHunter API")
     
-    # Запускаем планировщик задач для мониторинга клиентов
+    # Один набор сервисов на приложение: подключаем аккаунты, прогреваем кэши,
+    # запускаем планировщик задач для мониторинга клиентов
     try:
-        logger.info("Starting scheduler service")
-        await scheduler_service.start()
-        logger.info("Scheduler started successfully")
+        logger.info("Starting services")
+        await services.startup()
+        logger.info("Services started successfully")
     except Exception as e:
-        logger.error(f"Failed to start scheduler: {e}")
+        logger.error(f"Failed to start services: {e}")
         import traceback
-        logger.error(f"Scheduler startup error traceback: {traceback.format_exc()}")
+        logger.error(f"Services startup error traceback: {traceback.format_exc()}")
     
-    logger.info("Application started successfully. Telegram client will be initialized on demand.")
+    logger.info("Application started successfully")
     
     yield  # Приложение работает здесь
     
     # === SHUTDOWN ===
     logger.info("Shutting down application")
     
-    # Останавливаем планировщик
-    try:
-        await scheduler_service.stop()
-        logger.info("Scheduler stopped successfully")
-    except Exception as e:
-        logger.error(f"Error stopping scheduler: {e}")
-    
-    # Останавливаем Telegram клиент
-    telegram_service = TelegramService()
-    try:
-        await asyncio.wait_for(telegram_service.close(), timeout=5.0)
-        logger.info("Telegram client closed successfully")
-    except asyncio.TimeoutError:
-        logger.warning("Timeout occurred while closing Telegram client, forcing shutdown")
-    except Exception as e:
-        logger.error(f"Error closing Telegram client: {e}")
+    # Останавливаем планировщик и закрываем Telegram клиенты
+    await services.shutdown(timeout=5.0)
     
-    # Очищаем ресурсы
-    if hasattr(telegram_service, 'client') and telegram_service.client:
-        telegram_service.client = None
+    # Дожидаемся запросов к БД и останавливаем пул потоков
+    shutdown_db_executor()
     
     logger.info("Application shutdown complete")
 
@@ -92,10 +77,10 @@ async def monitoring_health():
     """Проверка состояния системы мониторинга"""
     try:
         # Проверяем подключение к БД
-        result = supabase_client.table('monitoring_settings').select('count').execute()
+        result = await db_execute(supabase_client.table('monitoring_settings').select('count'))
         
         # Проверяем планировщик
-        scheduler_running = scheduler_service.running
+        scheduler_running = services.scheduler.running
         
         return {
             "status": "healthy",
@@ -0,0 +1,113 @@
+# backend/app/services/ai_analysis_pool.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional
+
+from ..core.config import settings
+from .rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Примерная цена запроса без текста сообщения: системный промпт + max_tokens ответа
+BASE_REQUEST_TOKENS = 350
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка токенов запроса (для TPM-лимита достаточно)"""
+    return BASE_REQUEST_TOKENS + len(text or '') // 2
+
+
+class AIAnalysisPool:
+    """
+    Стадия AI-анализа: очередь + пул воркеров под лимиты OpenAI
+
+    Чтение чатов и сопоставление ключевых слов только ставят задачи в очередь,
+    воркеры параллельно вызывают OpenAI, не превышая RPM/TPM квоты.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        rpm_limit: Optional[int] = None,
+        tpm_limit: Optional[int] = None
+    ):
+        self.workers_count = workers or settings.AI_WORKER_COUNT
+        self.rpm_bucket = TokenBucket.per_minute(rpm_limit or settings.OPENAI_RPM_LIMIT)
+        self.tpm_bucket = TokenBucket.per_minute(tpm_limit or settings.OPENAI_TPM_LIMIT)
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+
+    def _ensure_started(self):
+        """Воркеры стартуют лениво - внутри работающего event loop"""
+        if self.workers:
+            return
+        self.queue = asyncio.Queue()
+        self.workers = [
+            asyncio.create_task(self._worker(i))
+            for i in range(self.workers_count)
+        ]
+        logger.info(f"🤖 AI analysis pool started with {self.workers_count} workers")
+
+    def submit(
+        self,
+        job: Callable[[], Awaitable[Any]],
+        estimated_tokens: int = BASE_REQUEST_TOKENS
+    ) -> asyncio.Future:
+        """
+        Поставить AI-задачу в очередь
+
+        Args:
+            job: фабрика корутины, которая делает запрос(ы) к OpenAI
+            estimated_tokens: оценка токенов для TPM-лимита
+
+        Returns:
+            Future с результатом job()
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((job, estimated_tokens, future))
+        return future
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job, estimated_tokens, future = await self.queue.get()
+            try:
+                if future.cancelled():
+                    continue
+
+                await self.rpm_bucket.acquire(1)
+                await self.tpm_bucket.acquire(estimated_tokens)
+
+                result = await job()
+                if not future.done():
+                    future.set_result(result)
+
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"AI worker {worker_id} job failed: {e}")
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    def pending(self) -> int:
+        """Сколько задач ждут в очереди"""
+        return self.queue.qsize() if self.queue else 0
+
+    async def stop(self):
+        """Остановить воркеров, незавершенные задачи отменяются"""
+        for worker in self.workers:
+            worker.cancel()
+        if self.workers:
+            await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+        if self.queue:
+            while not self.queue.empty():
+                _, _, future = self.queue.get_nowait()
+                if not future.done():
+                    future.cancel()
+        logger.info("🤖 AI analysis pool stopped")
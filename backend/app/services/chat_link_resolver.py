@@ -0,0 +1,183 @@
+# backend/app/services/chat_link_resolver.py
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from ..core.database import supabase_client, db_execute
+from .telegram_service import TelegramService
+
+logger = logging.getLogger(__name__)
+
+
+class ChatLinkResolver:
+    """
+    Конвертация ссылок на чаты шаблона в chat_ids
+
+    Попадания кэша peer'ов и небольшие списки резолвятся сразу, в запросе API.
+    Большой список без кэша уходит в фоновую задачу: шаблон сохраняется с уже
+    известными chat_ids и дополняется по мере резолва, планировщик узнает об
+    изменениях через on_template_updated.
+    """
+
+    def __init__(
+        self,
+        telegram_service: TelegramService,
+        on_template_updated: Optional[Callable[[int], None]] = None
+    ):
+        self.telegram_service = telegram_service
+        self.on_template_updated = on_template_updated
+
+        # template_id -> состояние фоновой задачи (последней для шаблона)
+        self.jobs: Dict[int, Dict[str, Any]] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    async def resolve(self, chat_links: List[str]) -> Tuple[Dict[str, Optional[str]], List[str]]:
+        """
+        Резолв ссылок, который уместен в запросе API
+
+        Returns:
+            ({ссылка: chat_id или None}, ссылки для фонового резолва)
+        """
+        results: Dict[str, Optional[str]] = {}
+        pending: List[str] = []
+
+        for link in dict.fromkeys(chat_links):
+            chat_id = await self.telegram_service.get_cached_chat_id(link)
+            if chat_id:
+                results[link] = chat_id
+            else:
+                pending.append(link)
+
+        unique_pending = {self.telegram_service.normalize_chat_link(link) for link in pending}
+        if len(unique_pending) <= settings.CHAT_RESOLVE_SYNC_LIMIT:
+            results.update(await self.telegram_service.resolve_multiple_chat_links(pending))
+            pending = []
+
+        logger.info(f"🔗 Chat links: {len(results)} resolved now, {len(pending)} deferred to background")
+        return results, pending
+
+    def start_job(
+        self,
+        template_id: int,
+        user_id: int,
+        chat_links: List[str],
+        resolved: Dict[str, Optional[str]],
+        pending: List[str]
+    ) -> Dict[str, Any]:
+        """Запустить фоновый резолв оставшихся ссылок шаблона (предыдущая задача отменяется)"""
+        self.cancel_job(template_id)
+
+        job = {
+            'template_id': template_id,
+            'status': 'running',
+            'total': len(pending),
+            'resolved': 0,
+            'failed_links': [],
+            'started_at': time.time(),
+            'finished_at': None
+        }
+        self.jobs[template_id] = job
+        self._tasks[template_id] = asyncio.create_task(
+            self._run_job(job, user_id, list(chat_links), dict(resolved), pending)
+        )
+        logger.info(f"🔗 Template {template_id}: background resolve of {len(pending)} chat links started")
+        return job
+
+    def cancel_job(self, template_id: int):
+        """Отменить фоновый резолв шаблона (ссылки изменились или шаблон удален)"""
+        task = self._tasks.pop(template_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+            job = self.jobs.get(template_id)
+            if job is not None:
+                job['status'] = 'cancelled'
+                job['finished_at'] = time.time()
+
+    def get_job(self, template_id: int) -> Optional[Dict[str, Any]]:
+        return self.jobs.get(template_id)
+
+    async def _run_job(
+        self,
+        job: Dict[str, Any],
+        user_id: int,
+        chat_links: List[str],
+        results: Dict[str, Optional[str]],
+        pending: List[str]
+    ):
+        """Резолвить ссылки параллельно и сохранять chat_ids шаблона порциями"""
+        template_id = job['template_id']
+        telegram_service = self.telegram_service
+
+        # Ссылки на один чат резолвим одним запросом
+        links_by_key: Dict[str, List[str]] = {}
+        for link in pending:
+            key = telegram_service.normalize_chat_link(link)
+            if key is None:
+                results[link] = None
+                job['failed_links'].append(link)
+            else:
+                links_by_key.setdefault(key, []).append(link)
+
+        async def resolve_key(key: str) -> Tuple[str, Optional[str]]:
+            return key, await telegram_service.resolve_chat_link(key)
+
+        try:
+            since_flush = 0
+            for next_done in asyncio.as_completed([resolve_key(key) for key in links_by_key]):
+                key, chat_id = await next_done
+                for link in links_by_key[key]:
+                    results[link] = chat_id
+                    if chat_id:
+                        job['resolved'] += 1
+                    else:
+                        job['failed_links'].append(link)
+
+                since_flush += 1
+                if since_flush >= settings.CHAT_RESOLVE_FLUSH_EVERY:
+                    await self._save_chat_ids(template_id, user_id, chat_links, results)
+                    since_flush = 0
+
+            await self._save_chat_ids(template_id, user_id, chat_links, results)
+            job['status'] = 'completed'
+            logger.info(f"✅ Template {template_id}: background resolve finished, "
+                        f"{job['resolved']} resolved, {len(job['failed_links'])} failed")
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job['status'] = 'failed'
+            job['error'] = str(e)
+            logger.error(f"Error resolving chat links for template {template_id}: {e}")
+        finally:
+            job['finished_at'] = time.time()
+            if self._tasks.get(template_id) is asyncio.current_task():
+                del self._tasks[template_id]
+
+    async def _save_chat_ids(
+        self,
+        template_id: int,
+        user_id: int,
+        chat_links: List[str],
+        results: Dict[str, Optional[str]]
+    ):
+        """chat_ids шаблона в порядке исходных ссылок, без повторов"""
+        chat_ids = list(dict.fromkeys(results[link] for link in chat_links if results.get(link)))
+
+        await db_execute(supabase_client.table('product_templates').update({
+            'chat_ids': chat_ids,
+            'updated_at': datetime.now().isoformat()
+        }).eq('id', template_id).eq('user_id', user_id))
+
+        if self.on_template_updated is not None:
+            self.on_template_updated(user_id)
+
+    async def stop(self):
+        """Отменить все фоновые задачи"""
+        tasks = list(self._tasks.values())
+        for template_id in list(self._tasks):
+            self.cancel_job(template_id)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
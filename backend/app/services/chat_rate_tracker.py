@@ -0,0 +1,201 @@
+# backend/app/services/chat_rate_tracker.py
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Допуск при проверке "пора ли опрашивать": шаблоны запускаются по своему
+# интервалу, и чат не должен пропускать запуск из-за пары секунд
+DUE_TOLERANCE_SHARE = 0.1
+
+
+class ChatRateTracker:
+    """
+    Адаптивная частота опроса чатов по наблюдаемому потоку сообщений
+
+    По каждому чату держим экспоненциально сглаженную оценку сообщений в минуту.
+    Интервал опроса подбирается так, чтобы за опрос приходило около
+    CHAT_POLL_TARGET_MESSAGES сообщений, и зажимается в границы шаблонов:
+    активные чаты опрашиваются на каждом запуске шаблона, тихие - реже, вплоть
+    до максимального интервала.
+
+    Оценка потока общая для всех пользователей, читающих чат. Время опроса
+    и решения "пора ли читать" - свои у каждой пары (user_id, chat_id): опрос
+    одного пользователя не отменяет и не сокращает чтение другого.
+    """
+
+    def __init__(
+        self,
+        half_life_minutes: Optional[float] = None,
+        target_messages: Optional[int] = None
+    ):
+        self.half_life_minutes = half_life_minutes or settings.CHAT_RATE_HALF_LIFE_MINUTES
+        self.target_messages = target_messages or settings.CHAT_POLL_TARGET_MESSAGES
+        self._chats: Dict[str, Dict[str, Any]] = {}
+        self._readers: Dict[Tuple[int, str], Dict[str, Any]] = {}
+
+    def _state(self, chat_id: str) -> Dict[str, Any]:
+        return self._chats.setdefault(str(chat_id), {
+            'rate_per_minute': None,
+            'last_observed_at': None,
+            'last_max_message_id': None,
+            'last_new_messages': 0
+        })
+
+    def _reader(self, user_id: int, chat_id: str) -> Dict[str, Any]:
+        return self._readers.setdefault((user_id, str(chat_id)), {
+            'last_poll_at': None,
+            'polls': 0,
+            'skips': 0,
+            'interval_minutes': None,
+            'next_poll_at': None,
+            'decision': None
+        })
+
+    def should_poll(self, user_id: int, chat_id: str, min_interval_minutes: float, max_interval_minutes: float) -> bool:
+        """
+        Пора ли пользователю читать чат в этом цикле
+
+        Args:
+            min_interval_minutes: нижняя граница (самый частый интервал шаблонов чата)
+            max_interval_minutes: верхняя граница для тихих чатов
+        """
+        rate_per_minute = self._state(chat_id)['rate_per_minute']
+        reader = self._reader(user_id, chat_id)
+        interval, reason = self._interval_minutes(rate_per_minute, min_interval_minutes, max_interval_minutes)
+        reader['interval_minutes'] = round(interval, 2)
+
+        if reader['last_poll_at'] is None:
+            reader['decision'] = 'первый опрос'
+            return True
+
+        next_poll_at = reader['last_poll_at'] + interval * 60
+        reader['next_poll_at'] = next_poll_at
+        reader['decision'] = reason
+
+        if time.time() + min_interval_minutes * 60 * DUE_TOLERANCE_SHARE >= next_poll_at:
+            return True
+
+        reader['skips'] += 1
+        return False
+
+    def _interval_minutes(
+        self,
+        rate_per_minute: Optional[float],
+        min_interval_minutes: float,
+        max_interval_minutes: float
+    ) -> Tuple[float, str]:
+        """Интервал опроса по оценке потока и причина выбора"""
+        max_interval_minutes = max(max_interval_minutes, min_interval_minutes)
+
+        if rate_per_minute is None:
+            return min_interval_minutes, 'нет оценки потока - минимальный интервал'
+        if rate_per_minute <= 0:
+            return max_interval_minutes, 'тишина - максимальный интервал'
+
+        ideal = self.target_messages / rate_per_minute
+        if ideal <= min_interval_minutes:
+            return min_interval_minutes, f'активный чат ({rate_per_minute:.2f} msg/min) - минимальный интервал'
+        if ideal >= max_interval_minutes:
+            return max_interval_minutes, f'тихий чат ({rate_per_minute:.3f} msg/min) - максимальный интервал'
+        return ideal, f'{rate_per_minute:.3f} msg/min - ~{self.target_messages} сообщений за опрос'
+
+    def observe(self, user_id: int, chat_id: str, messages: List[Dict[str, Any]], window_minutes: float):
+        """
+        Учесть результат чтения чата пользователем
+
+        Число новых сообщений в каналах и супергруппах считаем по приросту
+        message_id с прошлого чтения чата любым пользователем (он последователен
+        в пределах чата и не упирается в limit выборки). В обычных группах id
+        сквозные для всего аккаунта - там считаем сообщения выборки, отправленные
+        после прошлого чтения. Для первого чтения - размер выборки за окно
+        window_minutes.
+        """
+        now = time.time()
+        state = self._state(chat_id)
+        max_message_id = max((int(m['message_id']) for m in messages), default=None)
+
+        if state['last_observed_at'] is None:
+            elapsed_minutes = max(window_minutes, 1)
+            new_messages = len(messages)
+        else:
+            elapsed_minutes = (now - state['last_observed_at']) / 60
+            if max_message_id is None:
+                new_messages = 0
+            elif not self._has_chat_message_ids(chat_id):
+                new_messages = sum(1 for m in messages if self._message_timestamp(m) > state['last_observed_at'])
+            elif state['last_max_message_id'] is None:
+                new_messages = len(messages)
+            else:
+                new_messages = max(0, max_message_id - state['last_max_message_id'])
+
+        if elapsed_minutes > 0:
+            observed_rate = new_messages / elapsed_minutes
+            if state['rate_per_minute'] is None:
+                state['rate_per_minute'] = observed_rate
+            else:
+                # Вес наблюдения зависит от прошедшего времени: опросы идут неравномерно
+                alpha = 1 - 0.5 ** (elapsed_minutes / self.half_life_minutes)
+                state['rate_per_minute'] += alpha * (observed_rate - state['rate_per_minute'])
+
+        if max_message_id is not None:
+            state['last_max_message_id'] = max(state['last_max_message_id'] or 0, max_message_id)
+        state['last_new_messages'] = new_messages
+        state['last_observed_at'] = now
+
+        reader = self._reader(user_id, chat_id)
+        reader['last_poll_at'] = now
+        reader['polls'] += 1
+        if reader['interval_minutes']:
+            reader['next_poll_at'] = now + reader['interval_minutes'] * 60
+
+    @staticmethod
+    def _has_chat_message_ids(chat_id: str) -> bool:
+        """Нумерация message_id своя у чата только в каналах и супергруппах (chat_id -100...)"""
+        return str(chat_id).startswith('-100')
+
+    @staticmethod
+    def _message_timestamp(message: Dict[str, Any]) -> float:
+        date = message.get('date')
+        if not date:
+            return 0.0
+        return datetime.fromisoformat(date.replace('Z', '+00:00')).timestamp()
+
+    def minutes_since_last_poll(self, user_id: int, chat_id: str) -> Optional[float]:
+        """Сколько минут пользователь не читал чат (None - еще ни разу)"""
+        reader = self._readers.get((user_id, str(chat_id)))
+        if not reader or reader['last_poll_at'] is None:
+            return None
+        return (time.time() - reader['last_poll_at']) / 60
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Оценки потока по чатам и решения по опросу для каждого пользователя"""
+        def iso(ts: Optional[float]) -> Optional[str]:
+            return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+        report = {
+            chat_id: {
+                'rate_per_minute': round(state['rate_per_minute'], 4) if state['rate_per_minute'] is not None else None,
+                'last_new_messages': state['last_new_messages'],
+                'last_observed_at': iso(state['last_observed_at']),
+                'readers': {}
+            }
+            for chat_id, state in self._chats.items()
+        }
+        for (user_id, chat_id), reader in self._readers.items():
+            chat_report = report.setdefault(chat_id, {
+                'rate_per_minute': None, 'last_new_messages': 0, 'last_observed_at': None, 'readers': {}
+            })
+            chat_report['readers'][str(user_id)] = {
+                'interval_minutes': reader['interval_minutes'],
+                'last_poll_at': iso(reader['last_poll_at']),
+                'next_poll_at': iso(reader['next_poll_at']),
+                'polls': reader['polls'],
+                'skips': reader['skips'],
+                'decision': reader['decision']
+            }
+        return report
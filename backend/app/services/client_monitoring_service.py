@@ -1,24 +1,69 @@
 # backend/app/services/client_monitoring_service.py
 import asyncio
 import logging
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Any, Optional
-import re
+from typing import Callable, List, Dict, Any, Optional, Tuple
 import json
 
-from ..core.database import supabase_client
+from ..core.database import supabase_client, db_execute
 from ..core.config import settings
-from .telegram_service import TelegramService
-from .openai_service import OpenAIService
+from .telegram_pool import TelegramSessionPool
+from .openai_service import OpenAIService, PROMPT_VERSION, TRANSIENT_AI_ERRORS, openai_service
+from .cursor_store import ChatCursorStore
+from .keyword_matcher import MATCH_MODE_STEM, MATCH_MODE_SUBSTRING, get_keyword_matcher
+from .ai_analysis_pool import AIAnalysisPool, estimate_tokens
+from .verdict_cache import VerdictCache, verdict_key
+from .near_duplicate_detector import NearDuplicateDetector
+from .chat_rate_tracker import ChatRateTracker
+from .lead_writer import LeadWriter
+from .notification_dispatcher import NotificationDispatcher
 
 logger = logging.getLogger(__name__)
 
 class ClientMonitoringService:
-    def __init__(self):
-        self.telegram_service = TelegramService()
-        self.openai_service = OpenAIService()
+    def __init__(self, telegram_pool: TelegramSessionPool, openai: Optional[OpenAIService] = None):
+        """
+        Args:
+            telegram_pool: общий пул аккаунтов (см. services.container) - свои клиенты не создаем
+            openai: клиент OpenAI (по умолчанию общий экземпляр)
+        """
+        # Чаты читаются пулом аккаунтов; основной аккаунт - для уведомлений и push-режима
+        self.telegram_pool = telegram_pool
+        self.telegram_service = telegram_pool.primary
+        self.openai_service = openai or openai_service
+        self.cursor_store = ChatCursorStore()
+        self.ai_pool = AIAnalysisPool()
+        self.verdict_cache = VerdictCache() if settings.AI_VERDICT_CACHE_ENABLED else None
+        self.duplicate_detector = NearDuplicateDetector() if settings.NEAR_DUPLICATE_ENABLED else None
+        self.chat_rates = ChatRateTracker() if settings.ADAPTIVE_POLLING_ENABLED else None
+        self.lead_writer = LeadWriter()
+        self.notifications = NotificationDispatcher(self.telegram_service, on_delivered=self.lead_writer.mark_notified)
         self.active_monitoring = {}  # Словарь активных мониторингов по user_id
         
+        # Push-режим: chat_id -> список подписок (user_id, шаблон, настройки)
+        self._realtime_routes: Dict[str, List[Dict[str, Any]]] = {}
+        self._realtime_enabled = False
+        self._realtime_handlers: Dict[str, Any] = {}  # Аккаунт пула -> обработчик events.NewMessage
+        self._realtime_tasks = set()  # Strong references на задачи обработки событий
+        self._realtime_last_event: Dict[str, float] = {}  # chat_id -> время последнего push-события
+        self._realtime_last_poll: Dict[str, float] = {}  # chat_id -> время последнего догоняющего опроса
+        self._realtime_seen: Dict[Tuple[str, str], set] = {}  # Id событий выше курсора, ждущие непрерывной цепочки
+        
+        # Уже обработанные сообщения (template_id, chat_id, message_id),
+        # чтобы polling не анализировал повторно то, что пришло через events
+        self._processed_messages: OrderedDict = OrderedDict()
+        
+        # Кандидаты, оставшиеся без вердикта AI: user_id -> (template_id, chat_id, message_id) -> кандидат.
+        # Позиция чтения и отметка "обработано" их уже прошли - в AI они уходят снова в следующем
+        # цикле, а сохраняемый курсор стоит перед ними: после перезапуска они будут прочитаны заново
+        self._deferred_candidates: Dict[int, OrderedDict] = {}
+        
+        # Точность сопоставления: template_id -> режим -> счетчики совпадений и вердиктов AI;
+        # shadow_* - что совпало бы во втором режиме, если бы шаблон работал в нем
+        self.match_stats: Dict[Any, Dict[str, Dict[str, int]]] = {}
+        
     async def start_monitoring(self, user_id: int):
         """Запустить мониторинг для пользователя"""
         try:
@@ -37,7 +82,221 @@ class ClientMonitoringService:
         except Exception as e:
             logger.error(f"Error stopping monitoring for user {user_id}: {e}")
             raise
-    
+
+    # ==================== REALTIME (PUSH) ====================
+
+    async def start_realtime(self):
+        """
+        Включить push-обработку новых сообщений через Telethon events
+
+        Обработчик ставится на каждый аккаунт пула, но событие чата принимается
+        только от владельца его шарда - того же аккаунта, который читает чат
+        опросом. Telegram присылает события только по чатам, где аккаунт
+        состоит: чат, в который владелец не вступил, остается на обычном опросе.
+        """
+        if self._realtime_enabled:
+            return
+        try:
+            for account, service in self.telegram_pool.services.items():
+                await service.ensure_connected()
+                handler = self._make_realtime_handler(account)
+                service.add_new_message_handler(handler)
+                self._realtime_handlers[account] = handler
+            self._realtime_enabled = True
+            logger.info(f"📡 Realtime monitoring enabled on {len(self._realtime_handlers)} account(s)")
+        except Exception as e:
+            logger.error(f"Error starting realtime monitoring: {e}")
+
+    async def stop_realtime(self):
+        """Выключить push-обработку"""
+        if not self._realtime_enabled:
+            return
+        for account, handler in self._realtime_handlers.items():
+            try:
+                self.telegram_pool.services[account].remove_new_message_handler(handler)
+            except Exception as e:
+                logger.error(f"Error stopping realtime monitoring on {account}: {e}")
+        self._realtime_handlers = {}
+        self._realtime_enabled = False
+        self._realtime_routes = {}
+        self._realtime_last_event.clear()
+        # Курсоры, сдвинутые событиями после последнего опроса
+        await self.cursor_store.flush()
+        logger.info("📴 Realtime monitoring disabled")
+
+    async def refresh_realtime_routes(self, active_users: List[Dict[str, Any]]):
+        """
+        Пересобрать подписки: объединение chat_ids всех активных шаблонов
+
+        Args:
+            active_users: строки monitoring_settings с is_active=True
+        """
+        routes: Dict[str, List[Dict[str, Any]]] = {}
+
+        for user_settings in active_users:
+            user_id = user_settings['user_id']
+            templates = await self._get_user_templates(user_id)
+
+            for template in templates:
+                keywords = self._parse_keywords(template.get('keywords'))
+                if not keywords:
+                    continue
+                for chat_id in template.get('chat_ids') or []:
+                    routes.setdefault(str(chat_id), []).append({
+                        'user_id': user_id,
+                        'template': template,
+                        'keywords': keywords,
+                        'settings': user_settings
+                    })
+
+        self._realtime_routes = routes
+
+        if routes and not self._realtime_enabled:
+            await self.start_realtime()
+
+        logger.info(f"📡 Realtime routes refreshed: {len(routes)} chats")
+
+    def _make_realtime_handler(self, account: str):
+        """Обработчик events.NewMessage для аккаунта пула"""
+        async def handler(event):
+            await self._on_new_message(event, account)
+        return handler
+
+    async def _on_new_message(self, event, account: str):
+        """Обработчик events.NewMessage: фильтрует чаты и отдает сообщение в пайплайн"""
+        chat_id = str(event.chat_id)
+        routes = self._realtime_routes.get(chat_id)
+        if not routes:
+            return
+
+        # Чат, состоящий в нескольких аккаунтах, обрабатываем один раз - от владельца шарда
+        if self.telegram_pool.preference_list(chat_id)[0] != account:
+            return
+
+        self._realtime_last_event[chat_id] = time.time()
+
+        # Не блокируем цикл обновлений Telethon - обработка в отдельной задаче
+        task = asyncio.create_task(self._process_realtime_message(event, account, chat_id, routes))
+        self._realtime_tasks.add(task)
+        task.add_done_callback(self._realtime_tasks.discard)
+
+    async def _process_realtime_message(self, event, account: str, chat_id: str, routes: List[Dict[str, Any]]):
+        """Прогнать одно входящее сообщение через keywords/AI для всех подписанных шаблонов"""
+        message_id = event.message.id
+        try:
+            if not event.message.text:
+                return
+
+            service = self.telegram_pool.services[account]
+
+            # Название чата из кэша peer'ов; запрос к Telegram - только через регулятор
+            _, chat_entry = await service.get_peer(chat_id)
+
+            # Профиль из самого апдейта или общего кэша - без get_sender() на каждое сообщение
+            user_info = await service.get_sender_info(event.message) if event.sender_id else None
+
+            message = service.message_to_dict(
+                event.message,
+                chat_id=chat_id,
+                chat_title=chat_entry.get('title') or f'Chat {chat_id}',
+                user_info=user_info
+            )
+            message_text = message.get('text', '')
+
+            for route in routes:
+                template = route['template']
+                matched_keywords = self._find_keywords_in_message(message_text, route['keywords'], template)
+                shadow_matched = self._shadow_match(message_text, route['keywords'], template)
+                if not matched_keywords:
+                    if shadow_matched:
+                        self._record_shadow_only_match(template)
+                    continue
+
+                if not self._mark_processed(template.get('id'), chat_id, message.get('message_id')):
+                    continue
+
+                self._record_keyword_match(template, shadow_matched)
+                logger.info(f"📡 Realtime совпадение в чате {chat_id} для шаблона '{template.get('name')}': {matched_keywords}")
+
+                candidates = self._filter_near_duplicates([{
+                    'message': message,
+                    'template': template,
+                    'matched_keywords': matched_keywords,
+                    'shadow_matched': shadow_matched,
+                    'chat_id': chat_id,
+                    'chat_name': message.get('chat_title', f'Chat {chat_id}')
+                }])
+                if candidates:
+                    await self._submit_candidates(route['user_id'], route['settings'], candidates)
+
+        except Exception as e:
+            logger.error(f"Error processing realtime message in chat {chat_id}: {e}")
+
+        finally:
+            # Сообщение (в том числе без текста) обработано - опрос его больше не читает
+            for route in routes:
+                self._advance_realtime_cursor(route['template'].get('id'), chat_id, message_id)
+
+    def _advance_realtime_cursor(self, template_id, chat_id: str, message_id: int):
+        """
+        Сдвинуть курсор шаблона по сообщению из push-события
+
+        Курсор двигается только по непрерывной цепочке id: событие, пропущенное
+        при переподключении, иначе оказалось бы позади курсора и не было бы
+        прочитано опросом. Разрыв (удаленные и служебные сообщения) курсор
+        не перепрыгивает - его закрывает догоняющий опрос.
+        """
+        cursor = self.cursor_store.get(template_id, chat_id)
+        # Без курсора чат читается окном lookback_minutes - первый курсор ставит опрос
+        if not cursor or message_id <= cursor:
+            return
+
+        key = (str(template_id), chat_id)
+        seen = self._realtime_seen.setdefault(key, set())
+        seen.add(message_id)
+
+        last_id = cursor
+        while last_id + 1 in seen:
+            last_id += 1
+        if last_id > cursor:
+            self.cursor_store.advance(template_id, chat_id, last_id)
+
+        self._realtime_seen[key] = {seen_id for seen_id in seen if seen_id > last_id}
+
+    def _should_poll_realtime_chat(self, chat_id: str) -> bool:
+        """
+        Нужен ли опрос чату, сообщения которого приходят push-событиями
+
+        Такой чат опрашивается раз в REALTIME_CATCHUP_INTERVAL_MINUTES - только
+        чтобы закрыть пропущенные события. Если событий из чата давно не было
+        (аккаунт вышел из чата, обработчик не работает), чат возвращается
+        к обычному опросу.
+        """
+        now = time.time()
+        catchup_seconds = settings.REALTIME_CATCHUP_INTERVAL_MINUTES * 60
+        last_event = self._realtime_last_event.get(chat_id)
+
+        if (not self._realtime_enabled or chat_id not in self._realtime_routes
+                or last_event is None or now - last_event > catchup_seconds):
+            return True
+
+        if now - self._realtime_last_poll.get(chat_id, 0.0) < catchup_seconds:
+            return False
+
+        self._realtime_last_poll[chat_id] = now
+        return True
+
+    def _mark_processed(self, template_id, chat_id: str, message_id) -> bool:
+        """Отметить сообщение как обработанное. False - если оно уже обрабатывалось"""
+        key = (template_id, str(chat_id), str(message_id))
+        if key in self._processed_messages:
+            return False
+
+        self._processed_messages[key] = True
+        while len(self._processed_messages) > settings.PROCESSED_MESSAGES_CACHE_SIZE:
+            self._processed_messages.popitem(last=False)
+        return True
+
     async def _monitoring_loop(self, user_id: int):
         """Основной цикл мониторинга для пользователя"""
         while self.active_monitoring.get(user_id, False):
@@ -60,167 +319,459 @@ class ClientMonitoringService:
     async def _get_user_settings(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Получить настройки пользователя"""
         try:
-            result = supabase_client.table('monitoring_settings').select('*').eq('user_id', user_id).execute()
+            result = await db_execute(supabase_client.table('monitoring_settings').select('*').eq('user_id', user_id))
             return result.data[0] if result.data else None
         except Exception as e:
             logger.error(f"Error getting user settings: {e}")
             return None
     
-    async def search_and_analyze(self, user_id: int, settings: Dict[str, Any]):
-        """Основной метод поиска и анализа клиентов с подробным логированием"""
+    async def search_and_analyze(
+        self,
+        user_id: int,
+        settings: Dict[str, Any],
+        templates: Optional[List[Dict[str, Any]]] = None
+    ):
+        """
+        Основной метод поиска и анализа клиентов с подробным логированием
+        
+        Цикл строится по чатам, а не по шаблонам: каждый чат читается из Telegram
+        один раз, а полученная пачка сообщений проверяется всеми шаблонами,
+        которые за ним следят.
+        
+        Args:
+            templates: шаблоны для запуска (планировщик передает только наступившие);
+                None - все активные шаблоны пользователя
+        """
         logger.info(f"🔥 ВХОД В search_and_analyze для пользователя {user_id}")
         try:
             logger.info(f"🚀 ЗАПУСК МОНИТОРИНГА для пользователя {user_id}")
             
             # Получаем шаблоны
-            templates = await self._get_user_templates(user_id)
+            if templates is None:
+                templates = await self._get_user_templates(user_id)
             if not templates:
                 logger.info(f"❌ Нет активных шаблонов для пользователя {user_id}")
                 return
             
             logger.info(f"📋 Найдено {len(templates)} активных шаблонов")
             
-            # Статистика по всему циклу
-            total_messages_found = 0
-            total_keyword_matches = 0
-            total_ai_analyzed = 0
-            total_clients_found = 0
+            # Курсоры: читаем только сообщения новее последнего обработанного
+            await self.cursor_store.load(t.get('id') for t in templates)
             
-            # Обрабатываем каждый шаблон
-            for template_idx, template in enumerate(templates, 1):
-                template_name = template.get('name', 'Unknown')
-                template_id = template.get('id', 'Unknown')
-                
-                logger.info(f"📊 ШАБЛОН {template_idx}/{len(templates)}: '{template_name}' (ID: {template_id})")
-                
-                # Парсим keywords
-                keywords = self._parse_keywords(template.get('keywords'))
-                if not keywords:
-                    logger.warning(f"⚠️ Нет ключевых слов в шаблоне '{template_name}' - пропускаем")
-                    continue
+            # План цикла: chat_id -> шаблоны, которые за ним следят
+            plan = self._build_cycle_plan(templates)
+            if not plan:
+                logger.info(f"❌ Нет шаблонов с ключевыми словами и чатами для пользователя {user_id}")
+                return
+            
+            logger.info(f"🗺️ План цикла: {len(plan)} уникальных чатов для {len(templates)} шаблонов")
+            
+            # Статистика по шаблонам
+            template_stats: Dict[Any, Dict[str, int]] = {}
+            
+            # AI-задачи цикла: (template_id, future) - выполняются пулом, пока читаем следующие чаты
+            pending_ai: List[Any] = []
+            
+            # Кандидаты копятся по шаблону до размера пакета OpenAI
+            batch_size = self._ai_batch_size()
+            ai_buffers: Dict[Any, List[Dict[str, Any]]] = {}
+            
+            # Кандидаты без вердикта AI из прошлых циклов - первыми в очередь анализа
+            for template_id, deferred in self._take_deferred_candidates(user_id, templates).items():
+                template_stats.setdefault(template_id, self._new_template_stats())
+                for start in range(0, len(deferred), batch_size):
+                    pending_ai.append((template_id, self._submit_candidates(user_id, settings, deferred[start:start + batch_size])))
+            
+            # Тихие чаты, которые еще рано перечитывать
+            skipped_chats = 0
+            
+            # Обрабатываем каждый чат
+            for chat_idx, (chat_id, watchers) in enumerate(plan.items(), 1):
+                try:
+                    logger.info(f"  📱 ЧАТ {chat_idx}/{len(plan)}: {chat_id} ({len(watchers)} шаблонов)")
                     
-                logger.info(f"🔑 Ключевые слова: {keywords}")
-                
-                # Получаем чаты для этого шаблона
-                monitored_chats = template.get('chat_ids', [])
-                if not monitored_chats:
-                    logger.warning(f"⚠️ Нет чатов для мониторинга в шаблоне '{template_name}' - пропускаем")
-                    continue
+                    # Сообщения чата приходят push-событиями - опрос только догоняющий
+                    if not self._should_poll_realtime_chat(chat_id):
+                        skipped_chats += 1
+                        logger.info("    📡 Чат обрабатывается push-событиями - догоняющий опрос позже")
+                        continue
                     
-                logger.info(f"💬 Мониторим {len(monitored_chats)} чатов: {monitored_chats}")
-                
-                # Статистика по шаблону
-                template_messages = 0
-                template_keyword_matches = 0
-                template_ai_analyzed = 0
-                template_clients_found = 0
-                
-                # Обрабатываем каждый чат
-                for chat_idx, chat_id in enumerate(monitored_chats, 1):
-                    try:
-                        logger.info(f"  📱 ЧАТ {chat_idx}/{len(monitored_chats)}: {chat_id}")
+                    # Адаптивный опрос: тихие чаты читаем реже, чем запускаются их шаблоны
+                    if self.chat_rates is not None and not self.chat_rates.should_poll(user_id, chat_id, *self._poll_bounds(watchers)):
+                        skipped_chats += 1
+                        logger.info("    💤 Чат тихий - пропускаем до следующего опроса")
+                        continue
+                    
+                    # Чат читается один раз на все шаблоны: от курсоров и/или по самому широкому окну
+                    cursor_messages, window_messages, poll_window_minutes = await self._fetch_chat_for_watchers(user_id, chat_id, watchers)
+                    
+                    if not cursor_messages and not window_messages:
+                        logger.info("    📭 Нет новых сообщений")
+                        continue
+                    
+                    logger.info(f"    📨 Получено {len(cursor_messages)} сообщений после курсоров, {len(window_messages)} - по окну")
+                    
+                    for watcher in watchers:
+                        template = watcher['template']
+                        template_id = template.get('id')
                         
-                        # Получаем сообщения
-                        lookback_minutes = template.get('lookback_minutes', 5)
-                        messages = await self._get_recent_messages(chat_id, lookback_minutes)
+                        # Каждому шаблону - только его часть пачки (по курсору или окну)
+                        has_cursor = bool(self.cursor_store.get(template_id, chat_id))
+                        template_messages = self._select_messages_for_template(
+                            template, chat_id, cursor_messages if has_cursor else window_messages, poll_window_minutes
+                        )
                         
-                        if not messages:
-                            logger.info(f"    📭 Нет новых сообщений за последние {lookback_minutes} минут")
-                            continue
-                            
-                        template_messages += len(messages)
-                        logger.info(f"    📨 Найдено {len(messages)} сообщений за последние {lookback_minutes} минут")
+                        # Курсор - до последнего сообщения, которое шаблон действительно обработал
+                        if template_messages:
+                            self.cursor_store.advance(
+                                template_id, chat_id,
+                                max(int(m['message_id']) for m in template_messages)
+                            )
                         
-                        # Анализируем каждое сообщение
-                        chat_keyword_matches = 0
-                        logger.info(f"    🔄 НАЧИНАЕМ обработку {len(messages)} сообщений")
-                        logger.info(f"    🔑 Ключевые слова для поиска: {keywords} (количество: {len(keywords)})")
-
-                        for msg_idx, message in enumerate(messages, 1):
-                            try:
-                                message_text = message.get('text', '')
-                                
-                                logger.info(f"    📨 СООБЩЕНИЕ {msg_idx}/{len(messages)}:")
-                                logger.info(f"        📝 Текст: '{message_text}'")
-                                logger.info(f"        📏 Длина: {len(message_text)} символов")
-                                
-                                # Проверяем условия перед вызовом функции поиска
-                                if not message_text:
-                                    logger.info(f"        ⚠️ Пустое сообщение - пропускаем")
-                                    continue
-                                    
-                                if not keywords:
-                                    logger.info(f"        ⚠️ Нет ключевых слов - пропускаем")
-                                    continue
-                                    
-                                logger.info(f"        🚀 ВЫЗЫВАЕМ _find_keywords_in_message")
-                                
-                                matched_keywords = self._find_keywords_in_message(message_text, keywords)
-                                
-                                logger.info(f"        ✅ РЕЗУЛЬТАТ поиска: {matched_keywords}")
-                                
-                                if matched_keywords:
-                                    chat_keyword_matches += 1
-                                    template_keyword_matches += 1
-                                    
-                                    logger.info(f"    🎯 СОВПАДЕНИЕ ключевых слов: {matched_keywords}")
-                                    logger.info(f"    💬 Сообщение: '{message_text[:100]}...'")
-                                    
-                                    # Анализ через ИИ
-                                    try:
-                                        template_ai_analyzed += 1
-                                        await self._analyze_message_with_ai(
-                                            user_id, chat_id, 
-                                            message.get('chat_title', f'Chat {chat_id}'),
-                                            {
-                                                'message': message,
-                                                'template': template,
-                                                'matched_keywords': matched_keywords
-                                            },
-                                            settings
-                                        )
-                                        template_clients_found += 1
-                                        
-                                    except Exception as ai_error:
-                                        logger.error(f"    ❌ Ошибка AI анализа: {ai_error}")
-                                        
-                            except Exception as msg_error:
-                                logger.error(f"    ❌ Ошибка обработки сообщения {msg_idx}: {msg_error}")
-                                continue
+                        chat_stats, candidates = self._match_template_messages(
+                            template, watcher['keywords'], chat_id, template_messages
+                        )
                         
-                        if chat_keyword_matches > 0:
-                            logger.info(f"    ✅ Чат обработан: {chat_keyword_matches} совпадений ключевых слов")
-                        else:
-                            logger.info(f"    ⚪ Чат обработан: совпадений не найдено")
-                    
-                    except Exception as chat_error:
-                        logger.error(f"    ❌ Ошибка обработки чата {chat_id}: {chat_error}")
-                        continue
+                        # Почти-дубликаты недавних сообщений в AI не отправляем
+                        candidates = self._filter_near_duplicates(candidates)
+                        
+                        # Совпадения уходят в очередь AI-анализа пакетами, не блокируя чтение чатов
+                        buffer = ai_buffers.setdefault(template_id, [])
+                        buffer.extend(candidates)
+                        while len(buffer) >= batch_size:
+                            batch, buffer[:] = buffer[:batch_size], buffer[batch_size:]
+                            pending_ai.append((template_id, self._submit_candidates(user_id, settings, batch)))
+                        
+                        stats = template_stats.setdefault(template_id, self._new_template_stats())
+                        for key, value in chat_stats.items():
+                            stats[key] += value
                 
-                # Статистика по шаблону
-                logger.info(f"📈 ИТОГ ШАБЛОНА '{template_name}':")
-                logger.info(f"   📨 Сообщений проанализировано: {template_messages}")
-                logger.info(f"   🎯 Совпадений ключевых слов: {template_keyword_matches}")
-                logger.info(f"   🤖 Отправлено в AI: {template_ai_analyzed}")
-                logger.info(f"   ✅ Потенциальных клиентов: {template_clients_found}")
+                except Exception as chat_error:
+                    logger.error(f"    ❌ Ошибка обработки чата {chat_id}: {chat_error}")
+                    continue
+            
+            # Неполные пакеты тоже отправляем
+            for template_id, buffer in ai_buffers.items():
+                if buffer:
+                    pending_ai.append((template_id, self._submit_candidates(user_id, settings, buffer)))
+            
+            # Сохраняем курсоры одним запросом на цикл - не дальше сообщений, ждущих вердикта AI
+            await self.cursor_store.flush()
+            
+            # Дожидаемся AI-анализа всех совпадений цикла
+            if pending_ai:
+                logger.info(f"🤖 Ожидаем AI-анализ {len(pending_ai)} пакетов")
+                results = await asyncio.gather(*(future for _, future in pending_ai), return_exceptions=True)
+                for (template_id, _), result in zip(pending_ai, results):
+                    stats = template_stats[template_id]
+                    if isinstance(result, Exception):
+                        logger.error(f"    ❌ Ошибка AI анализа: {result}")
+                        continue
+                    outcomes, usage = result
+                    for key, value in usage.items():
+                        stats[key] += value
+                    stats['clients_found'] += sum(1 for is_client in outcomes if is_client)
                 
-                # Добавляем к общей статистике
-                total_messages_found += template_messages
-                total_keyword_matches += template_keyword_matches
-                total_ai_analyzed += template_ai_analyzed
-                total_clients_found += template_clients_found
+                # Курсоры после вердиктов: сохраненная позиция догоняет позицию чтения
+                await self.cursor_store.flush()
+            
+            # Статистика по шаблонам
+            for template in templates:
+                stats = template_stats.get(template.get('id'))
+                if not stats:
+                    continue
+                logger.info(f"📈 ИТОГ ШАБЛОНА '{template.get('name', 'Unknown')}':")
+                logger.info(f"   📨 Сообщений проанализировано: {stats['messages']}")
+                logger.info(f"   🎯 Совпадений ключевых слов: {stats['keyword_matches']}")
+                logger.info(f"   🤖 Проанализировано AI: {stats['ai_analyzed']} (запросов к OpenAI: {stats['ai_requests']})")
+                logger.info(f"   💾 Вердиктов из кэша: {stats['cache_hits']}")
+                logger.info(f"   ✅ Потенциальных клиентов: {stats['clients_found']}")
             
             # Финальная статистика по всему циклу
             logger.info(f"🏁 ИТОГ МОНИТОРИНГА для пользователя {user_id}:")
             logger.info(f"   📋 Шаблонов обработано: {len(templates)}")
-            logger.info(f"   📨 Всего сообщений: {total_messages_found}")
-            logger.info(f"   🎯 Совпадений ключевых слов: {total_keyword_matches}")
-            logger.info(f"   🤖 Отправлено в AI: {total_ai_analyzed}")
-            logger.info(f"   ✅ Найдено клиентов: {total_clients_found}")
+            logger.info(f"   💬 Чатов прочитано: {len(plan) - skipped_chats} (пропущено тихих и push: {skipped_chats})")
+            logger.info(f"   📨 Всего сообщений: {sum(s['messages'] for s in template_stats.values())}")
+            logger.info(f"   🎯 Совпадений ключевых слов: {sum(s['keyword_matches'] for s in template_stats.values())}")
+            logger.info(f"   🤖 Проанализировано AI: {sum(s['ai_analyzed'] for s in template_stats.values())} "
+                        f"(запросов к OpenAI: {sum(s['ai_requests'] for s in template_stats.values())})")
+            logger.info(f"   💾 Вердиктов из кэша: {sum(s['cache_hits'] for s in template_stats.values())}")
+            logger.info(f"   ✅ Найдено клиентов: {sum(s['clients_found'] for s in template_stats.values())}")
             
         except Exception as e:
             logger.error(f"💥 КРИТИЧЕСКАЯ ОШИБКА в мониторинге пользователя {user_id}: {e}")
             raise
+    
+    @staticmethod
+    def _new_template_stats() -> Dict[str, int]:
+        """Пустая статистика шаблона за цикл"""
+        return {
+            'messages': 0, 'keyword_matches': 0, 'ai_requests': 0, 'ai_analyzed': 0, 'cache_hits': 0, 'clients_found': 0
+        }
+    
+    def _build_cycle_plan(self, templates: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Инвертировать шаблоны в план цикла: chat_id -> [{template, keywords}]"""
+        plan: Dict[str, List[Dict[str, Any]]] = {}
+        
+        for template in templates:
+            template_name = template.get('name', 'Unknown')
+            
+            keywords = self._parse_keywords(template.get('keywords'))
+            if not keywords:
+                logger.warning(f"⚠️ Нет ключевых слов в шаблоне '{template_name}' - пропускаем")
+                continue
+            
+            monitored_chats = template.get('chat_ids', [])
+            if not monitored_chats:
+                logger.warning(f"⚠️ Нет чатов для мониторинга в шаблоне '{template_name}' - пропускаем")
+                continue
+            
+            for chat_id in monitored_chats:
+                plan.setdefault(str(chat_id), []).append({
+                    'template': template,
+                    'keywords': keywords
+                })
+        
+        return plan
+    
+    async def _fetch_chat_for_watchers(
+        self,
+        user_id: int,
+        chat_id: str,
+        watchers: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]:
+        """
+        Прочитать чат один раз для всех шаблонов
+        
+        Шаблонам с курсором - чтение вперед после самого старого курсора.
+        Шаблонам без курсора - отдельное чтение по самому широкому окну
+        lookback_minutes: последние 100 сообщений окна не должны подменять
+        чтение от курсора, иначе в активном чате пропадут сообщения между
+        курсором и началом окна.
+        
+        Returns:
+            (сообщения после курсоров, сообщения окна,
+             окно опроса в минутах - время с прошлого чтения чата)
+        """
+        cursors = [self.cursor_store.get(w['template'].get('id'), chat_id) for w in watchers]
+        lookback_minutes = max(w['template'].get('lookback_minutes', 5) for w in watchers)
+        
+        # Чат мог пропускать запуски шаблонов - окно покрывает время с прошлого опроса этим пользователем
+        poll_window_minutes = 0
+        since_last_poll = self.chat_rates.minutes_since_last_poll(user_id, chat_id) if self.chat_rates else None
+        if since_last_poll is not None:
+            poll_window_minutes = min(int(since_last_poll) + 1, settings.SCHEDULER_MAX_LOOKBACK_MINUTES)
+        
+        cursor_messages: List[Dict[str, Any]] = []
+        window_messages: List[Dict[str, Any]] = []
+        if any(cursors):
+            cursor_messages = await self._get_recent_messages(chat_id, 0, min_id=min(c for c in cursors if c))
+        if not all(cursors):
+            lookback_minutes = max(lookback_minutes, poll_window_minutes)
+            window_messages = await self._get_recent_messages(chat_id, lookback_minutes)
+        
+        if self.chat_rates is not None:
+            observed = {m['message_id']: m for m in cursor_messages + window_messages}
+            self.chat_rates.observe(user_id, chat_id, list(observed.values()), lookback_minutes)
+        return cursor_messages, window_messages, poll_window_minutes
+    
+    def _poll_bounds(self, watchers: List[Dict[str, Any]]) -> Tuple[float, float]:
+        """
+        Границы интервала опроса чата в минутах
+        
+        Нижняя - самый частый check_interval_minutes среди шаблонов чата, верхняя -
+        самый строгий max_check_interval_minutes (или CHAT_POLL_MAX_INTERVAL_MINUTES).
+        """
+        min_interval = min(float(w['template'].get('check_interval_minutes') or 5) for w in watchers)
+        max_interval = min(
+            float(w['template'].get('max_check_interval_minutes') or settings.CHAT_POLL_MAX_INTERVAL_MINUTES)
+            for w in watchers
+        )
+        return min_interval, max(min_interval, max_interval)
+    
+    def _select_messages_for_template(
+        self,
+        template: Dict[str, Any],
+        chat_id: str,
+        messages: List[Dict[str, Any]],
+        poll_window_minutes: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Отобрать из общей пачки сообщения, которые шаблон еще не видел
+        
+        Без курсора - окно шаблона, расширенное до окна опроса: сообщения
+        из пропущенных опросов чата шаблон тоже еще не видел.
+        """
+        cursor = self.cursor_store.get(template.get('id'), chat_id)
+        if cursor:
+            return [m for m in messages if int(m['message_id']) > cursor]
+        
+        window_minutes = max(template.get('lookback_minutes', 5), poll_window_minutes)
+        cutoff_time = datetime.now(timezone.utc) - timedelta(minutes=window_minutes)
+        return [
+            m for m in messages
+            if m.get('date') and datetime.fromisoformat(m['date'].replace('Z', '+00:00')) >= cutoff_time
+        ]
+    
+    def _match_template_messages(
+        self,
+        template: Dict[str, Any],
+        keywords: List[str],
+        chat_id: str,
+        messages: List[Dict[str, Any]]
+    ) -> Tuple[Dict[str, int], List[Dict[str, Any]]]:
+        """
+        Проверить пачку сообщений чата ключевыми словами шаблона
+        
+        Returns:
+            (статистика, кандидаты для AI-анализа)
+        """
+        template_id = template.get('id')
+        stats = {**self._new_template_stats(), 'messages': len(messages)}
+        candidates = []
+        
+        for msg_idx, message in enumerate(messages, 1):
+            try:
+                message_text = message.get('text', '')
+                if not message_text:
+                    continue
+                
+                matched_keywords = self._find_keywords_in_message(message_text, keywords, template)
+                shadow_matched = self._shadow_match(message_text, keywords, template)
+                if not matched_keywords:
+                    if shadow_matched:
+                        self._record_shadow_only_match(template)
+                    continue
+                
+                if not self._mark_processed(template_id, chat_id, message.get('message_id')):
+                    logger.info("    ⏭️ Сообщение уже обработано - пропускаем")
+                    continue
+                
+                stats['keyword_matches'] += 1
+                self._record_keyword_match(template, shadow_matched)
+                
+                logger.info(f"    🎯 СОВПАДЕНИЕ ключевых слов ('{template.get('name', 'Unknown')}'): {matched_keywords}")
+                logger.info(f"    💬 Сообщение: '{message_text[:100]}...'")
+                
+                candidates.append({
+                    'message': message,
+                    'template': template,
+                    'matched_keywords': matched_keywords,
+                    'shadow_matched': shadow_matched,
+                    'chat_id': chat_id,
+                    'chat_name': message.get('chat_title', f'Chat {chat_id}')
+                })
+                    
+            except Exception as msg_error:
+                logger.error(f"    ❌ Ошибка обработки сообщения {msg_idx}: {msg_error}")
+                continue
+        
+        return stats, candidates
+    
+    def _filter_near_duplicates(self, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Убрать кандидатов, почти совпадающих с недавними сообщениями того же автора в шаблоне
+        
+        Отсеченная копия засчитывается исходному сообщению: если оно стало
+        клиентом, счетчик попадает в potential_clients.duplicate_count.
+        """
+        if self.duplicate_detector is None:
+            return candidates
+        
+        unique = []
+        for candidate in candidates:
+            message = candidate['message']
+            info = {
+                'chat_id': candidate['chat_id'],
+                'message_id': message.get('message_id'),
+                'sender_id': message.get('sender_id'),
+                'suppressed': 0
+            }
+            original = self.duplicate_detector.check(candidate['template'].get('id'), message.get('text', ''), info)
+            if original is None:
+                candidate['duplicate_info'] = info
+                unique.append(candidate)
+                continue
+            
+            original['suppressed'] = original.get('suppressed', 0) + 1
+            if original.get('lead_key'):
+                self.lead_writer.add_duplicates(original['lead_key'])
+            logger.info(f"    ♻️ Почти-дубликат сообщения {original['message_id']} из чата {original['chat_id']} от того же автора - пропускаем")
+        return unique
+    
+    def _ai_batch_size(self) -> int:
+        """Сколько сообщений шаблона отправлять в OpenAI одним запросом"""
+        return max(1, settings.OPENAI_BATCH_SIZE)
+    
+    def _submit_candidates(
+        self,
+        user_id: int,
+        settings: Dict[str, Any],
+        candidates: List[Dict[str, Any]]
+    ) -> asyncio.Future:
+        """
+        Поставить пакет кандидатов одного шаблона в AI-анализ
+        
+        Future вернет (List[bool], расход AI) - см. _analyze_candidates_with_ai.
+        
+        До вердикта сообщения удерживают сохраняемый курсор чата.
+        """
+        for candidate in candidates:
+            self._hold_cursor(candidate)
+        return asyncio.ensure_future(self._analyze_or_defer(user_id, settings, candidates))
+    
+    async def _analyze_or_defer(
+        self,
+        user_id: int,
+        settings: Dict[str, Any],
+        candidates: List[Dict[str, Any]]
+    ) -> Tuple[List[bool], Dict[str, int]]:
+        """AI-анализ пакета; при непредвиденной ошибке весь пакет откладывается до следующего цикла"""
+        try:
+            return await self._analyze_candidates_with_ai(user_id, settings, candidates)
+        except Exception as e:
+            logger.error(f"❌ Ошибка AI анализа {len(candidates)} сообщений: {e}")
+            for candidate in candidates:
+                self._defer_candidate(user_id, candidate)
+            return [False] * len(candidates), self._new_ai_usage()
+    
+    @staticmethod
+    def _new_ai_usage() -> Dict[str, int]:
+        """
+        Расход AI на пакет кандидатов
+        
+        ai_requests - запросов к OpenAI (с повторами и поштучными переспросами),
+        ai_analyzed - кандидатов с вердиктом от OpenAI, cache_hits - с вердиктом из кэша.
+        """
+        return {'ai_requests': 0, 'ai_analyzed': 0, 'cache_hits': 0}
+    
+    def _hold_cursor(self, candidate: Dict[str, Any]):
+        """Удержать сохраняемый курсор чата на сообщении кандидата до вердикта"""
+        self.cursor_store.hold(candidate['template'].get('id'), candidate['chat_id'], int(candidate['message'].get('message_id') or 0))
+    
+    def _release_cursor(self, candidate: Dict[str, Any]):
+        """Сообщение кандидата больше не удерживает курсор"""
+        self.cursor_store.release(candidate['template'].get('id'), candidate['chat_id'], int(candidate['message'].get('message_id') or 0))
+    
+    async def _run_ai_request(self, job, estimated_tokens: int, usage: Optional[Dict[str, int]] = None):
+        """
+        Запрос к OpenAI через AI-пул: каждая попытка берет свои RPM/TPM токены
+        
+        После лимита или сбоя OpenAI ждем с экспоненциальной паузой (вне воркера
+        пула) и повторяем; остальные ошибки не повторяются. Каждая попытка
+        засчитывается в usage['ai_requests'].
+        """
+        for attempt in range(settings.AI_MAX_RETRIES + 1):
+            if usage is not None:
+                usage['ai_requests'] += 1
+            try:
+                return await self.ai_pool.submit(job, estimated_tokens=estimated_tokens)
+            except TRANSIENT_AI_ERRORS as e:
+                if attempt == settings.AI_MAX_RETRIES:
+                    raise
+                delay = settings.AI_RETRY_BASE_SECONDS * 2 ** attempt
+                logger.warning(f"⏳ Лимит или сбой OpenAI (попытка {attempt + 1}), повтор через {delay:.0f}с: {e}")
+                await asyncio.sleep(delay)
             
     def _parse_keywords(self, keywords_raw) -> List[str]:
         """Парсинг ключевых слов из БД"""
@@ -239,20 +790,38 @@ class ClientMonitoringService:
     async def _get_user_templates(self, user_id: int) -> List[Dict[str, Any]]:
         """Получить активные шаблоны пользователя"""
         try:
-            result = supabase_client.table('product_templates').select('*').eq('user_id', user_id).eq('is_active', True).execute()
+            result = await db_execute(supabase_client.table('product_templates').select('*').eq('user_id', user_id).eq('is_active', True))
             return result.data or []
         except Exception as e:
             logger.error(f"Error getting user templates: {e}")
             return []
     
-    async def _get_recent_messages(self, chat_id: str, lookback_minutes: int) -> List[Dict[str, Any]]:
-        """Получить сообщения за последние N минут"""
+    async def _get_recent_messages(
+        self,
+        chat_id: str,
+        lookback_minutes: int,
+        min_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Получить новые сообщения чата
+        
+        Если есть курсор (min_id) - только сообщения после него, без окна по времени.
+        Иначе (первый запуск) - сообщения за последние N минут.
+        """
         try:
+            if min_id:
+                logger.debug(f"Getting messages after message_id={min_id} from chat {chat_id}")
+                return await self.telegram_pool.get_group_messages(
+                    group_id=chat_id,
+                    limit=100,
+                    min_id=min_id
+                )
+            
             logger.debug(f"Getting messages from last {lookback_minutes} minutes from chat {chat_id}")
             
             cutoff_time = datetime.now(timezone.utc) - timedelta(minutes=lookback_minutes)
             
-            messages = await self.telegram_service.get_group_messages(
+            messages = await self.telegram_pool.get_group_messages(
                 group_id=chat_id,
                 limit=100,
                 offset_date=cutoff_time
@@ -272,28 +841,81 @@ class ClientMonitoringService:
             logger.error(f"Error getting messages from chat {chat_id}: {e}")
             return []
     
-    def _find_keywords_in_message(self, message_text: str, keywords: List[str]) -> List[str]:
-        """Поиск ключевых слов в сообщении"""
+    def _find_keywords_in_message(
+        self,
+        message_text: str,
+        keywords: List[str],
+        template: Optional[Dict[str, Any]] = None
+    ) -> List[str]:
+        """Поиск ключевых слов в сообщении (скомпилированный матчер, один проход по тексту)"""
         if not message_text or not keywords:
             return []
         
-        logger.info(f"🔍 ПОИСК: '{message_text}'")
-        logger.info(f"🔑 Ключевые слова: {keywords}")
+        mode = self._get_match_mode(template)
+        found_keywords = get_keyword_matcher(keywords, mode).find(message_text)
         
-        found_keywords = []
-        message_lower = message_text.lower()
-        
-        for keyword in keywords:
-            keyword_lower = keyword.lower()
-            if keyword_lower in message_lower:
-                found_keywords.append(keyword)
-                logger.info(f"   ✅ '{keyword}' → НАЙДЕНО")
-            else:
-                logger.info(f"   ❌ '{keyword}' → НЕ НАЙДЕНО")
-        
-        logger.info(f"🎯 Итого найдено: {found_keywords}")
+        if settings.ENABLE_DEBUG_LOGGING:
+            logger.debug(f"🎯 Ключевые слова {keywords} ({mode}) → найдено: {found_keywords}")
         return found_keywords
     
+    def _get_match_mode(self, template: Optional[Dict[str, Any]]) -> str:
+        """Режим сопоставления: поле шаблона match_mode или глобальная настройка"""
+        return (template or {}).get('match_mode') or settings.KEYWORD_MATCH_MODE
+    
+    def _get_shadow_mode(self, template: Optional[Dict[str, Any]]) -> str:
+        """Второй режим сопоставления - для теневых счетчиков"""
+        return MATCH_MODE_SUBSTRING if self._get_match_mode(template) == MATCH_MODE_STEM else MATCH_MODE_STEM
+    
+    def _shadow_match(self, message_text: str, keywords: List[str], template: Dict[str, Any]) -> bool:
+        """Совпало бы сообщение с ключевыми словами во втором режиме"""
+        if not settings.KEYWORD_SHADOW_MATCHING or not message_text or not keywords:
+            return False
+        return bool(get_keyword_matcher(keywords, self._get_shadow_mode(template)).find(message_text))
+    
+    def _record_keyword_match(self, template: Dict[str, Any], shadow_matched: bool):
+        """Совпадение в текущем режиме (и во втором, если оно там тоже есть) - уходит в AI"""
+        self._record_match_stat(template, 'keyword_matches')
+        if shadow_matched:
+            self._record_match_stat(template, 'shadow_matches', self._get_shadow_mode(template))
+    
+    def _record_shadow_only_match(self, template: Dict[str, Any]):
+        """Совпадение только во втором режиме: в AI не уходит, вердикта по нему не будет"""
+        shadow_mode = self._get_shadow_mode(template)
+        self._record_match_stat(template, 'shadow_matches', shadow_mode)
+        self._record_match_stat(template, 'shadow_unjudged', shadow_mode)
+    
+    def _record_match_stat(self, template: Dict[str, Any], counter: str, mode: Optional[str] = None):
+        """Увеличить счетчик точности шаблона (по умолчанию - для текущего режима сопоставления)"""
+        mode_stats = self.match_stats.setdefault(template.get('id'), {}).setdefault(
+            mode or self._get_match_mode(template),
+            {
+                'keyword_matches': 0, 'ai_confirmed': 0, 'ai_rejected': 0,
+                'shadow_matches': 0, 'shadow_confirmed': 0, 'shadow_rejected': 0, 'shadow_unjudged': 0
+            }
+        )
+        mode_stats[counter] += 1
+    
+    def get_match_stats(self) -> Dict[str, Any]:
+        """
+        Счетчики точности по шаблонам: доля совпадений, подтвержденных AI
+        
+        shadow_precision - точность второго режима на тех его совпадениях,
+        которые попали в AI через текущий режим; shadow_unjudged - совпадения
+        только второго режима, без вердикта.
+        """
+        report = {}
+        for template_id, modes in self.match_stats.items():
+            report[str(template_id)] = {}
+            for mode, counters in modes.items():
+                judged = counters['ai_confirmed'] + counters['ai_rejected']
+                shadow_judged = counters['shadow_confirmed'] + counters['shadow_rejected']
+                report[str(template_id)][mode] = {
+                    **counters,
+                    'precision': round(counters['ai_confirmed'] / judged, 3) if judged else None,
+                    'shadow_precision': round(counters['shadow_confirmed'] / shadow_judged, 3) if shadow_judged else None
+                }
+        return report
+    
     async def _analyze_message_with_ai(
         self, 
         user_id: int, 
@@ -301,79 +923,267 @@ class ClientMonitoringService:
         chat_name: str,
         message_data: Dict[str, Any], 
         settings: Dict[str, Any]
-    ):
-        """Анализ сообщения через ИИ - упрощенная логика"""
-        try:
-            message = message_data['message']
-            template = message_data['template']
-            matched_keywords = message_data['matched_keywords']
-            
-            # Подготавливаем данные для ИИ
-            author_info = {
-               'telegram_id': message.get('from_id', 'unknown'),
-               'username': message.get('user_info', {}).get('username', ''),       # ✅ ПРАВИЛЬНО
-               'first_name': message.get('user_info', {}).get('first_name', ''),   # ✅ ПРАВИЛЬНО
-               'last_name': message.get('user_info', {}).get('last_name', '')      # ✅ ПРАВИЛЬНО
-            }
-            
-            chat_info = {
-                'chat_id': chat_id,
-                'chat_name': chat_name
-            }
-            
-            message_text = message.get('text', '')  # ← ИЗМЕНЕНО: было 'message'
-            
-            logger.info(f"🤖 AI анализ сообщения от @{author_info.get('username', 'unknown')} в чате {chat_name}")
-            
-            # Вызываем ИИ анализ (убрали custom_prompt и confidence)
-            ai_result = await self.openai_service.analyze_potential_client(
-                message_text=message_text,
-                product_name=template.get('name', 'Unknown Product'),
-                keywords=template.get('keywords', []),
-                matched_keywords=matched_keywords,
-                author_info=author_info,
-                chat_info=chat_info
-            )
-            
-            # Простая проверка: клиент или нет
-            if ai_result.get('is_client', False):
-                logger.info(f"✅ AI определил как КЛИЕНТА: {ai_result.get('reasoning', '')[:100]}...")
-                
-                # Сохраняем потенциального клиента
-                await self._save_potential_client(
-                    user_id=user_id,
-                    message=message,
-                    template=template,
-                    matched_keywords=matched_keywords,
-                    ai_result=ai_result,
-                    chat_id=chat_id,
-                    chat_name=chat_name
+    ) -> bool:
+        """Анализ одного сообщения через ИИ. True - если сохранен как клиент"""
+        candidate = {
+            'message': message_data['message'],
+            'template': message_data['template'],
+            'matched_keywords': message_data['matched_keywords'],
+            'chat_id': chat_id,
+            'chat_name': chat_name
+        }
+        outcomes, _ = await self._analyze_candidates_with_ai(user_id, settings, [candidate])
+        return outcomes[0]
+    
+    async def _analyze_candidates_with_ai(
+        self,
+        user_id: int,
+        settings: Dict[str, Any],
+        candidates: List[Dict[str, Any]]
+    ) -> Tuple[List[bool], Dict[str, int]]:
+        """
+        Пакетный анализ кандидатов одного шаблона через ИИ
+        
+        Вердикты из кэша берутся до AI-пула и токенов не тратят. Остальные
+        сообщения уходят одним запросом через пул. Сообщения, для которых
+        в ответе пакета нет вердикта, переспрашиваются поштучно - тоже через
+        пул, каждое под своими токенами. Если не удался сам запрос пакета,
+        поштучных запросов нет. Кандидат без вердикта клиентом не считается
+        и не сохраняется - он откладывается до следующего цикла пользователя.
+        
+        Returns:
+            (для каждого кандидата: True - если сохранен как клиент,
+             расход AI - см. _new_ai_usage)
+        """
+        usage = self._new_ai_usage()
+        template = candidates[0]['template']
+        product_name = template.get('name', 'Unknown Product')
+        keys = [self._verdict_key(candidate) for candidate in candidates]
+        
+        # Повторы одного и того же текста (спам, репосты) берем из кэша вердиктов
+        ai_results = await self._cached_ai_results(candidates, keys)
+        requested = [idx for idx, result in enumerate(ai_results) if result is None]
+        usage['cache_hits'] = len(candidates) - len(requested)
+        if len(requested) < len(candidates):
+            logger.info(f"💾 Кэш вердиктов: {len(candidates) - len(requested)}/{len(candidates)} без запроса к AI")
+        
+        batch_failed = False
+        if requested:
+            batch = [candidates[idx] for idx in requested]
+            try:
+                batch_results = await self._run_ai_request(
+                    lambda: self._analyze_batch_job(batch, [keys[idx] for idx in requested], product_name),
+                    estimated_tokens=sum(estimate_tokens(c['message'].get('text', '')) for c in batch),
+                    usage=usage
                 )
+                for idx, result in zip(requested, batch_results):
+                    ai_results[idx] = result
+            except Exception as e:
+                logger.error(f"❌ Ошибка AI анализа {len(batch)} сообщений шаблона '{template.get('name', 'Unknown')}': {e}")
+                batch_failed = True
+        
+        if not batch_failed:
+            missing = [idx for idx in requested if ai_results[idx] is None]
+            if missing:
+                logger.warning(f"⚠️ Нет вердикта в ответе пакета для {len(missing)} сообщений - анализируем по одному")
+                single_results = await asyncio.gather(*(
+                    self._run_ai_request(
+                        lambda candidate=candidates[idx]: self._analyze_single_job(candidate, product_name),
+                        estimated_tokens=estimate_tokens(candidates[idx]['message'].get('text', '')),
+                        usage=usage
+                    )
+                    for idx in missing
+                ), return_exceptions=True)
                 
-                # ДОБАВЛЕНО: Отправляем уведомления
-                await self._send_notifications(
-                    user_id=user_id,
-                    message=message,
-                    template=template, 
-                    ai_result=ai_result,
-                    settings=settings
+                for idx, result in zip(missing, single_results):
+                    if isinstance(result, Exception):
+                        logger.error(f"❌ Ошибка AI анализа сообщения {candidates[idx]['message'].get('message_id')}: {result}")
+                        continue
+                    ai_results[idx] = result
+                    if self.verdict_cache is not None:
+                        await self.verdict_cache.set(keys[idx], result)
+        
+        usage['ai_analyzed'] = sum(1 for idx in requested if ai_results[idx] is not None)
+        
+        outcomes = []
+        for candidate, ai_result in zip(candidates, ai_results):
+            # Ошибка AI - не вердикт: такое сообщение не сохраняем и не учитываем в точности,
+            # а повторяем в следующем цикле - курсор чата его уже прошел
+            if ai_result is None:
+                self._defer_candidate(user_id, candidate)
+                outcomes.append(False)
+                continue
+            self._release_cursor(candidate)
+            try:
+                outcomes.append(await self._handle_ai_result(user_id, settings, candidate, ai_result))
+            except Exception as e:
+                logger.error(f"Ошибка обработки результата AI: {e}")
+                outcomes.append(False)
+        return outcomes, usage
+    
+    def _defer_candidate(self, user_id: int, candidate: Dict[str, Any]):
+        """Отложить кандидата без вердикта AI до следующего цикла пользователя"""
+        attempts = candidate.get('ai_attempts', 0) + 1
+        message_id = candidate['message'].get('message_id')
+        if attempts > settings.AI_DEFERRED_MAX_CYCLES:
+            logger.error(f"❌ Сообщение {message_id} из чата {candidate['chat_id']} осталось без вердикта AI после {attempts - 1} циклов - пропускаем")
+            self._release_cursor(candidate)
+            return
+        
+        deferred = self._deferred_candidates.setdefault(user_id, OrderedDict())
+        deferred[(candidate['template'].get('id'), str(candidate['chat_id']), str(message_id))] = {
+            **candidate, 'ai_attempts': attempts
+        }
+        while len(deferred) > settings.AI_DEFERRED_QUEUE_SIZE:
+            _, dropped = deferred.popitem(last=False)
+            self._release_cursor(dropped)
+            logger.error(f"❌ Очередь отложенных кандидатов переполнена - сообщение {dropped['message'].get('message_id')} пропущено")
+        logger.warning(f"🔁 Сообщение {message_id} без вердикта AI - повторим в следующем цикле (попытка {attempts})")
+    
+    def _take_deferred_candidates(
+        self,
+        user_id: int,
+        templates: List[Dict[str, Any]]
+    ) -> Dict[Any, List[Dict[str, Any]]]:
+        """Забрать отложенных кандидатов запускаемых шаблонов: template_id -> кандидаты"""
+        deferred = self._deferred_candidates.get(user_id)
+        if not deferred:
+            return {}
+        
+        templates_by_id = {t.get('id'): t for t in templates}
+        taken: Dict[Any, List[Dict[str, Any]]] = {}
+        for key in [key for key in deferred if key[0] in templates_by_id]:
+            candidate = deferred.pop(key)
+            # Шаблон берем текущий - название и ключевые слова могли измениться
+            candidate['template'] = templates_by_id[key[0]]
+            taken.setdefault(key[0], []).append(candidate)
+        
+        if taken:
+            logger.info(f"🔁 Повторный AI-анализ {sum(len(c) for c in taken.values())} отложенных сообщений")
+        return taken
+    
+    async def _cached_ai_results(
+        self,
+        candidates: List[Dict[str, Any]],
+        keys: List[str]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Вердикты кандидатов из кэша; None - вердикта в кэше нет"""
+        ai_results: List[Optional[Dict[str, Any]]] = [None] * len(candidates)
+        if self.verdict_cache is None:
+            return ai_results
+        
+        for idx, (candidate, key) in enumerate(zip(candidates, keys)):
+            verdict = await self.verdict_cache.get(key)
+            if verdict is not None:
+                item = self._build_ai_item(candidate)
+                ai_results[idx] = self.openai_service._build_result(
+                    verdict['is_client'], verdict['reasoning'], item['matched_keywords'],
+                    item['author_info'], item['chat_info'], item['message_text']
                 )
-            else:
-                logger.info(f"❌ AI определил как НЕ КЛИЕНТА: {ai_result.get('reasoning', '')[:100]}...")
-                
-        except Exception as e:
-            logger.error(f"Ошибка AI анализа: {e}")
-            
-            # ✅ ИСПРАВЛЕНО: При ошибке сохраняем для ручной проверки
-            await self._save_potential_client(
+        return ai_results
+    
+    async def _analyze_batch_job(
+        self,
+        candidates: List[Dict[str, Any]],
+        keys: List[str],
+        product_name: str
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Задача AI-пула: вердикты пакета одним запросом; None - вердикта нет"""
+        logger.info(f"🤖 AI анализ {len(candidates)} сообщений для шаблона '{product_name}'")
+        
+        ai_results = await self.openai_service.analyze_potential_clients_batch(
+            [self._build_ai_item(candidate) for candidate in candidates],
+            product_name=product_name
+        )
+        if self.verdict_cache is not None:
+            for key, ai_result in zip(keys, ai_results):
+                if ai_result is not None:
+                    await self.verdict_cache.set(key, ai_result)
+        
+        return ai_results
+    
+    async def _analyze_single_job(self, candidate: Dict[str, Any], product_name: str) -> Dict[str, Any]:
+        """Задача AI-пула: вердикт одного сообщения"""
+        return await self.openai_service.analyze_single(self._build_ai_item(candidate), product_name)
+    
+    def _verdict_key(self, candidate: Dict[str, Any]) -> str:
+        """Ключ кэша вердиктов для кандидата"""
+        return verdict_key(
+            candidate['message'].get('text', ''),
+            candidate['matched_keywords'],
+            candidate['template'].get('id'),
+            PROMPT_VERSION
+        )
+    
+    def _build_ai_item(self, candidate: Dict[str, Any]) -> Dict[str, Any]:
+        """Подготовить данные кандидата для ИИ"""
+        message = candidate['message']
+        user_info = message.get('user_info') or {}
+        
+        return {
+            'message_text': message.get('text', ''),
+            'keywords': candidate['template'].get('keywords', []),
+            'matched_keywords': candidate['matched_keywords'],
+            'author_info': {
+                'telegram_id': message.get('sender_id', 'unknown'),
+                'username': user_info.get('username', ''),
+                'first_name': user_info.get('first_name', ''),
+                'last_name': user_info.get('last_name', '')
+            },
+            'chat_info': {
+                'chat_id': candidate['chat_id'],
+                'chat_name': candidate['chat_name']
+            }
+        }
+    
+    async def _handle_ai_result(
+        self,
+        user_id: int,
+        settings: Dict[str, Any],
+        candidate: Dict[str, Any],
+        ai_result: Dict[str, Any]
+    ) -> bool:
+        """Сохранить клиента и отправить уведомления по вердикту ИИ"""
+        template = candidate['template']
+        
+        is_client = ai_result.get('is_client', False)
+        self._record_match_stat(template, 'ai_confirmed' if is_client else 'ai_rejected')
+        if candidate.get('shadow_matched'):
+            self._record_match_stat(
+                template, 'shadow_confirmed' if is_client else 'shadow_rejected', self._get_shadow_mode(template)
+            )
+        
+        # Простая проверка: клиент или нет
+        if not ai_result.get('is_client', False):
+            logger.info(f"❌ AI определил как НЕ КЛИЕНТА: {ai_result.get('reasoning', '')[:100]}...")
+            return False
+        
+        logger.info(f"✅ AI определил как КЛИЕНТА: {ai_result.get('reasoning', '')[:100]}...")
+        
+        # Уведомляем только о клиенте, который действительно записан в БД
+        def notify(lead: Dict[str, Any]):
+            self._send_notifications(
                 user_id=user_id,
-                message=message_data['message'],
-                template=message_data['template'],
-                matched_keywords=message_data['matched_keywords'],
-                ai_result={'is_client': True, 'reasoning': f'Ошибка AI: {str(e)}'},
-                chat_id=chat_id,
-                chat_name=chat_name
+                message=candidate['message'],
+                template=template,
+                ai_result=ai_result,
+                settings=settings,
+                lead=lead
             )
+        
+        # Сохраняем потенциального клиента
+        lead = await self._save_potential_client(
+            user_id=user_id,
+            message=candidate['message'],
+            template=template,
+            matched_keywords=candidate['matched_keywords'],
+            ai_result=ai_result,
+            chat_id=candidate['chat_id'],
+            chat_name=candidate['chat_name'],
+            duplicate_info=candidate.get('duplicate_info'),
+            on_inserted=notify
+        )
+        return lead is not None
             
     async def _save_potential_client(
         self, 
@@ -383,17 +1193,25 @@ class ClientMonitoringService:
         matched_keywords: List[str], 
         ai_result: Dict[str, Any],
         chat_id: str,
-        chat_name: str
+        chat_name: str,
+        duplicate_info: Optional[Dict[str, Any]] = None,
+        on_inserted: Optional[Callable[[Dict[str, Any]], None]] = None
     ):
-        """Сохранение потенциального клиента в БД"""
+        """
+        Поставить потенциального клиента в очередь пакетной записи в БД
+        
+        duplicate_info - запись сообщения в детекторе почти-дубликатов: уже
+        отсеченные копии идут в duplicate_count, следующие - через LeadWriter.
+        on_inserted - вызывается со строкой после ее вставки в potential_clients.
+        """
         try:
             client_data = {
                 'user_id': user_id,
-                'author_id': str(message.get('from_id', '')),
-                'author_username': message.get('user_info', {}).get('username', ''),  
+                'author_id': str(message.get('sender_id') or ''),
+                'author_username': (message.get('user_info') or {}).get('username', ''),
                 'message_text': message.get('text', ''),
-                'message_id': message.get('id', 0),
-                'chat_id': chat_id,
+                'message_id': int(message['message_id']) if message.get('message_id') else None,
+                'chat_id': str(chat_id),
                 'chat_name': chat_name,
                 'product_template_id': template.get('id'),
                 'template_name': template.get('name', ''),
@@ -401,29 +1219,37 @@ class ClientMonitoringService:
                 'ai_explanation_text': ai_result.get('reasoning', ''),
                 'client_status': 'new',
                 'notification_send': False,
+                'duplicate_count': (duplicate_info or {}).get('suppressed', 0),
                 'created_at': datetime.now().isoformat()
             }
             # ✅ Убраны поля: ai_confidence, ai_intent_type, updated_at, first_name, last_name
             
-            result = supabase_client.table('potential_clients').insert(client_data).execute()
-            
-            if result.data:
-                logger.info(f"Saved potential client: {client_data.get('author_username', 'unknown')}")  
-            else:
-                logger.error("Failed to save potential client")
+            # Запись пакетом через LeadWriter: один upsert на много клиентов, без дублей
+            self.lead_writer.add(client_data, on_inserted=on_inserted)
+            if duplicate_info is not None:
+                duplicate_info['lead_key'] = LeadWriter.row_key(client_data)
+            logger.info(f"Queued potential client: {client_data.get('author_username', 'unknown')}")
+            return client_data
                 
         except Exception as e:
             logger.error(f"Error saving potential client: {e}")
+            return None
     
-    async def _send_notifications(
+    def _send_notifications(
         self, 
         user_id: int, 
         message: Dict[str, Any], 
         template: Dict[str, Any],
         ai_result: Dict[str, Any], 
-        settings: Dict[str, Any]
+        settings: Dict[str, Any],
+        lead: Dict[str, Any]
     ):
-        """Отправка уведомлений о найденном клиенте"""
+        """
+        Поставить уведомления о записанном клиенте в очередь отправки
+        
+        Вызывается LeadWriter после вставки строки. Отправку выполняют воркеры
+        NotificationDispatcher, после доставки у клиента ставится notification_send.
+        """
         try:
             notification_accounts = settings.get('notification_account', [])
             if not notification_accounts:
@@ -433,13 +1259,8 @@ class ClientMonitoringService:
             # Формируем текст уведомления
             notification_text = self._format_notification(message, template, ai_result)
             
-            # Отправляем уведомления
-            for account in notification_accounts:
-                try:
-                    await self.telegram_service.send_private_message(account, notification_text)  # ← ИСПРАВЛЕНО: было send_message
-                    logger.info(f"Notification sent to {account}")
-                except Exception as send_error:
-                    logger.error(f"Failed to send notification to {account}: {send_error}")
+            self.notifications.submit(notification_accounts, notification_text, LeadWriter.row_key(lead))
+            logger.info(f"Notification queued for {len(notification_accounts)} account(s)")
                     
         except Exception as e:
             logger.error(f"Error sending notifications: {e}")
@@ -0,0 +1,135 @@
+# backend/app/services/container.py
+import asyncio
+import logging
+from typing import Optional
+
+from .chat_link_resolver import ChatLinkResolver
+from .client_monitoring_service import ClientMonitoringService
+from .lead_events import LeadEventBroker
+from .lead_stats import LeadStatsService
+from .scheduler_service import SchedulerService
+from .telegram_pool import TelegramSessionPool
+from .telegram_service import TelegramService
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """
+    Единственные экземпляры сервисов приложения
+
+    Один TelegramClient на аккаунт (пул сессий), один сервис мониторинга и один
+    планировщик - общие для планировщика и API. Сервисы создаются лениво при
+    первом обращении (внутри работающего event loop), запуском и остановкой
+    управляет lifespan FastAPI.
+    """
+
+    def __init__(self):
+        self._telegram_pool: Optional[TelegramSessionPool] = None
+        self._monitoring_service: Optional[ClientMonitoringService] = None
+        self._scheduler: Optional[SchedulerService] = None
+        self._link_resolver: Optional[ChatLinkResolver] = None
+        self._lead_stats: Optional[LeadStatsService] = None
+        self._lead_events: Optional[LeadEventBroker] = None
+
+    @property
+    def telegram_pool(self) -> TelegramSessionPool:
+        if self._telegram_pool is None:
+            self._telegram_pool = TelegramSessionPool()
+        return self._telegram_pool
+
+    @property
+    def telegram_service(self) -> TelegramService:
+        """Основной аккаунт: API-запросы, уведомления, push-режим"""
+        return self.telegram_pool.primary
+
+    @property
+    def monitoring_service(self) -> ClientMonitoringService:
+        if self._monitoring_service is None:
+            self._monitoring_service = ClientMonitoringService(self.telegram_pool)
+            # Новые клиенты сбрасывают кэш статистики дашборда и уходят в SSE-поток
+            self._monitoring_service.lead_writer.add_listener(self.lead_stats.invalidate_rows)
+            self._monitoring_service.lead_writer.add_listener(self.lead_events.publish)
+        return self._monitoring_service
+
+    @property
+    def lead_stats(self) -> LeadStatsService:
+        if self._lead_stats is None:
+            self._lead_stats = LeadStatsService()
+        return self._lead_stats
+
+    @property
+    def scheduler(self) -> SchedulerService:
+        if self._scheduler is None:
+            self._scheduler = SchedulerService(self.monitoring_service)
+        return self._scheduler
+
+    @property
+    def link_resolver(self) -> ChatLinkResolver:
+        """Резолв ссылок шаблонов: новые chat_ids сразу попадают в расписание"""
+        if self._link_resolver is None:
+            self._link_resolver = ChatLinkResolver(
+                self.telegram_service,
+                on_template_updated=lambda user_id: self.scheduler.notify_settings_changed(user_id)
+            )
+        return self._link_resolver
+
+    @property
+    def lead_events(self) -> LeadEventBroker:
+        if self._lead_events is None:
+            self._lead_events = LeadEventBroker()
+        return self._lead_events
+
+    async def startup(self):
+        """Подключить аккаунты, прогреть кэши и запустить планировщик"""
+        pool = self.telegram_pool
+
+        # Неавторизованный аккаунт не мешает старту - пул выведет его из ротации
+        await pool.connect()
+
+        try:
+            await pool.warm_peer_caches()
+        except Exception as e:
+            logger.error(f"Failed to warm Telegram peer cache: {e}")
+
+        await self.scheduler.start()
+
+    async def shutdown(self, timeout: float = 5.0):
+        """Остановить планировщик и закрыть соединения"""
+        if self._link_resolver is not None:
+            await self._link_resolver.stop()
+
+        if self._scheduler is not None:
+            try:
+                await self._scheduler.stop()
+            except Exception as e:
+                logger.error(f"Error stopping scheduler: {e}")
+
+        if self._monitoring_service is not None:
+            # Уведомления - до закрытия Telegram клиентов, их отметки доставки - в буфер записи
+            try:
+                await self._monitoring_service.notifications.stop(timeout=timeout)
+            except Exception as e:
+                logger.error(f"Error stopping notification dispatcher: {e}")
+
+            # Клиенты из буфера записи должны попасть в БД до остановки пула потоков БД
+            try:
+                await self._monitoring_service.lead_writer.stop()
+            except Exception as e:
+                logger.error(f"Error flushing potential clients: {e}")
+
+            if self._monitoring_service.verdict_cache is not None:
+                self._monitoring_service.verdict_cache.close()
+
+        if self._telegram_pool is not None:
+            try:
+                await asyncio.wait_for(self._telegram_pool.close(), timeout=timeout)
+                logger.info("Telegram clients closed successfully")
+            except asyncio.TimeoutError:
+                logger.warning("Timeout occurred while closing Telegram clients, forcing shutdown")
+            except Exception as e:
+                logger.error(f"Error closing Telegram clients: {e}")
+
+
+# Глобальный контейнер сервисов
+services = ServiceContainer()
@@ -0,0 +1,121 @@
+# backend/app/services/cursor_store.py
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterable, Optional, Set, Tuple
+
+from ..core.database import supabase_client, db_execute
+
+logger = logging.getLogger(__name__)
+
+class ChatCursorStore:
+    """
+    High-water-mark курсоры мониторинга: последний обработанный message_id по чату
+
+    Курсор хранится отдельно для каждого шаблона, который следит за чатом,
+    чтобы шаблоны с общими чатами не "съедали" сообщения друг у друга.
+
+    В памяти курсор - позиция чтения. В БД сохраняется курсор не дальше
+    сообщений, удержанных hold() до вердикта AI: после перезапуска они
+    будут прочитаны снова, а не потеряны вместе с очередью в памяти.
+
+    Таблица monitoring_chat_cursors:
+        product_template_id, chat_id, last_message_id, updated_at
+        UNIQUE (product_template_id, chat_id)
+        (migrations/004_monitoring_chat_cursors.sql)
+    """
+
+    TABLE = 'monitoring_chat_cursors'
+
+    def __init__(self):
+        self._cursors: Dict[Tuple[str, str], int] = {}
+        self._dirty: Dict[Tuple[str, str], int] = {}
+        self._held: Dict[Tuple[str, str], Set[int]] = {}
+        self._loaded_templates = set()
+
+    async def load(self, template_ids: Iterable[Any]):
+        """Подгрузить курсоры шаблонов, которых еще нет в памяти"""
+        missing = [str(t) for t in template_ids if str(t) not in self._loaded_templates]
+        if not missing:
+            return
+
+        try:
+            result = await db_execute(supabase_client.table(self.TABLE).select('*').in_('product_template_id', missing))
+            for row in result.data or []:
+                key = (str(row['product_template_id']), str(row['chat_id']))
+                self._cursors[key] = max(self._cursors.get(key, 0), int(row['last_message_id']))
+            self._loaded_templates.update(missing)
+        except Exception as e:
+            # Без курсоров мониторинг деградирует до окна lookback_minutes
+            logger.error(f"Error loading chat cursors: {e}")
+
+    def get(self, template_id: Any, chat_id: str) -> Optional[int]:
+        """Последний обработанный message_id или None, если чат еще не читали"""
+        return self._cursors.get((str(template_id), str(chat_id)))
+
+    def advance(self, template_id: Any, chat_id: str, message_id: int):
+        """Сдвинуть курсор вперед (назад никогда не двигается)"""
+        key = (str(template_id), str(chat_id))
+        if message_id > self._cursors.get(key, 0):
+            self._cursors[key] = message_id
+            self._mark_dirty(key)
+
+    def hold(self, template_id: Any, chat_id: str, message_id: int):
+        """Не сохранять курсор дальше сообщения, пока по нему нет вердикта AI"""
+        key = (str(template_id), str(chat_id))
+        self._held.setdefault(key, set()).add(int(message_id))
+        self._mark_dirty(key)
+
+    def release(self, template_id: Any, chat_id: str, message_id: int):
+        """Сообщение обработано (или брошено) - сохраненный курсор может идти дальше"""
+        key = (str(template_id), str(chat_id))
+        held = self._held.get(key)
+        if held is None:
+            return
+        held.discard(int(message_id))
+        if not held:
+            del self._held[key]
+        self._mark_dirty(key)
+
+    def saved_value(self, template_id: Any, chat_id: str) -> Optional[int]:
+        """Курсор, который будет сохранен в БД: перед самым старым удержанным сообщением"""
+        return self._saved_value((str(template_id), str(chat_id)))
+
+    def _saved_value(self, key: Tuple[str, str]) -> Optional[int]:
+        cursor = self._cursors.get(key)
+        held = self._held.get(key)
+        if cursor is None or not held:
+            return cursor
+        return min(cursor, min(held) - 1)
+
+    def _mark_dirty(self, key: Tuple[str, str]):
+        # Без курсора в памяти сохранять нечего - первый курсор ставит опрос
+        if key in self._cursors:
+            self._dirty[key] = self._saved_value(key)
+
+    async def flush(self):
+        """Сохранить измененные курсоры одним upsert"""
+        if not self._dirty:
+            return
+
+        now = datetime.now(timezone.utc).isoformat()
+        flushing = dict(self._dirty)
+        rows = [
+            {
+                'product_template_id': int(template_id) if template_id.isdigit() else template_id,
+                'chat_id': chat_id,
+                'last_message_id': message_id,
+                'updated_at': now
+            }
+            for (template_id, chat_id), message_id in flushing.items()
+        ]
+
+        try:
+            await db_execute(supabase_client.table(self.TABLE).upsert(rows, on_conflict='product_template_id,chat_id'))
+            # Курсоры, сдвинутые во время записи, остаются грязными
+            for key, message_id in flushing.items():
+                if self._dirty.get(key) == message_id:
+                    del self._dirty[key]
+            logger.debug(f"Saved {len(rows)} chat cursors")
+        except Exception as e:
+            # Грязные курсоры остаются в памяти и уйдут следующим flush
+            logger.error(f"Error saving chat cursors: {e}")
@@ -0,0 +1,154 @@
+# backend/app/services/keyword_matcher.py
+import hashlib
+import json
+import logging
+import re
+from collections import OrderedDict, deque
+from typing import Dict, List, Set, Tuple
+
+from .russian_stemmer import stem
+
+logger = logging.getLogger(__name__)
+
+# Режимы сопоставления ключевых слов
+MATCH_MODE_SUBSTRING = 'substring'
+MATCH_MODE_STEM = 'stem'
+
+_TOKEN_RE = re.compile(r'\w+')
+
+# Сколько скомпилированных матчеров держать в памяти
+MATCHER_CACHE_SIZE = 256
+
+
+class KeywordMatcher:
+    """
+    Автомат Ахо-Корасик по ключевым словам шаблона
+
+    Находит все ключевые слова за один проход по тексту вместо
+    отдельной проверки `keyword in text` на каждое слово.
+    Семантика та же: регистронезависимый поиск подстроки.
+    """
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = list(keywords)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Set[str]] = [set()]
+
+        patterns = {keyword.lower() for keyword in self.keywords if keyword}
+        self._patterns_count = len(patterns)
+        # Пустое ключевое слово входит в любую строку - как и `'' in text`
+        self._matches_empty = any(not keyword for keyword in self.keywords)
+
+        for pattern in patterns:
+            self._add_pattern(pattern)
+        self._build_failure_links()
+
+    def _add_pattern(self, pattern: str):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(set())
+            state = next_state
+        self._out[state].add(pattern)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] |= self._out[self._fail[next_state]]
+
+    def find(self, text: str) -> List[str]:
+        """Ключевые слова, найденные в тексте, в порядке шаблона"""
+        if not text or not self.keywords:
+            return []
+
+        found: Set[str] = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found |= out[state]
+                if len(found) == self._patterns_count:
+                    break
+
+        return [
+            keyword for keyword in self.keywords
+            if (keyword.lower() in found if keyword else self._matches_empty)
+        ]
+
+
+class StemKeywordMatcher:
+    """
+    Сопоставление по основам слов (морфология русского языка)
+
+    Ключевые слова и токены сообщения приводятся к основам стеммером,
+    совпадение - это последовательность основ ключевого слова среди основ
+    сообщения. "ремонт" находит "ремонта"/"ремонтом", но не "ремонтопригодный".
+    Индекс: основа первого слова -> [(основы ключевого слова, ключевое слово)].
+    """
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = list(keywords)
+        self._index: Dict[str, List[Tuple[Tuple[str, ...], str]]] = {}
+
+        for keyword in self.keywords:
+            stems = tuple(stem(token) for token in _TOKEN_RE.findall(keyword.lower()))
+            if stems:
+                self._index.setdefault(stems[0], []).append((stems, keyword))
+
+    def find(self, text: str) -> List[str]:
+        """Ключевые слова, найденные в тексте, в порядке шаблона"""
+        if not text or not self._index:
+            return []
+
+        stems = [stem(token) for token in _TOKEN_RE.findall(text.lower())]
+        found: Set[str] = set()
+
+        for position, token_stem in enumerate(stems):
+            for keyword_stems, keyword in self._index.get(token_stem, ()):
+                if tuple(stems[position:position + len(keyword_stems)]) == keyword_stems:
+                    found.add(keyword)
+
+        return [keyword for keyword in self.keywords if keyword in found]
+
+
+_matchers: "OrderedDict[str, object]" = OrderedDict()
+
+
+def keywords_hash(keywords: List[str]) -> str:
+    """Хэш списка ключевых слов - ключ кэша матчеров"""
+    return hashlib.sha1(json.dumps(keywords, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def get_keyword_matcher(keywords: List[str], mode: str = MATCH_MODE_SUBSTRING):
+    """Скомпилированный матчер для списка ключевых слов (LRU-кэш по режиму и хэшу списка)"""
+    key = f"{mode}:{keywords_hash(keywords)}"
+
+    matcher = _matchers.get(key)
+    if matcher is not None:
+        _matchers.move_to_end(key)
+        return matcher
+
+    matcher = StemKeywordMatcher(keywords) if mode == MATCH_MODE_STEM else KeywordMatcher(keywords)
+    _matchers[key] = matcher
+    while len(_matchers) > MATCHER_CACHE_SIZE:
+        _matchers.popitem(last=False)
+
+    logger.debug(f"Compiled keyword matcher for {len(keywords)} keywords")
+    return matcher
@@ -0,0 +1,124 @@
+# backend/app/services/lead_events.py
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LeadSubscription:
+    """Подписка одного SSE-клиента: пропущенные события + очередь новых"""
+
+    def __init__(self, replay: List[Tuple[int, Dict[str, Any]]], gap: bool, resync_id: int, queue_size: int):
+        self.replay = replay
+        # Часть событий после Last-Event-ID уже вытеснена из буфера или пришлась
+        # на прошлый запуск процесса - клиенту нужно перечитать список
+        self.gap = gap
+        # Id события resync: после перечитывания списка клиент продолжает с него
+        self.resync_id = resync_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def next_event(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Следующее событие; None - подписчик отстал, поток нужно закрыть"""
+        return await self.queue.get()
+
+
+class LeadEventBroker:
+    """
+    In-process pub/sub новых потенциальных клиентов для SSE
+
+    События получают возрастающие id (от текущего времени в мс, поэтому
+    они растут и между перезапусками). На пользователя хранится кольцевой
+    буфер последних событий: переподключившийся клиент с Last-Event-ID
+    дочитывает пропущенное. Буфер живет в памяти: клиент, чей Last-Event-ID
+    выдан до запуска процесса, получает resync. Медленный подписчик, переполнивший очередь,
+    отключается и дочитывает события из буфера при переподключении.
+    """
+
+    def __init__(self, buffer_size: Optional[int] = None, queue_size: Optional[int] = None):
+        self.buffer_size = buffer_size or settings.LEAD_EVENTS_BUFFER_SIZE
+        self.queue_size = queue_size or settings.LEAD_EVENTS_QUEUE_SIZE
+
+        self._buffers: Dict[int, Deque[Tuple[int, Dict[str, Any]]]] = {}
+        self._evicted_upto: Dict[int, int] = {}
+        self._subscribers: Dict[int, Set[LeadSubscription]] = {}
+        # Id событий этого процесса больше _start_id; меньшие выданы до перезапуска
+        self._start_id = int(time.time() * 1000)
+        self._last_id = self._start_id
+
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    def _next_id(self) -> int:
+        self._last_id = max(self._last_id + 1, int(time.time() * 1000))
+        return self._last_id
+
+    def publish(self, rows: List[Dict[str, Any]]):
+        """Разослать записанных клиентов подписчикам их пользователей"""
+        for row in rows:
+            user_id = row.get('user_id')
+            if user_id is None:
+                continue
+            user_id = int(user_id)
+
+            event = (self._next_id(), row)
+            buffer = self._buffers.setdefault(user_id, deque(maxlen=self.buffer_size))
+            if len(buffer) == buffer.maxlen:
+                self._evicted_upto[user_id] = buffer[0][0]
+            buffer.append(event)
+            self.published += 1
+
+            for subscription in list(self._subscribers.get(user_id, ())):
+                try:
+                    subscription.queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    self._drop(user_id, subscription)
+
+    def _drop(self, user_id: int, subscription: LeadSubscription):
+        """Отключить отставшего подписчика: освобождаем место под маркер конца потока"""
+        self._subscribers.get(user_id, set()).discard(subscription)
+        self.dropped_subscribers += 1
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+        logger.warning(f"⚠️ Lead stream subscriber of user {user_id} is too slow - disconnected")
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int, last_event_id: Optional[int] = None) -> AsyncIterator[LeadSubscription]:
+        """
+        Подписаться на клиентов пользователя
+
+        Args:
+            last_event_id: последний полученный клиентом id - события после него
+                отдаются в subscription.replay
+        """
+        buffer = self._buffers.get(user_id, ())
+        replay: List[Tuple[int, Dict[str, Any]]] = []
+        gap = False
+        if last_event_id is not None:
+            replay = [event for event in buffer if event[0] > last_event_id]
+            gap = last_event_id < self._start_id or self._evicted_upto.get(user_id, 0) > last_event_id
+
+        subscription = LeadSubscription(replay, gap, self._last_id, self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'subscribers': {user_id: len(subs) for user_id, subs in self._subscribers.items()},
+            'buffered': {user_id: len(buffer) for user_id, buffer in self._buffers.items()},
+            'published': self.published,
+            'dropped_subscribers': self.dropped_subscribers
+        }
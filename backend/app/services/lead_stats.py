@@ -0,0 +1,118 @@
+# backend/app/services/lead_stats.py
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from ..core.cache import TTLCache
+from ..core.config import settings
+from ..core.database import supabase_client, db_execute
+
+logger = logging.getLogger(__name__)
+
+CLIENT_STATUSES = ('new', 'contacted', 'ignored', 'converted')
+
+# Если функции статистики нет в БД, повторяем попытку не чаще, чем раз в 10 минут
+RPC_RETRY_SECONDS = 600
+
+
+class LeadStatsService:
+    """
+    Статистика потенциальных клиентов для дашборда
+
+    Все счетчики считаются одним запросом - функцией БД potential_client_stats
+    (migrations/003_potential_client_stats.sql).
+
+    Пока функция не создана, счетчики считаются параллельными count-запросами.
+    Результат кэшируется на STATS_CACHE_TTL_SECONDS и сбрасывается, когда
+    у пользователя появляются новые клиенты или меняется статус клиента.
+    """
+
+    RPC_NAME = 'potential_client_stats'
+
+    def __init__(self, ttl_seconds: Optional[int] = None):
+        self.cache = TTLCache(maxsize=1000, ttl=ttl_seconds or settings.STATS_CACHE_TTL_SECONDS)
+        self._rpc_retry_at = 0.0
+
+    async def get(self, user_id: int) -> Dict[str, Any]:
+        """Статистика пользователя: из кэша или одним запросом"""
+        stats = self.cache.get(user_id)
+        if stats is None:
+            stats = await self._query(user_id)
+            self.cache.set(user_id, stats)
+        return stats
+
+    def invalidate(self, user_id: Any):
+        self.cache.pop(int(user_id))
+
+    def invalidate_rows(self, rows: Iterable[Dict[str, Any]]):
+        """Сбросить кэш пользователей, у которых записаны новые клиенты"""
+        for user_id in {row.get('user_id') for row in rows}:
+            if user_id is not None:
+                self.invalidate(user_id)
+
+    async def _query(self, user_id: int) -> Dict[str, Any]:
+        # created_at пишется во времени сервера - границы считаем так же
+        now = datetime.now()
+        week_ago = (now - timedelta(days=7)).isoformat()
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
+
+        if self._rpc_retry_at <= time.time():
+            try:
+                result = await db_execute(supabase_client.rpc(self.RPC_NAME, {
+                    'p_user_id': user_id,
+                    'p_since': week_ago,
+                    'p_today': today
+                }))
+                return self._normalize(result.data)
+            except Exception as e:
+                self._rpc_retry_at = time.time() + RPC_RETRY_SECONDS
+                logger.warning(f"Stats function {self.RPC_NAME} unavailable, falling back to count queries: {e}")
+
+        return await self._count_queries(user_id, week_ago, today)
+
+    async def _count_queries(self, user_id: int, week_ago: str, today: str) -> Dict[str, Any]:
+        """Запасной вариант: count-запросы параллельно, без выгрузки самих строк"""
+        def count_query():
+            # limit(1): количество приходит в заголовке, строки не нужны
+            return supabase_client.table('potential_clients').select('id', count='exact').eq('user_id', user_id).limit(1)
+
+        results = await asyncio.gather(
+            db_execute(count_query()),
+            db_execute(count_query().gte('created_at', week_ago)),
+            db_execute(count_query().gte('created_at', today)),
+            *(db_execute(count_query().eq('client_status', status)) for status in CLIENT_STATUSES)
+        )
+        total_result, week_result, today_result, *status_results = results
+
+        return {
+            'total_clients': total_result.count or 0,
+            'clients_this_week': week_result.count or 0,
+            'clients_today': today_result.count or 0,
+            'status_distribution': {
+                status: result.count or 0
+                for status, result in zip(CLIENT_STATUSES, status_results)
+            }
+        }
+
+    @staticmethod
+    def _normalize(data: Any) -> Dict[str, Any]:
+        """Ответ функции БД к формату эндпоинта (json может прийти списком из одной строки)"""
+        if isinstance(data, list):
+            data = data[0] if data else {}
+        data = data or {}
+        distribution = data.get('status_distribution') or {}
+
+        return {
+            'total_clients': data.get('total_clients') or 0,
+            'clients_this_week': data.get('clients_this_week') or 0,
+            'clients_today': data.get('clients_today') or 0,
+            'status_distribution': {status: distribution.get(status) or 0 for status in CLIENT_STATUSES}
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'cache': self.cache.stats(),
+            'rpc_available': self._rpc_retry_at <= time.time()
+        }
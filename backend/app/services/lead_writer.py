@@ -0,0 +1,293 @@
+# backend/app/services/lead_writer.py
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..core.config import settings
+from ..core.database import supabase_client, db_execute
+
+logger = logging.getLogger(__name__)
+
+
+class LeadWriter:
+    """
+    Отложенная пакетная запись потенциальных клиентов
+
+    Анализ только кладет строку в буфер; буфер сбрасывается одним upsert,
+    когда набирается LEAD_WRITER_BATCH_SIZE строк или проходит
+    LEAD_WRITER_FLUSH_SECONDS. Повторная находка того же сообщения тем же
+    шаблоном не создает дубль - ее отбрасывает уникальный ключ.
+
+    Отметка notification_send=true после доставки уведомления тоже
+    откладывается до сброса: ставится пакетно и только когда строка уже в БД.
+    Так же копятся почти-дубликаты, найденные после постановки клиента
+    в очередь: строка в буфере получает их сразу, записанная - при сбросе.
+
+    Таблица potential_clients:
+        UNIQUE (user_id, chat_id, message_id, product_template_id)
+        (migrations/002_potential_clients_unique_lead.sql)
+        duplicate_count, potential_client_add_duplicates
+        (migrations/007_potential_clients_duplicate_count.sql)
+    """
+
+    TABLE = 'potential_clients'
+    CONFLICT_KEY = 'user_id,chat_id,message_id,product_template_id'
+    DUPLICATES_RPC_NAME = 'potential_client_add_duplicates'
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        flush_seconds: Optional[float] = None,
+        max_retries: Optional[int] = None
+    ):
+        self.batch_size = batch_size or settings.LEAD_WRITER_BATCH_SIZE
+        self.flush_seconds = flush_seconds or settings.LEAD_WRITER_FLUSH_SECONDS
+        self.max_retries = settings.LEAD_WRITER_MAX_RETRIES if max_retries is None else max_retries
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._pending_keys: Set[Tuple[str, ...]] = set()
+        self._notified: Set[Tuple[str, ...]] = set()
+        self._duplicate_counts: Dict[Tuple[str, ...], int] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Вызываются со строками, которые действительно вставлены (без дублей)
+        self._listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+        # Ключ строки -> колбэк после ее вставки (уведомление о клиенте)
+        self._on_inserted: Dict[Tuple[str, ...], Callable[[Dict[str, Any]], None]] = {}
+
+        self.written = 0
+        self.duplicates = 0
+        self.retries = 0
+        self.failed_flushes = 0
+
+    @staticmethod
+    def row_key(row: Dict[str, Any]) -> Tuple[str, ...]:
+        """Ключ клиента по колонкам CONFLICT_KEY; ValueError - если какой-то из них нет"""
+        key = []
+        for column in LeadWriter.CONFLICT_KEY.split(','):
+            value = row.get(column)
+            if value is None or value == '':
+                raise ValueError(f"Potential client row has no {column}")
+            key.append(str(value))
+        return tuple(key)
+
+    def add_listener(self, callback: Callable[[List[Dict[str, Any]]], None]):
+        """Подписаться на записанных клиентов (инвалидация кэшей, живые обновления)"""
+        self._listeners.append(callback)
+
+    def _ensure_started(self):
+        """Фоновый сброс стартует лениво - внутри работающего event loop"""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    def add(self, row: Dict[str, Any], on_inserted: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Поставить клиента в очередь на запись
+
+        Args:
+            on_inserted: вызывается со строкой, когда она действительно вставлена;
+                строка-дубль (уже в очереди или в БД) его не вызывает
+
+        Raises:
+            ValueError: в строке нет колонки уникального ключа
+        """
+        key = self.row_key(row)
+        self._ensure_started()
+
+        if key in self._pending_keys:
+            self.duplicates += 1
+            return
+
+        self._buffer.append(row)
+        self._pending_keys.add(key)
+        if on_inserted is not None:
+            self._on_inserted[key] = on_inserted
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def mark_notified(self, keys: Iterable[Tuple[str, ...]]):
+        """Отметить, что уведомление о клиентах доставлено (ключи - row_key строки)"""
+        self._ensure_started()
+        self._notified.update(keys)
+
+    def add_duplicates(self, key: Tuple[str, ...], count: int = 1):
+        """Учесть почти-дубликаты клиента (ключ - row_key строки), отсеченные до AI-анализа"""
+        self._ensure_started()
+
+        if key in self._pending_keys:
+            for row in self._buffer:
+                if self.row_key(row) == key:
+                    row['duplicate_count'] = row.get('duplicate_count', 0) + count
+                    return
+
+        self._duplicate_counts[key] = self._duplicate_counts.get(key, 0) + count
+
+    def pending(self) -> int:
+        """Сколько клиентов ждут записи"""
+        return len(self._buffer)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Записать буфер пакетами
+
+        Пакет, который не удалось записать после всех повторов, остается
+        в буфере и уйдет следующим сбросом.
+        """
+        if self._lock is None or not (self._buffer or self._notified or self._duplicate_counts):
+            return 0
+
+        written = 0
+        async with self._lock:
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                inserted = await self._write_batch(batch)
+                if inserted is None:
+                    break
+
+                # Во время записи в конец буфера могли добавиться новые строки
+                del self._buffer[:len(batch)]
+                self._pending_keys.difference_update(self.row_key(row) for row in batch)
+                written += inserted
+
+            await self._flush_notified()
+            await self._flush_duplicates()
+
+        return written
+
+    async def _flush_notified(self):
+        """notification_send=true одним update на (пользователь, чат, шаблон)"""
+        groups: Dict[Tuple[str, ...], List[Tuple[str, ...]]] = {}
+        for key in self._notified:
+            # Строка еще ждет записи - отметим следующим сбросом
+            if key in self._pending_keys:
+                continue
+            user_id, chat_id, _, template_id = key
+            groups.setdefault((user_id, chat_id, template_id), []).append(key)
+
+        for (user_id, chat_id, template_id), keys in groups.items():
+            try:
+                await db_execute(supabase_client.table(self.TABLE).update({'notification_send': True})
+                                 .eq('user_id', user_id)
+                                 .eq('chat_id', chat_id)
+                                 .eq('product_template_id', template_id)
+                                 .in_('message_id', [key[2] for key in keys]))
+                self._notified.difference_update(keys)
+            except Exception as e:
+                logger.error(f"Error marking {len(keys)} potential clients as notified: {e}")
+
+    async def _flush_duplicates(self):
+        """Прибавить почти-дубликаты к уже записанным клиентам"""
+        for key, count in list(self._duplicate_counts.items()):
+            # Строка еще ждет записи - прибавим следующим сбросом
+            if key in self._pending_keys:
+                continue
+            user_id, chat_id, message_id, template_id = key
+            try:
+                await db_execute(supabase_client.rpc(self.DUPLICATES_RPC_NAME, {
+                    'p_user_id': int(user_id),
+                    'p_chat_id': chat_id,
+                    'p_message_id': int(message_id),
+                    'p_product_template_id': int(template_id),
+                    'p_count': count
+                }))
+                if self._duplicate_counts.get(key) == count:
+                    del self._duplicate_counts[key]
+                else:
+                    self._duplicate_counts[key] -= count
+            except Exception as e:
+                logger.error(f"Error adding {count} duplicates to potential client {key}: {e}")
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]) -> Optional[int]:
+        """Upsert пакета с повторами; число новых строк или None при неудаче"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await db_execute(supabase_client.table(self.TABLE).upsert(
+                    batch,
+                    on_conflict=self.CONFLICT_KEY,
+                    ignore_duplicates=True
+                ))
+                # При ignore_duplicates возвращаются только вставленные строки
+                inserted = len(result.data or [])
+                self.written += inserted
+                self.duplicates += len(batch) - inserted
+                logger.info(f"💾 Saved {inserted} potential clients"
+                            f"{f' ({len(batch) - inserted} duplicates skipped)' if inserted < len(batch) else ''}")
+                if inserted:
+                    self._notify_listeners(result.data)
+                self._run_on_inserted(batch, result.data or [])
+                return inserted
+
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.failed_flushes += 1
+                    logger.error(f"Error saving {len(batch)} potential clients, will retry on next flush: {e}")
+                    return None
+
+                self.retries += 1
+                delay = 2 ** attempt
+                logger.warning(f"Error saving potential clients (attempt {attempt + 1}), retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+
+    def _run_on_inserted(self, batch: List[Dict[str, Any]], inserted_rows: List[Dict[str, Any]]):
+        """Колбэки вставленных строк; колбэки дублей, уже бывших в БД, отбрасываются"""
+        inserted = {}
+        for row in inserted_rows:
+            try:
+                inserted[self.row_key(row)] = row
+            except ValueError:
+                continue
+
+        for row in batch:
+            key = self.row_key(row)
+            callback = self._on_inserted.pop(key, None)
+            if callback is None or key not in inserted:
+                continue
+            try:
+                callback(inserted[key])
+            except Exception as e:
+                logger.error(f"Potential client callback failed: {e}")
+
+    def _notify_listeners(self, rows: List[Dict[str, Any]]):
+        for callback in self._listeners:
+            try:
+                callback(rows)
+            except Exception as e:
+                logger.error(f"Potential clients listener failed: {e}")
+
+    async def stop(self):
+        """Остановить фоновый сброс и записать все, что осталось в буфере"""
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+        await self.flush()
+        if self._buffer:
+            logger.error(f"❌ {len(self._buffer)} potential clients were not saved on shutdown")
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'pending': len(self._buffer),
+            'pending_notified': len(self._notified),
+            'pending_duplicates': len(self._duplicate_counts),
+            'written': self.written,
+            'duplicates': self.duplicates,
+            'retries': self.retries,
+            'failed_flushes': self.failed_flushes
+        }
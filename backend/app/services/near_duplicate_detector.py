@@ -0,0 +1,179 @@
+# backend/app/services/near_duplicate_detector.py
+import hashlib
+import logging
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+
+# Слова без цифр и знаков: эмодзи, телефоны и пунктуация в отпечаток не попадают
+_WORD_RE = re.compile(r'[^\W\d_]+')
+
+
+def simhash(tokens: List[str]) -> int:
+    """64-битный SimHash по мешку слов (порядок слов не важен)"""
+    weights = [0] * HASH_BITS
+    for token, count in Counter(tokens).items():
+        token_hash = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(HASH_BITS):
+            weights[bit] += count if token_hash >> bit & 1 else -count
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+class SimHashIndex:
+    """
+    Скользящее окно отпечатков с LSH-индексом по полосам
+
+    Отпечаток режется на max_distance + 1 полос: по принципу Дирихле
+    у отпечатков с расстоянием Хэмминга <= max_distance совпадает хотя бы одна
+    полоса, поэтому сравниваем только с кандидатами из тех же корзин.
+
+    Дубликатом считается только отпечаток той же области (scope - автор
+    сообщения), добавленный не раньше max_age_seconds назад.
+    """
+
+    def __init__(self, max_distance: int, window: int, max_age_seconds: float):
+        self.max_distance = max_distance
+        self.window = window
+        self.max_age_seconds = max_age_seconds
+        self.bands = max_distance + 1
+        self.band_bits = HASH_BITS // self.bands
+
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._buckets: List[Dict[int, Set[int]]] = [{} for _ in range(self.bands)]
+        self._next_id = 0
+
+    def _band_values(self, fingerprint: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (band * self.band_bits)) & mask for band in range(self.bands)]
+
+    def find(self, fingerprint: int, scope: str) -> Optional[Dict[str, Any]]:
+        """Ранее виденное сообщение той же области в пределах max_distance"""
+        self._evict_expired()
+        checked: Set[int] = set()
+        for band, value in enumerate(self._band_values(fingerprint)):
+            for entry_id in self._buckets[band].get(value, ()):
+                if entry_id in checked:
+                    continue
+                checked.add(entry_id)
+                entry = self._entries[entry_id]
+                if entry['scope'] != scope:
+                    continue
+                if bin(entry['fingerprint'] ^ fingerprint).count('1') <= self.max_distance:
+                    return entry
+        return None
+
+    def add(self, fingerprint: int, scope: str, info: Dict[str, Any]) -> Dict[str, Any]:
+        entry_id = self._next_id
+        self._next_id += 1
+
+        entry = {'fingerprint': fingerprint, 'scope': scope, 'info': info, 'added_at': time.time()}
+        self._entries[entry_id] = entry
+        for band, value in enumerate(self._band_values(fingerprint)):
+            self._buckets[band].setdefault(value, set()).add(entry_id)
+
+        # Окно ограничено - самые старые отпечатки вытесняются
+        while len(self._entries) > self.window:
+            self._evict_oldest()
+        return entry
+
+    def _evict_expired(self):
+        """Отпечатки старше max_age_seconds - в начале окна, по порядку добавления"""
+        expire_before = time.time() - self.max_age_seconds
+        while self._entries and next(iter(self._entries.values()))['added_at'] < expire_before:
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        old_id, old_entry = self._entries.popitem(last=False)
+        for band, value in enumerate(self._band_values(old_entry['fingerprint'])):
+            bucket = self._buckets[band].get(value)
+            if bucket is not None:
+                bucket.discard(old_id)
+                if not bucket:
+                    del self._buckets[band][value]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class NearDuplicateDetector:
+    """
+    Детектор почти-дубликатов (слегка измененный спам) по шаблонам
+
+    Сообщения сравниваются только с недавними сообщениями того же автора:
+    похожие короткие запросы разных людей - разные клиенты. Сообщение без
+    автора (пост канала) сравнивается с сообщениями своего чата.
+    """
+
+    def __init__(
+        self,
+        max_distance: Optional[int] = None,
+        window: Optional[int] = None,
+        min_tokens: Optional[int] = None,
+        max_age_hours: Optional[float] = None
+    ):
+        self.max_distance = settings.NEAR_DUPLICATE_MAX_DISTANCE if max_distance is None else max_distance
+        self.window = window or settings.NEAR_DUPLICATE_WINDOW
+        self.min_tokens = settings.NEAR_DUPLICATE_MIN_TOKENS if min_tokens is None else min_tokens
+        self.max_age_hours = max_age_hours or settings.NEAR_DUPLICATE_MAX_AGE_HOURS
+
+        self._indices: Dict[str, SimHashIndex] = {}
+        self.checked = 0
+        self.duplicates = 0
+
+    def check(self, template_id: Any, text: str, info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Проверить сообщение на почти-дубликат среди недавних сообщений автора в шаблоне
+
+        Args:
+            info: описание сообщения - chat_id, message_id, sender_id
+
+        Returns:
+            info исходного сообщения, если это дубликат; иначе None (сообщение запоминается)
+        """
+        tokens = _WORD_RE.findall((text or '').lower())
+        if len(tokens) < self.min_tokens:
+            # Слишком короткие сообщения дают нестабильный отпечаток
+            return None
+
+        self.checked += 1
+        fingerprint = simhash(tokens)
+
+        index = self._indices.get(str(template_id))
+        if index is None:
+            index = self._indices[str(template_id)] = SimHashIndex(
+                self.max_distance, self.window, self.max_age_hours * 3600
+            )
+
+        sender_id = info.get('sender_id')
+        scope = f"sender:{sender_id}" if sender_id else f"chat:{info.get('chat_id')}"
+
+        original = index.find(fingerprint, scope)
+        if original is None:
+            index.add(fingerprint, scope, info)
+            return None
+
+        self.duplicates += 1
+        return original['info']
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'max_distance': self.max_distance,
+            'window': self.window,
+            'max_age_hours': self.max_age_hours,
+            'checked': self.checked,
+            'duplicates': self.duplicates,
+            'duplicate_rate': round(self.duplicates / self.checked, 3) if self.checked else None,
+            'indexed_messages': sum(len(index) for index in self._indices.values())
+        }
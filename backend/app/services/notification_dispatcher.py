@@ -0,0 +1,189 @@
+# backend/app/services/notification_dispatcher.py
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from .telegram_service import TelegramService
+
+logger = logging.getLogger(__name__)
+
+# Предел длины одного сообщения Telegram
+MESSAGE_LIMIT = 4096
+
+DIGEST_SEPARATOR = "\n\n━━━━━━━━━━━━━━━\n\n"
+
+
+class NotificationDispatcher:
+    """
+    Очередь уведомлений о найденных клиентах
+
+    Анализ только ставит уведомление в очередь и идет дальше; воркеры
+    отправляют параллельно, лимиты и FloodWait держит регулятор аккаунта
+    (PRIORITY_NOTIFICATIONS - после чтения чатов мониторинга).
+
+    При NOTIFICATION_COALESCE_SECONDS > 0 клиенты, найденные для одного
+    получателя в пределах окна, уходят одним сообщением-дайджестом.
+    """
+
+    def __init__(
+        self,
+        telegram_service: TelegramService,
+        on_delivered: Optional[Callable[[List[Any]], None]] = None,
+        workers: Optional[int] = None,
+        coalesce_seconds: Optional[float] = None
+    ):
+        """
+        Args:
+            telegram_service: аккаунт, от имени которого отправляются уведомления
+            on_delivered: вызывается с ключами клиентов, уведомление о которых доставлено
+            workers: число параллельных отправок
+            coalesce_seconds: окно сбора дайджеста (0 - без дайджестов)
+        """
+        self.telegram_service = telegram_service
+        self.on_delivered = on_delivered
+        self.workers_count = workers or settings.NOTIFICATION_WORKERS
+        self.coalesce_seconds = (
+            settings.NOTIFICATION_COALESCE_SECONDS if coalesce_seconds is None else coalesce_seconds
+        )
+
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+
+        # Получатель -> уведомления, ждущие окончания окна дайджеста
+        self._coalescing: Dict[str, List[Tuple[str, Any]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+
+        self.sent_messages = 0
+        self.failed_messages = 0
+        self.digests = 0
+
+    def _ensure_started(self):
+        """Воркеры стартуют лениво - внутри работающего event loop"""
+        if self.workers:
+            return
+        self.queue = asyncio.Queue()
+        self.workers = [
+            asyncio.create_task(self._worker(i))
+            for i in range(self.workers_count)
+        ]
+        logger.info(f"📨 Notification dispatcher started with {self.workers_count} workers")
+
+    def submit(self, recipients: List[str], text: str, lead_key: Any = None):
+        """
+        Поставить уведомление в очередь для каждого получателя
+
+        Args:
+            recipients: username получателей
+            text: текст уведомления об одном клиенте
+            lead_key: ключ клиента для on_delivered
+        """
+        self._ensure_started()
+
+        for recipient in dict.fromkeys(recipients):
+            item = (text, lead_key)
+
+            if self.coalesce_seconds <= 0:
+                self.queue.put_nowait((recipient, [item]))
+                continue
+
+            self._coalescing.setdefault(recipient, []).append(item)
+            if recipient not in self._timers:
+                self._timers[recipient] = asyncio.get_running_loop().call_later(
+                    self.coalesce_seconds, self._release, recipient
+                )
+
+    def _release(self, recipient: str):
+        """Окно дайджеста закрылось - отправляем все, что накопилось"""
+        self._timers.pop(recipient, None)
+        items = self._coalescing.pop(recipient, None)
+        if items:
+            self.queue.put_nowait((recipient, items))
+
+    async def _worker(self, worker_id: int):
+        while True:
+            recipient, items = await self.queue.get()
+            try:
+                await self._deliver(recipient, items)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification worker {worker_id} failed for {recipient}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, recipient: str, items: List[Tuple[str, Any]]):
+        delivered = []
+
+        for text, lead_keys in self._build_messages(items):
+            if await self.telegram_service.send_private_message(recipient, text):
+                self.sent_messages += 1
+                delivered.extend(key for key in lead_keys if key is not None)
+            else:
+                self.failed_messages += 1
+
+        if len(items) > 1:
+            self.digests += 1
+            logger.info(f"📬 Digest of {len(items)} clients sent to {recipient}")
+
+        if delivered and self.on_delivered is not None:
+            self.on_delivered(delivered)
+
+    def _build_messages(self, items: List[Tuple[str, Any]]) -> List[Tuple[str, List[Any]]]:
+        """Разложить уведомления по сообщениям не длиннее лимита Telegram"""
+        if len(items) == 1:
+            text, lead_key = items[0]
+            return [(text[:MESSAGE_LIMIT], [lead_key])]
+
+        # Запас под заголовок дайджеста
+        limit = MESSAGE_LIMIT - 100
+        chunks: List[Tuple[List[str], List[Any]]] = []
+        size = limit
+
+        for text, lead_key in items:
+            text = text[:limit]
+            if size + len(DIGEST_SEPARATOR) + len(text) > limit:
+                chunks.append(([], []))
+                size = -len(DIGEST_SEPARATOR)
+            chunks[-1][0].append(text)
+            chunks[-1][1].append(lead_key)
+            size += len(DIGEST_SEPARATOR) + len(text)
+
+        return [
+            (f"📬 НОВЫЕ ПОТЕНЦИАЛЬНЫЕ КЛИЕНТЫ: {len(texts)}{DIGEST_SEPARATOR}" + DIGEST_SEPARATOR.join(texts), keys)
+            for texts, keys in chunks
+        ]
+
+    def pending(self) -> int:
+        """Сколько уведомлений ждут отправки (в очереди и в окне дайджеста)"""
+        queued = self.queue.qsize() if self.queue else 0
+        return queued + sum(len(items) for items in self._coalescing.values())
+
+    async def stop(self, timeout: float = 5.0):
+        """Отправить накопленное (не дольше timeout) и остановить воркеров"""
+        if not self.workers:
+            return
+
+        for recipient in list(self._timers):
+            self._timers[recipient].cancel()
+            self._release(recipient)
+
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ {self.queue.qsize()} notifications were not sent on shutdown")
+
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        logger.info("📨 Notification dispatcher stopped")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'pending': self.pending(),
+            'coalesce_seconds': self.coalesce_seconds,
+            'sent_messages': self.sent_messages,
+            'failed_messages': self.failed_messages,
+            'digests': self.digests
+        }
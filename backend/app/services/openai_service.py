@@ -1,16 +1,47 @@
 # backend/app/services/openai_service.py - ОЧИЩЕННАЯ ВЕРСИЯ
 
 import asyncio
+import hashlib
 import json
 import logging
 from typing import List, Dict, Any, Optional
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
 from datetime import datetime
 
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Системный промпт одиночного анализа
+CLIENT_ANALYSIS_SYSTEM_PROMPT = """Ты анализируешь сообщения для поиска потенциальных клиентов.
+
+    ЗАДАЧА: Определить, хочет ли автор сообщения КУПИТЬ/ПРИОБРЕСТИ товары или услуги из указанных ключевых слов.
+
+    ВАЖНО: Мы ищем ПОКУПАТЕЛЕЙ, а не продавцов услуг!
+
+    ОТВЕТ ТОЛЬКО: "ДА" или "НЕТ" + краткое объяснение (1-2 предложения)."""
+
+# Системный промпт пакетного анализа: тот же критерий, ответ - JSON по каждому сообщению
+CLIENT_BATCH_SYSTEM_PROMPT = """Ты анализируешь сообщения для поиска потенциальных клиентов.
+
+    ЗАДАЧА: Для КАЖДОГО сообщения отдельно определить, хочет ли автор КУПИТЬ/ПРИОБРЕСТИ товары или услуги из указанных для него ключевых слов.
+
+    ВАЖНО: Мы ищем ПОКУПАТЕЛЕЙ, а не продавцов услуг!
+
+    ОТВЕТ: строго JSON вида {"results": [{"id": "<id сообщения>", "is_client": true/false, "reasoning": "краткое объяснение (1-2 предложения)"}]} - ровно один элемент на каждое сообщение."""
+
+# Модель классификации
+ANALYSIS_MODEL = "gpt-3.5-turbo"
+
+# Версия промптов - входит в ключ кэша вердиктов, меняется вместе с промптами/моделью
+PROMPT_VERSION = hashlib.sha1(
+    (ANALYSIS_MODEL + CLIENT_ANALYSIS_SYSTEM_PROMPT + CLIENT_BATCH_SYSTEM_PROMPT).encode('utf-8')
+).hexdigest()[:12]
+
+# Ошибки, после которых нужно подождать и повторить запрос, а не дробить пакет
+# на поштучные запросы: они упрутся в тот же лимит или сбой
+TRANSIENT_AI_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
 class OpenAIService:
     def __init__(self):
         """Инициализация OpenAI сервиса"""
@@ -39,16 +70,13 @@ class OpenAIService:
             
         Returns:
             Простой результат: is_client (bool) + объяснение
+            
+        Raises:
+            Ошибки OpenAI - вердикта нет, повтор решает вызывающий
         """
         try:
             # Простой системный промпт
-            system_prompt = """Ты анализируешь сообщения для поиска потенциальных клиентов.
-
-    ЗАДАЧА: Определить, хочет ли автор сообщения КУПИТЬ/ПРИОБРЕСТИ товары или услуги из указанных ключевых слов.
-
-    ВАЖНО: Мы ищем ПОКУПАТЕЛЕЙ, а не продавцов услуг!
-
-    ОТВЕТ ТОЛЬКО: "ДА" или "НЕТ" + краткое объяснение (1-2 предложения)."""
+            system_prompt = CLIENT_ANALYSIS_SYSTEM_PROMPT
 
             user_prompt = f"""
     Анализируемое сообщение: "{message_text}"
@@ -62,7 +90,7 @@ class OpenAIService:
 
             # Отправляем запрос в OpenAI
             response = await self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+                model=ANALYSIS_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
@@ -76,31 +104,132 @@ class OpenAIService:
             # Определяем результат
             is_client = ai_response.lower().startswith('да')
             
-            result = {
-                'is_client': is_client,
-                'reasoning': ai_response,
-                'matched_keywords': matched_keywords,
-                'author_info': author_info,
-                'chat_info': chat_info,
-                'message_text': message_text[:200] + '...' if len(message_text) > 200 else message_text
-            }
+            result = self._build_result(is_client, ai_response, matched_keywords, author_info, chat_info, message_text)
             
             logger.info(f"AI Analysis Result: {'✅ КЛИЕНТ' if is_client else '❌ НЕ КЛИЕНТ'} - {ai_response[:50]}...")
             
             return result
             
         except Exception as e:
+            # Ошибка - не вердикт: сообщение не должно сохраняться как клиент
             logger.error(f"Error in OpenAI analysis: {e}")
+            raise
+    
+    async def analyze_potential_clients_batch(
+        self,
+        items: List[Dict[str, Any]],
+        product_name: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Пакетный анализ: N сообщений одного шаблона в одном запросе
+        
+        Системный промпт отправляется один раз на пакет, ответ - JSON
+        с вердиктом по id каждого сообщения. Поштучно здесь ничего не
+        переспрашивается: каждый запрос должен пройти через лимиты AI-пула.
+        
+        Args:
+            items: словари с ключами message_text, keywords, matched_keywords, author_info, chat_info
+            product_name: Название продукта/услуги шаблона
             
-            # В случае ошибки считаем потенциальным клиентом (безопасный fallback)
-            return {
-                'is_client': True,
-                'reasoning': f'Ошибка AI анализа: {str(e)}. Сообщение сохранено для ручной проверки.',
-                'matched_keywords': matched_keywords,
-                'author_info': author_info,
-                'chat_info': chat_info,
-                'message_text': message_text[:200] + '...' if len(message_text) > 200 else message_text
-            }
+        Returns:
+            Результаты в том же порядке и формате, что и analyze_potential_client;
+            None - ответ не разобрался или вердикта для сообщения в нем нет
+            
+        Raises:
+            TRANSIENT_AI_ERRORS - лимит или сбой OpenAI, пакет нужно повторить позже
+        """
+        if len(items) == 1:
+            return [await self.analyze_single(items[0], product_name)]
+        
+        verdicts: Dict[str, Dict[str, Any]] = {}
+        
+        try:
+            payload = [
+                {
+                    'id': str(idx),
+                    'text': item['message_text'],
+                    'keywords': item['matched_keywords'],
+                    'author': f"@{item['author_info'].get('username') or 'неизвестен'}",
+                    'chat': item['chat_info'].get('chat_name', 'неизвестно')
+                }
+                for idx, item in enumerate(items)
+            ]
+            
+            user_prompt = f"""
+    Продукт/услуга: {product_name}
+
+    Сообщения (JSON):
+    {json.dumps(payload, ensure_ascii=False)}
+
+    Для каждого сообщения: хочет ли автор КУПИТЬ/ПРИОБРЕСТИ что-то из его ключевых слов?"""
+            
+            response = await self.client.chat.completions.create(
+                model=ANALYSIS_MODEL,
+                messages=[
+                    {"role": "system", "content": CLIENT_BATCH_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                max_tokens=min(150 * len(items), 4000),
+                temperature=0.1,
+                response_format={"type": "json_object"}
+            )
+            
+            parsed = json.loads(response.choices[0].message.content)
+            for verdict in parsed.get('results', []):
+                verdicts[str(verdict.get('id'))] = verdict
+                
+        except TRANSIENT_AI_ERRORS:
+            raise
+        except Exception as e:
+            logger.warning(f"Batch AI analysis failed, messages are left without verdict: {e}")
+        
+        results: List[Optional[Dict[str, Any]]] = []
+        for idx, item in enumerate(items):
+            verdict = verdicts.get(str(idx))
+            if verdict is None or not isinstance(verdict.get('is_client'), bool):
+                results.append(None)
+                continue
+            
+            is_client = verdict['is_client']
+            reasoning = f"{'ДА' if is_client else 'НЕТ'}. {verdict.get('reasoning', '')}".strip()
+            results.append(self._build_result(
+                is_client, reasoning, item['matched_keywords'],
+                item['author_info'], item['chat_info'], item['message_text']
+            ))
+        
+        logger.info(f"Batch AI Analysis: {len(items)} messages, {len(verdicts)} verdicts from batch, "
+                    f"{sum(1 for r in results if r and r['is_client'])} clients")
+        return results
+    
+    async def analyze_single(self, item: Dict[str, Any], product_name: str) -> Dict[str, Any]:
+        """Одиночный анализ элемента пакета (тот же формат item, что и в пакете)"""
+        return await self.analyze_potential_client(
+            message_text=item['message_text'],
+            product_name=product_name,
+            keywords=item.get('keywords', []),
+            matched_keywords=item['matched_keywords'],
+            author_info=item['author_info'],
+            chat_info=item['chat_info']
+        )
+    
+    def _build_result(
+        self,
+        is_client: bool,
+        reasoning: str,
+        matched_keywords: List[str],
+        author_info: Dict[str, Any],
+        chat_info: Dict[str, Any],
+        message_text: str
+    ) -> Dict[str, Any]:
+        """Результат анализа в едином формате"""
+        return {
+            'is_client': is_client,
+            'reasoning': reasoning,
+            'matched_keywords': matched_keywords,
+            'author_info': author_info,
+            'chat_info': chat_info,
+            'message_text': message_text[:200] + '...' if len(message_text) > 200 else message_text
+        }
     
    
     
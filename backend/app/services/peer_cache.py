@@ -0,0 +1,176 @@
+# backend/app/services/peer_cache.py
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from ..core.cache import TTLCache
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_peer_key(identifier: Any) -> str:
+    """Ключ кэша: числовой chat_id как строка или '@username' в нижнем регистре"""
+    value = str(identifier).strip()
+    if value.lstrip('-').isdigit():
+        return str(int(value))
+    return '@' + value.lstrip('@').lower()
+
+
+class PeerCache:
+    """
+    Персистентный кэш Telegram peer'ов: chat_id / username -> input peer + title
+
+    Хранит то, что нужно для запросов без повторного резолва: тип peer'а, id,
+    access_hash, название и username. access_hash привязан к аккаунту, поэтому
+    записи разделены по namespace (аккаунту сессии).
+
+    Записи старше TTL считаются устаревшими: ими можно пользоваться, но их
+    стоит лениво обновить дешевым запросом по id вместо ResolveUsername.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        path: Optional[str] = None,
+        ttl_seconds: Optional[int] = None,
+        memory_size: Optional[int] = None
+    ):
+        self.namespace = namespace
+        self.path = path or settings.PEER_CACHE_PATH
+        self.ttl_seconds = ttl_seconds or settings.PEER_CACHE_TTL_HOURS * 3600
+        # Устаревание считаем по updated_at записи, память только ограничивает размер
+        self.memory = TTLCache(maxsize=memory_size or settings.PEER_CACHE_MEMORY_SIZE)
+
+        self.stale_hits = 0
+        self.persistent_hits = 0
+        self._warmed = False
+
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._open_db()
+
+    def _open_db(self):
+        """Открыть SQLite; при ошибке кэш работает только в памяти"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS telegram_peers ('
+                'namespace TEXT NOT NULL, key TEXT NOT NULL, entry TEXT NOT NULL, updated_at REAL NOT NULL, '
+                'PRIMARY KEY (namespace, key))'
+            )
+            self._db.commit()
+        except Exception as e:
+            logger.error(f"Failed to open Telegram peer cache {self.path}, using memory only: {e}")
+            self._db = None
+
+    async def warm(self) -> int:
+        """Загрузить все peer'ы аккаунта в память (при старте)"""
+        self._warmed = True
+        if self._db is None:
+            return 0
+
+        try:
+            rows = await asyncio.to_thread(self._db_load_all)
+        except Exception as e:
+            logger.error(f"Error warming Telegram peer cache: {e}")
+            return 0
+
+        for key, entry_json, updated_at in rows:
+            self.memory.set(key, (json.loads(entry_json), updated_at))
+        logger.info(f"📇 Telegram peer cache warmed: {len(rows)} entries ({self.namespace})")
+        return len(rows)
+
+    async def get(self, identifier: Any) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """
+        Запись peer'а или None
+
+        Сначала память; вытесненная из памяти запись читается из SQLite
+        и возвращается в память.
+
+        Returns:
+            (entry, fresh) - fresh=False, если запись старше TTL
+        """
+        if not self._warmed:
+            await self.warm()
+
+        key = normalize_peer_key(identifier)
+        item = self.memory.get(key)
+        if item is None and self._db is not None:
+            try:
+                row = await asyncio.to_thread(self._db_get, key)
+            except Exception as e:
+                logger.error(f"Error reading Telegram peer cache: {e}")
+                row = None
+            if row is not None:
+                item = (json.loads(row[0]), row[1])
+                self.memory.set(key, item)
+                self.persistent_hits += 1
+        if item is None:
+            return None
+
+        entry, updated_at = item
+        fresh = time.time() - updated_at < self.ttl_seconds
+        if not fresh:
+            self.stale_hits += 1
+        return entry, fresh
+
+    async def set(self, identifiers: Iterable[Any], entry: Dict[str, Any]):
+        """Сохранить запись под всеми ключами (chat_id, username, исходный идентификатор)"""
+        updated_at = time.time()
+        keys = {normalize_peer_key(identifier) for identifier in identifiers if identifier}
+        for key in keys:
+            self.memory.set(key, (entry, updated_at))
+
+        if self._db is not None and keys:
+            await asyncio.to_thread(self._db_set, keys, entry, updated_at)
+
+    def _db_load_all(self):
+        with self._lock:
+            return self._db.execute(
+                'SELECT key, entry, updated_at FROM telegram_peers WHERE namespace = ?',
+                (self.namespace,)
+            ).fetchall()
+
+    def _db_get(self, key: str):
+        with self._lock:
+            return self._db.execute(
+                'SELECT entry, updated_at FROM telegram_peers WHERE namespace = ? AND key = ?',
+                (self.namespace, key)
+            ).fetchone()
+
+    def _db_set(self, keys, entry: Dict[str, Any], updated_at: float):
+        try:
+            entry_json = json.dumps(entry, ensure_ascii=False)
+            with self._lock:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO telegram_peers (namespace, key, entry, updated_at) VALUES (?, ?, ?, ?)',
+                    [(self.namespace, key, entry_json, updated_at) for key in keys]
+                )
+                self._db.commit()
+        except Exception as e:
+            logger.error(f"Error writing Telegram peer cache: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий"""
+        return {
+            'namespace': self.namespace,
+            'memory': self.memory.stats(),
+            'persistent_enabled': self._db is not None,
+            'persistent_hits': self.persistent_hits,
+            'stale_hits': self.stale_hits
+        }
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+            self._db = None
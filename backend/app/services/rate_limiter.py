@@ -0,0 +1,56 @@
+# backend/app/services/rate_limiter.py
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Асинхронный token bucket
+
+    rate - пополнение токенов в секунду, capacity - максимальный запас (burst).
+    rate <= 0 означает "без ограничений".
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, limit: float) -> "TokenBucket":
+        """Bucket под квоту вида "N в минуту" (RPM/TPM)"""
+        return cls(rate=limit / 60.0, capacity=limit)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Взять токены без ожидания"""
+        if self.rate <= 0:
+            return True
+        self._refill()
+        tokens = min(tokens, self.capacity)
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Сколько секунд ждать, пока наберется нужное число токенов"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        missing = min(tokens, self.capacity) - self._tokens
+        return max(0.0, missing / self.rate)
+
+    async def acquire(self, tokens: float = 1.0):
+        """Дождаться и взять токены (ожидающие обслуживаются по очереди)"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                await asyncio.sleep(self.wait_time(tokens))
@@ -0,0 +1,137 @@
+# backend/app/services/russian_stemmer.py
+"""
+Стеммер русского языка (алгоритм Snowball/Porter)
+
+Полностью офлайн, без внешних зависимостей. Результаты стемминга
+кэшируются в памяти процесса - словарь токенов в чатах небольшой.
+"""
+from functools import lru_cache
+from typing import Optional, Tuple
+
+_VOWELS = 'аеиоуыэюя'
+
+_PERFECTIVE_GERUND_1 = ('в', 'вши', 'вшись')
+_PERFECTIVE_GERUND_2 = ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись')
+
+_ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом',
+    'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею'
+)
+
+_PARTICIPLE_1 = ('ем', 'нн', 'вш', 'ющ', 'щ')
+_PARTICIPLE_2 = ('ивш', 'ывш', 'ующ')
+
+_REFLEXIVE = ('ся', 'сь')
+
+_VERB_1 = (
+    'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны',
+    'ть', 'ешь', 'нно'
+)
+_VERB_2 = (
+    'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл',
+    'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены',
+    'ить', 'ыть', 'ишь', 'ую', 'ю'
+)
+
+_NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей',
+    'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях',
+    'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я'
+)
+
+_SUPERLATIVE = ('ейш', 'ейше')
+_DERIVATIONAL = ('ост', 'ость')
+
+
+def _regions(word: str) -> Tuple[int, int]:
+    """Начала областей RV и R2"""
+    rv = len(word)
+    for i, char in enumerate(word):
+        if char in _VOWELS:
+            rv = i + 1
+            break
+
+    def next_region(start: int) -> int:
+        for i in range(max(start, 1), len(word)):
+            if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+                return i + 1
+        return len(word)
+
+    r1 = next_region(1)
+    r2 = next_region(r1 + 1)
+    return rv, r2
+
+
+def _strip(word: str, start: int, group1: Tuple[str, ...], group2: Tuple[str, ...]) -> Optional[str]:
+    """
+    Отрезать самое длинное окончание из групп в пределах области [start:]
+
+    Окончания group1 отрезаются только после 'а' или 'я'.
+    Возвращает None, если подходящего окончания нет.
+    """
+    best, best_group = '', 0
+    for group_no, group in ((1, group1), (2, group2)):
+        for ending in group:
+            if len(ending) > len(best) and word.endswith(ending) and len(word) - len(ending) >= start:
+                best, best_group = ending, group_no
+
+    if not best:
+        return None
+
+    cut = len(word) - len(best)
+    if best_group == 1 and (cut - 1 < start or word[cut - 1] not in 'ая'):
+        return None
+    return word[:cut]
+
+
+@lru_cache(maxsize=50000)
+def stem(word: str) -> str:
+    """Основа слова. Слова без кириллицы возвращаются в нижнем регистре как есть"""
+    word = word.lower().replace('ё', 'е')
+    rv, r2 = _regions(word)
+    if rv >= len(word):
+        return word
+
+    # Шаг 1: деепричастие, иначе возвратность + прилагательное/глагол/существительное
+    stripped = _strip(word, rv, _PERFECTIVE_GERUND_1, _PERFECTIVE_GERUND_2)
+    if stripped is not None:
+        word = stripped
+    else:
+        stripped = _strip(word, rv, (), _REFLEXIVE)
+        if stripped is not None:
+            word = stripped
+
+        stripped = _strip(word, rv, (), _ADJECTIVE)
+        if stripped is not None:
+            word = stripped
+            stripped = _strip(word, rv, _PARTICIPLE_1, _PARTICIPLE_2)
+            if stripped is not None:
+                word = stripped
+        else:
+            stripped = _strip(word, rv, _VERB_1, _VERB_2)
+            if stripped is None:
+                stripped = _strip(word, rv, (), _NOUN)
+            if stripped is not None:
+                word = stripped
+
+    # Шаг 2: конечная 'и'
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # Шаг 3: словообразовательные окончания в R2
+    stripped = _strip(word, max(r2, rv), (), _DERIVATIONAL)
+    if stripped is not None:
+        word = stripped
+
+    # Шаг 4: двойная 'н', превосходная степень, мягкий знак
+    stripped = _strip(word, rv, (), _SUPERLATIVE + ('нн', 'ь'))
+    if stripped is not None:
+        if word.endswith('нн'):
+            word = word[:-1]
+        else:
+            superlative = not word.endswith('ь')
+            word = stripped
+            if superlative and word.endswith('нн') and len(word) - 2 >= rv:
+                word = word[:-1]
+
+    return word
@@ -1,22 +1,45 @@
 # backend/app/services/scheduler_service.py
 import asyncio
+import heapq
 import logging
+import math
+import time
 from datetime import datetime, timezone
-from typing import List, Dict, Any 
+from typing import List, Dict, Any, Optional, Set, Tuple
 
-from ..core.database import supabase_client
+from ..core.database import supabase_client, db_execute
 from ..core.config import settings
 from .client_monitoring_service import ClientMonitoringService
 
 logger = logging.getLogger(__name__)
 
+# Ключ расписания: (user_id, template_id)
+TemplateKey = Tuple[int, str]
+
 class SchedulerService:
-    def __init__(self):
-        self.monitoring_service = ClientMonitoringService()
+    def __init__(self, monitoring_service: ClientMonitoringService):
+        self.monitoring_service = monitoring_service
         self.task = None
         self.running = False
         self.background_tasks = set()  # Сохраняем strong references
         
+        # Пользователи мониторятся параллельно, но не больше N одновременно
+        self.user_semaphore = asyncio.Semaphore(settings.SCHEDULER_MAX_CONCURRENT_USERS)
+        self.user_tasks: Dict[int, asyncio.Task] = {}  # Циклы в работе по user_id
+        self.user_metrics: Dict[int, Dict[str, Any]] = {}  # Длительность и задержка циклов по user_id
+        
+        # Расписание по шаблонам: куча (дедлайн, user_id, template_id) с ленивым удалением устаревших записей
+        self._schedule: List[Tuple[float, int, str]] = []
+        self._due_at: Dict[TemplateKey, float] = {}  # Актуальный дедлайн шаблона
+        self._active_users: Dict[int, Dict[str, Any]] = {}
+        self._active_templates: Dict[TemplateKey, Dict[str, Any]] = {}
+        self._template_runs: Dict[TemplateKey, Dict[str, float]] = {}  # started_at / finished_at последнего запуска
+        self._running_templates: Dict[int, Set[str]] = {}  # Шаблоны идущего цикла пользователя
+        self._deferred_templates: Dict[int, Set[str]] = {}  # Наступили, пока цикл пользователя шел
+        self._wakeup = asyncio.Event()
+        self._resync_requested = True
+        self._last_resync = 0.0
+        
     async def start(self):
         """Запустить планировщик"""
         try:
@@ -26,6 +49,9 @@ class SchedulerService:
                 
             logger.info("Starting scheduler service")
             
+            # Первый проход цикла строит расписание с нуля
+            self._resync_requested = True
+            
             # Создаем asyncio task для мониторинга
             self.task = asyncio.create_task(self._monitoring_loop())
             
@@ -49,6 +75,21 @@ class SchedulerService:
                 
             logger.info("Stopping scheduler")
             self.running = False
+            self._wakeup.set()
+            
+            await self.monitoring_service.stop_realtime()
+            
+            # Прерываем незавершенные циклы пользователей
+            for user_task in list(self.user_tasks.values()):
+                user_task.cancel()
+            if self.user_tasks:
+                await asyncio.gather(*self.user_tasks.values(), return_exceptions=True)
+            
+            self._schedule.clear()
+            self._due_at.clear()
+            self._deferred_templates.clear()
+            
+            await self.monitoring_service.ai_pool.stop()
             
             if self.task and not self.task.done():
                 self.task.cancel()
@@ -64,24 +105,35 @@ class SchedulerService:
             raise
     
     async def _monitoring_loop(self):
-        """Основной цикл планировщика"""
-        logger.info("Scheduler monitoring loop started")
+        """
+        Основной цикл планировщика
         
-        iteration_count = 0
+        Каждый шаблон живет по своему check_interval_minutes. Спим ровно до
+        ближайшего дедлайна в куче, а не опрашиваем БД по таймеру.
+        Досрочно будит notify_settings_changed(), полная пересинхронизация с
+        monitoring_settings идет раз в SCHEDULER_RESYNC_SECONDS как страховка
+        от изменений в обход API.
+        """
+        logger.info("Scheduler monitoring loop started")
         
         try:
             while self.running:
-                iteration_count += 1
+                if self._resync_requested or time.time() - self._last_resync >= settings.SCHEDULER_RESYNC_SECONDS:
+                    await self._resync_schedule()
                 
-                if settings.ENABLE_DEBUG_LOGGING:
-                    logger.debug(f"Scheduler iteration #{iteration_count}")
+                self._dispatch_due_templates()
                 
-                # Проверяем всех пользователей
-                await self._monitor_all_users()
+                # Ждем до ближайшего дедлайна, следующей пересинхронизации или уведомления
+                now = time.time()
+                next_wakeup = self._last_resync + settings.SCHEDULER_RESYNC_SECONDS
+                if self._schedule:
+                    next_wakeup = min(next_wakeup, self._schedule[0][0])
                 
-                # Ждем 60 секунд до следующей проверки
-                if self.running:  # Проверяем перед сном
-                    await asyncio.sleep(60)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, next_wakeup - now))
+                except asyncio.TimeoutError:
+                    pass
                     
         except asyncio.CancelledError:
             logger.info("Scheduler loop cancelled")
@@ -90,121 +142,284 @@ class SchedulerService:
         finally:
             logger.info("Scheduler monitoring loop ended")
     
-    async def _monitor_all_users(self):
-        """Проверить всех пользователей на необходимость мониторинга"""
+    def notify_settings_changed(self, user_id: Optional[int] = None):
+        """
+        Настройки мониторинга или шаблоны изменились через API
+        
+        Планировщик просыпается и перечитывает расписание, не дожидаясь
+        плановой пересинхронизации.
+        """
+        if settings.ENABLE_DEBUG_LOGGING:
+            logger.debug(f"Scheduler notified about settings change (user {user_id})")
+        self._resync_requested = True
+        self._wakeup.set()
+    
+    async def _resync_schedule(self):
+        """Перечитать активных пользователей и их шаблоны и пересобрать кучу дедлайнов"""
+        self._resync_requested = False
+        self._last_resync = time.time()
+        
         try:
-            logger.info("🔍 Начинаем проверку пользователей")
-            
-            # Получаем всех пользователей с активным мониторингом
             active_users = await self._get_active_monitoring_users()
             
-            if not active_users:
-                logger.info("❌ Нет активных пользователей для мониторинга")
-                return
+            # Push-подписки обновляем вместе с расписанием, polling работает как догоняющий
+            if settings.ENABLE_REALTIME_MONITORING:
+                await self.monitoring_service.refresh_realtime_routes(active_users)
             
-            logger.info(f"👥 Найдено {len(active_users)} активных пользователей")
-    
-            for user_data in active_users:
-                try:
-                    logger.info(f"📋 ОБРАБАТЫВАЕМ пользователя: {user_data}")
-                    
-                    user_id = user_data['user_id']
-                    user_settings_data = user_data
-                    
-                    logger.info(f"👤 Проверяем пользователя {user_id}")
-                    
-                    # Проверяем, пора ли запускать мониторинг для этого пользователя
-                    should_run = self._should_run_monitoring(user_settings_data)
-                    logger.info(f"⏰ Результат проверки времени для пользователя {user_id}: {should_run}")
-                    
-                    if should_run:
-                        logger.info(f"🚀 ЗАПУСКАЕМ мониторинг для пользователя {user_id}")
-                        
-                        # Запускаем мониторинг
-                        await self._run_monitoring_for_user(user_id, user_settings_data)
-                        
-                        # Обновляем время последней проверки
-                        await self._update_last_monitoring_check(user_id)
-                        
-                        logger.info(f"✅ Мониторинг для пользователя {user_id} завершен")
-                    else:
-                        logger.info(f"⏸️ НЕ ЗАПУСКАЕМ мониторинг для пользователя {user_id} - время еще не пришло")
-                        
-                except Exception as user_error:
-                    logger.error(f"💥 Ошибка обработки пользователя {user_data.get('user_id', 'unknown')}: {user_error}")
+            self._active_users = {user_data['user_id']: user_data for user_data in active_users}
+            templates = await self._get_active_templates(list(self._active_users))
+            self._active_templates = {(t['user_id'], str(t['id'])): t for t in templates}
+            
+            # Отключенные шаблоны выпадают из расписания (их записи в куче станут устаревшими)
+            for key in list(self._due_at):
+                if key not in self._active_templates:
+                    del self._due_at[key]
+            
+            for key, template in self._active_templates.items():
+                user_id, template_id = key
+                # Для шаблонов идущего цикла следующий дедлайн поставит сам цикл по завершении
+                if template_id in self._running_templates.get(user_id, ()):
                     continue
-                    
+                try:
+                    self._schedule_template(key, self._get_due_time(key, template))
+                except Exception as template_error:
+                    logger.error(f"💥 Ошибка расчета расписания шаблона {template_id}: {template_error}")
+            
+            logger.info(f"👥 Расписание обновлено: {len(self._active_users)} активных пользователей, "
+                        f"{len(self._active_templates)} шаблонов")
+            
         except Exception as e:
-            logger.error(f"💥 КРИТИЧЕСКАЯ ошибка в monitor_all_users: {e}")
+            logger.error(f"💥 КРИТИЧЕСКАЯ ошибка пересинхронизации расписания: {e}")
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
-
+    
+    def _schedule_template(self, key: TemplateKey, due_at: float):
+        """Поставить (или перенести) дедлайн шаблона"""
+        if self._due_at.get(key) == due_at:
+            return
+        self._due_at[key] = due_at
+        # Старая запись остается в куче и отбрасывается при извлечении
+        heapq.heappush(self._schedule, (due_at, key[0], key[1]))
+    
+    def _dispatch_due_templates(self):
+        """
+        Запустить шаблоны, чей дедлайн наступил
+        
+        Наступившие одновременно шаблоны пользователя идут одним циклом, чтобы
+        общие чаты читались один раз. Если цикл пользователя еще идет, шаблон
+        откладывается до его окончания.
+        """
+        now = time.time()
+        due_by_user: Dict[int, List[Tuple[TemplateKey, float]]] = {}
+        
+        while self._schedule and self._schedule[0][0] <= now:
+            due_at, user_id, template_id = heapq.heappop(self._schedule)
+            key = (user_id, template_id)
+            
+            # Устаревшая запись: шаблон перенесли или отключили
+            if self._due_at.get(key) != due_at:
+                continue
+            del self._due_at[key]
+            
+            if key not in self._active_templates or user_id not in self._active_users:
+                continue
+            
+            if user_id in self.user_tasks:
+                self._deferred_templates.setdefault(user_id, set()).add(template_id)
+                continue
+            
+            due_by_user.setdefault(user_id, []).append((key, due_at))
+        
+        for user_id, due_items in due_by_user.items():
+            templates = [self._prepare_template_run(key, now) for key, _ in due_items]
+            due_at = min(due for _, due in due_items)
+            
+            logger.info(f"🚀 ЗАПУСКАЕМ мониторинг для пользователя {user_id}: {len(templates)} шаблон(ов) "
+                        f"(опоздание {max(0.0, now - due_at):.1f}s)")
+            
+            # Каждый пользователь - отдельная задача: медленный или упавший
+            # пользователь не задерживает остальных
+            self._running_templates[user_id] = {key[1] for key, _ in due_items}
+            task = asyncio.create_task(
+                self._run_user_cycle(user_id, self._active_users[user_id], templates, due_at)
+            )
+            self.user_tasks[user_id] = task
+            task.add_done_callback(lambda _, uid=user_id: self._on_user_cycle_done(uid))
+    
+    def _prepare_template_run(self, key: TemplateKey, now: float) -> Dict[str, Any]:
+        """Шаблон для запуска с окном lookback по реальному времени с прошлого запуска"""
+        template = dict(self._active_templates[key])
+        template['lookback_minutes'] = self._get_lookback_minutes(key, template)
+        self._template_runs.setdefault(key, {})['started_at'] = now
+        return template
+    
+    def _get_lookback_minutes(self, key: TemplateKey, template: Dict[str, Any]) -> int:
+        """
+        Окно чтения шаблона (используется, пока у чата нет курсора)
+        
+        После первого запуска окно покрывает время с начала прошлого запуска
+        плюс минута запаса; до него - lookback_minutes шаблона.
+        """
+        last_started = self._template_runs.get(key, {}).get('started_at')
+        if last_started is None:
+            return template.get('lookback_minutes') or 5
+        
+        elapsed_minutes = math.ceil((time.time() - last_started) / 60) + 1
+        return min(elapsed_minutes, settings.SCHEDULER_MAX_LOOKBACK_MINUTES)
+    
+    def _on_user_cycle_done(self, user_id: int):
+        """Цикл завершен - следующие дедлайны шаблонов отсчитываются от его окончания"""
+        self.user_tasks.pop(user_id, None)
+        finished = self._running_templates.pop(user_id, set())
+        deferred = self._deferred_templates.pop(user_id, set())
+        
+        if not self.running:
+            return
+        
+        finished_at = time.time()
+        for template_id in finished:
+            self._template_runs.setdefault((user_id, template_id), {})['finished_at'] = finished_at
+        
+        for template_id in finished | deferred:
+            key = (user_id, template_id)
+            template = self._active_templates.get(key)
+            if template is not None:
+                self._schedule_template(key, self._get_due_time(key, template))
+        self._wakeup.set()
     
     async def _get_active_monitoring_users(self) -> List[Dict[str, Any]]:
         """Получить пользователей с активным мониторингом"""
         try:
-            result = supabase_client.table('monitoring_settings').select('*').eq('is_active', True).execute()
+            result = await db_execute(supabase_client.table('monitoring_settings').select('*').eq('is_active', True))
             return result.data or []
         except Exception as e:
             logger.error(f"Error getting active monitoring users: {e}")
             return []
     
-    def _should_run_monitoring(self, user_settings: Dict[str, Any]) -> bool:
-        """Определить, нужно ли запускать мониторинг для пользователя"""
+    async def _get_active_templates(self, user_ids: List[int]) -> List[Dict[str, Any]]:
+        """Получить активные шаблоны пользователей одним запросом"""
+        if not user_ids:
+            return []
         try:
-            last_check = user_settings.get('last_monitoring_check')
-            user_id = user_settings.get('user_id', 'unknown')
-            
-            if not last_check:
-                logger.info(f"✅ Первый запуск для пользователя {user_id}")
-                return True
-                
-            # Берем интервал из БД, а не хардкод!
-            check_interval_minutes = user_settings.get('check_interval_minutes', 5)
-            check_interval = check_interval_minutes * 60
-            
-            logger.info(f"🔍 Пользователь {user_id}: интервал из БД = {check_interval_minutes} мин ({check_interval} сек)")
-            
-            # Парсим время
-            last_check_time = datetime.fromisoformat(last_check.replace('Z', '+00:00'))
-            current_time = datetime.now(timezone.utc)
-            time_diff = current_time - last_check_time
-            
-            should_run = time_diff.total_seconds() >= check_interval
+            result = await db_execute(
+                supabase_client.table('product_templates').select('*').in_('user_id', user_ids).eq('is_active', True)
+            )
+            return result.data or []
+        except Exception as e:
+            logger.error(f"Error getting active templates: {e}")
+            return []
+    
+    
+    async def _run_user_cycle(
+        self,
+        user_id: int,
+        user_settings: Dict[str, Any],
+        templates: List[Dict[str, Any]],
+        due_at: float
+    ):
+        """
+        Цикл мониторинга наступивших шаблонов пользователя под глобальным лимитом параллельности
+        
+        Args:
+            templates: шаблоны, чей дедлайн наступил
+            due_at: момент (time.time()), когда цикл должен был начаться - для расчета задержки очереди
+        """
+        metrics = self.user_metrics.setdefault(user_id, {
+            'runs': 0,
+            'failures': 0,
+            'last_started_at': None,
+            'last_duration_seconds': None,
+            'last_queue_lag_seconds': None,
+            'last_error': None
+        })
+        
+        async with self.user_semaphore:
+            started_at = time.time()
+            metrics['last_started_at'] = datetime.fromtimestamp(started_at, timezone.utc).isoformat()
+            metrics['last_queue_lag_seconds'] = round(max(0.0, started_at - due_at), 3)
             
-            if should_run:
-                logger.info(f"✅ Запускаем мониторинг: прошло {time_diff.total_seconds():.1f}s >= {check_interval}s")
-            else:
-                logger.info(f"⏸️ Ждем еще {check_interval - time_diff.total_seconds():.1f}s")
+            try:
+                await self.monitoring_service.search_and_analyze(user_id, user_settings, templates=templates)
+                metrics['last_error'] = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics['failures'] += 1
+                metrics['last_error'] = str(e)
+                logger.error(f"Error running monitoring for user {user_id}: {e}")
+            finally:
+                metrics['runs'] += 1
+                metrics['last_duration_seconds'] = round(time.time() - started_at, 3)
             
-            return should_run
+            # Обновляем время последней проверки
+            await self._update_last_monitoring_check(user_id)
+        
+        logger.info(f"✅ Мониторинг для пользователя {user_id} завершен за {metrics['last_duration_seconds']}s "
+                    f"(задержка очереди {metrics['last_queue_lag_seconds']}s)")
+    
+    def _get_due_time(self, key: TemplateKey, template: Dict[str, Any]) -> float:
+        """
+        Когда по расписанию должен начаться следующий запуск шаблона (time.time())
+        
+        После рестарта истории запусков в памяти нет - отсчитываем от
+        last_monitoring_check пользователя.
+        """
+        interval = self._get_interval_seconds(template)
+        
+        finished_at = self._template_runs.get(key, {}).get('finished_at')
+        if finished_at is not None:
+            return finished_at + interval
+        
+        last_check = self._active_users.get(key[0], {}).get('last_monitoring_check')
+        if not last_check:
+            return time.time()
+        
+        last_check_time = datetime.fromisoformat(last_check.replace('Z', '+00:00'))
+        return last_check_time.timestamp() + interval
+    
+    def _get_interval_seconds(self, template: Dict[str, Any]) -> float:
+        """Интервал шаблона в секундах (дробные минуты допустимы)"""
+        return float(template.get('check_interval_minutes') or 5) * 60
+    
+    def get_user_metrics(self) -> Dict[str, Any]:
+        """Метрики циклов по пользователям и расписание их шаблонов"""
+        now = time.time()
+        metrics_by_user = {}
+        
+        for user_id, metrics in self.user_metrics.items():
+            templates = {}
+            for (template_user_id, template_id), template in self._active_templates.items():
+                if template_user_id != user_id:
+                    continue
+                key = (template_user_id, template_id)
+                finished_at = self._template_runs.get(key, {}).get('finished_at')
+                templates[template_id] = {
+                    'interval_seconds': self._get_interval_seconds(template),
+                    'running': template_id in self._running_templates.get(user_id, ()),
+                    'last_finished_at': datetime.fromtimestamp(finished_at, timezone.utc).isoformat() if finished_at else None,
+                    'next_run_in_seconds': round(self._due_at[key] - now, 1) if key in self._due_at else None
+                }
             
-        except Exception as e:
-            logger.error(f"💥 Ошибка определения времени: {e}")
-            return False
+            metrics_by_user[str(user_id)] = {
+                **metrics,
+                'running': user_id in self.user_tasks,
+                'templates': templates
+            }
         
-    async def _run_monitoring_for_user(self, user_id: int, user_settings: Dict[str, Any]):  # ← ПЕРЕИМЕНОВАНО ПАРАМЕТР
-        """Запустить мониторинг для конкретного пользователя"""
-        try:
-            await self.monitoring_service.search_and_analyze(user_id, user_settings)  # ← ИСПРАВЛЕНО
-        except Exception as e:
-            logger.error(f"Error running monitoring for user {user_id}: {e}")
+        return metrics_by_user
     
     async def _update_last_monitoring_check(self, user_id: int):
         """Обновить время последней проверки мониторинга"""
         try:
             current_time = datetime.now(timezone.utc).isoformat()
             
-            supabase_client.table('monitoring_settings').update({
+            await db_execute(supabase_client.table('monitoring_settings').update({
                 'last_monitoring_check': current_time,
                 'updated_at': current_time
-            }).eq('user_id', user_id).execute()
+            }).eq('user_id', user_id))
             
             if settings.ENABLE_DEBUG_LOGGING:  # ← ТЕПЕРЬ РАБОТАЕТ ПРАВИЛЬНО
                 logger.debug(f"Updated last monitoring check for user {user_id}")
                 
         except Exception as e:
             logger.error(f"Error updating last monitoring check for user {user_id}: {e}")
-
-# Глобальный экземпляр планировщика
-scheduler_service = SchedulerService()
\ No newline at end of file
@@ -0,0 +1,206 @@
+# backend/app/services/telegram_governor.py
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from telethon.errors import FloodWaitError
+
+from ..core.config import settings
+from .rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты очереди: меньше - важнее
+PRIORITY_MONITORING = 0     # Чтение чатов мониторинга
+PRIORITY_NOTIFICATIONS = 1  # Уведомления о найденных клиентах
+PRIORITY_RESOLVE = 2        # Массовый резолв ссылок на чаты
+
+# Группы методов со своими лимитами
+METHOD_READ = 'read'                  # GetHistory (iter_messages / get_messages)
+METHOD_RESOLVE = 'resolve'            # ResolveUsername - самый строгий лимит Telegram
+METHOD_ENTITY = 'entity'              # GetChannels / GetUsers по id
+METHOD_SEND = 'send'                  # SendMessage
+METHOD_PARTICIPANTS = 'participants'  # GetParticipants
+METHOD_DEFAULT = 'default'
+
+
+def _method_limits() -> Dict[str, int]:
+    return {
+        METHOD_READ: settings.TELEGRAM_READ_RPM,
+        METHOD_RESOLVE: settings.TELEGRAM_RESOLVE_RPM,
+        METHOD_ENTITY: settings.TELEGRAM_ENTITY_RPM,
+        METHOD_SEND: settings.TELEGRAM_SEND_RPM,
+        METHOD_PARTICIPANTS: settings.TELEGRAM_DEFAULT_RPM,
+        METHOD_DEFAULT: settings.TELEGRAM_DEFAULT_RPM
+    }
+
+
+class TelegramGovernor:
+    """
+    Центральный регулятор запросов одного Telegram-аккаунта
+
+    - token bucket на группу методов (ResolveUsername ограничен сильнее чтения);
+    - FloodWaitError ставит на паузу все запросы аккаунта на e.seconds,
+      после паузы запрос повторяется;
+    - ожидающие запросы обслуживаются по приоритету: чтение мониторинга раньше
+      уведомлений, уведомления раньше массового резолва ссылок;
+    - ограничено число одновременных запросов.
+
+    Внутри операции нельзя снова вызывать run() - операция держит слот.
+    """
+
+    def __init__(self, name: str = 'default', max_concurrent: Optional[int] = None):
+        self.name = name
+        self.max_concurrent = max_concurrent or settings.TELEGRAM_MAX_CONCURRENT_REQUESTS
+        self.buckets: Dict[str, TokenBucket] = {
+            method: TokenBucket.per_minute(limit)
+            for method, limit in _method_limits().items()
+        }
+
+        self._cond: Optional[asyncio.Condition] = None
+        self._waiters: List[List[Any]] = []  # [priority, seq, method, tokens]
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self.paused_until = 0.0
+
+        self.requests: Dict[str, int] = {method: 0 for method in self.buckets}
+        self.flood_waits = 0
+        self.last_flood_wait: Optional[Dict[str, Any]] = None
+
+    def _condition(self) -> asyncio.Condition:
+        """Condition создается лениво - внутри работающего event loop"""
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def run(
+        self,
+        method: str,
+        operation: Callable[[], Awaitable[Any]],
+        priority: int = PRIORITY_MONITORING,
+        tokens: float = 1.0,
+        retry_on_flood: bool = True
+    ) -> Any:
+        """
+        Выполнить запрос к Telegram под лимитами аккаунта
+
+        Args:
+            method: группа методов (METHOD_*) - определяет token bucket
+            operation: фабрика корутины с самим запросом
+            priority: PRIORITY_* - порядок обслуживания в очереди
+            tokens: сколько запросов стоит операция (например, страницы iter_messages)
+            retry_on_flood: пережидать FloodWait и повторять; False - сразу пробросить
+                (вызывающий может переключиться на другой аккаунт)
+        """
+        method = method if method in self.buckets else METHOD_DEFAULT
+
+        for attempt in range(settings.TELEGRAM_FLOOD_MAX_RETRIES + 1):
+            await self._acquire(method, priority, tokens)
+            try:
+                self.requests[method] += 1
+                return await operation()
+            except FloodWaitError as e:
+                await self._register_flood_wait(method, e.seconds)
+                if (not retry_on_flood or e.seconds > settings.TELEGRAM_FLOOD_MAX_WAIT_SECONDS
+                        or attempt == settings.TELEGRAM_FLOOD_MAX_RETRIES):
+                    raise
+                logger.info(f"⏳ Telegram [{self.name}] повторит {method} после FloodWait {e.seconds}s")
+            finally:
+                await self._release()
+
+    async def _acquire(self, method: str, priority: int, tokens: float):
+        """Дождаться своей очереди: пауза FloodWait, свободный слот, приоритет и токены метода"""
+        cond = self._condition()
+        entry = [priority, next(self._seq), method, tokens]
+
+        async with cond:
+            self._waiters.append(entry)
+            try:
+                while True:
+                    now = time.time()
+                    timeout = None
+
+                    if self.paused_until > now:
+                        timeout = self.paused_until - now
+                    elif self._in_flight < self.max_concurrent:
+                        eligible = self._first_eligible()
+                        if eligible is entry:
+                            self.buckets[method].try_acquire(tokens)
+                            self._in_flight += 1
+                            return
+                        if eligible is None:
+                            # Ни у кого нет токенов - ждем пополнения своего bucket
+                            timeout = max(self.buckets[method].wait_time(tokens), 0.01)
+
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._waiters.remove(entry)
+                cond.notify_all()
+
+    def _first_eligible(self) -> Optional[List[Any]]:
+        """
+        Самый приоритетный ожидающий, у метода которого есть токены
+
+        Исчерпанный лимит одного метода не блокирует запросы других методов.
+        """
+        for waiter in sorted(self._waiters):
+            if self.buckets[waiter[2]].wait_time(waiter[3]) == 0:
+                return waiter
+        return None
+
+    async def _release(self):
+        cond = self._condition()
+        async with cond:
+            self._in_flight -= 1
+            cond.notify_all()
+
+    async def _register_flood_wait(self, method: str, seconds: int):
+        """FloodWait действует на весь аккаунт - ставим на паузу все запросы"""
+        self.flood_waits += 1
+        self.last_flood_wait = {
+            'method': method,
+            'seconds': seconds,
+            'at': time.time()
+        }
+        logger.warning(f"🌊 Telegram [{self.name}] FloodWait {seconds}s на {method} - все запросы на паузе")
+
+        cond = self._condition()
+        async with cond:
+            self.paused_until = max(self.paused_until, time.time() + seconds + 1)
+            cond.notify_all()
+
+    def is_paused(self) -> bool:
+        return self.paused_until > time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        """Состояние регулятора: пауза, очередь и счетчики запросов"""
+        waiting: Dict[int, int] = {}
+        for priority, *_ in self._waiters:
+            waiting[priority] = waiting.get(priority, 0) + 1
+
+        return {
+            'account': self.name,
+            'paused_for_seconds': round(max(0.0, self.paused_until - time.time()), 1),
+            'in_flight': self._in_flight,
+            'waiting_by_priority': waiting,
+            'requests': dict(self.requests),
+            'flood_waits': self.flood_waits,
+            'last_flood_wait': self.last_flood_wait
+        }
+
+
+# Один регулятор на аккаунт, даже если к нему обращаются несколько экземпляров сервиса
+_governors: Dict[str, TelegramGovernor] = {}
+
+
+def get_governor(account: str) -> TelegramGovernor:
+    """Регулятор запросов аккаунта (создается при первом обращении)"""
+    governor = _governors.get(account)
+    if governor is None:
+        governor = _governors[account] = TelegramGovernor(name=account)
+    return governor
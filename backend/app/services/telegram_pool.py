@@ -0,0 +1,230 @@
+# backend/app/services/telegram_pool.py
+import asyncio
+import bisect
+import hashlib
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from telethon.errors import (
+    AuthKeyDuplicatedError,
+    AuthKeyUnregisteredError,
+    FloodWaitError,
+    SessionRevokedError,
+    UserDeactivatedBanError,
+    UserDeactivatedError
+)
+
+from ..core.config import settings
+from .telegram_service import TelegramService
+
+logger = logging.getLogger(__name__)
+
+# Виртуальных узлов на аккаунт в кольце: равномернее распределение чатов
+RING_VNODES = 64
+
+# Подряд идущих ошибок, после которых аккаунт временно выводится из ротации
+MAX_CONSECUTIVE_ERRORS = 3
+
+STATE_HEALTHY = 'healthy'
+STATE_FLOOD_LIMITED = 'flood_limited'
+STATE_UNAUTHORIZED = 'unauthorized'
+STATE_FAILING = 'failing'
+
+_UNAUTHORIZED_ERRORS = (
+    AuthKeyDuplicatedError,
+    AuthKeyUnregisteredError,
+    SessionRevokedError,
+    UserDeactivatedBanError,
+    UserDeactivatedError
+)
+
+
+def _ring_hash(key: str) -> int:
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+
+def load_session_strings() -> List[str]:
+    """TELEGRAM_SESSION_STRING + TELEGRAM_SESSION_STRINGS (через запятую), без повторов"""
+    sessions = []
+    for session in [settings.TELEGRAM_SESSION_STRING, *(settings.TELEGRAM_SESSION_STRINGS or '').split(',')]:
+        session = (session or '').strip()
+        if session and session not in sessions:
+            sessions.append(session)
+    return sessions
+
+
+class TelegramSessionPool:
+    """
+    Пул Telegram-аккаунтов для чтения чатов мониторинга
+
+    Чаты распределяются по аккаунтам консистентным хэшированием chat_id:
+    добавление или удаление аккаунта переносит только его долю чатов.
+    У каждого аккаунта свой клиент, регулятор запросов и кэш peer'ов.
+    Если аккаунт упирается в FloodWait, потерял авторизацию или стабильно
+    падает, его чаты читает следующий аккаунт по кольцу.
+    """
+
+    def __init__(self, session_strings: Optional[List[str]] = None):
+        sessions = session_strings if session_strings is not None else load_session_strings()
+
+        # Без сессий остается один сервис - он сообщит о необходимости авторизации
+        self.services: Dict[str, TelegramService] = {}
+        for session in sessions or [None]:
+            service = TelegramService(session_string=session)
+            self.services[service._session_namespace()] = service
+
+        self.accounts = list(self.services)
+        self.primary = self.services[self.accounts[0]]
+
+        self.health: Dict[str, Dict[str, Any]] = {
+            account: {
+                'state': STATE_HEALTHY,
+                'consecutive_errors': 0,
+                'retry_at': 0.0,
+                'last_error': None,
+                'reads': 0,
+                'failovers_from': 0
+            }
+            for account in self.accounts
+        }
+
+        self._ring: List[Tuple[int, str]] = sorted(
+            (_ring_hash(f"{account}#{vnode}"), account)
+            for account in self.accounts
+            for vnode in range(RING_VNODES)
+        )
+        self._ring_keys = [point for point, _ in self._ring]
+
+        logger.info(f"👥 Telegram session pool: {len(self.accounts)} account(s)")
+
+    def preference_list(self, chat_id: str) -> List[str]:
+        """Аккаунты в порядке обхода кольца от позиции чата: первый - владелец шарда"""
+        start = bisect.bisect(self._ring_keys, _ring_hash(str(chat_id)))
+        order: List[str] = []
+        for offset in range(len(self._ring)):
+            account = self._ring[(start + offset) % len(self._ring)][1]
+            if account not in order:
+                order.append(account)
+                if len(order) == len(self.accounts):
+                    break
+        return order
+
+    def is_available(self, account: str) -> bool:
+        """Можно ли сейчас читать через аккаунт"""
+        if self.services[account].governor.is_paused():
+            return False
+        health = self.health[account]
+        return health['state'] == STATE_HEALTHY or health['retry_at'] <= time.time()
+
+    async def get_group_messages(self, group_id: str, **kwargs) -> List[Dict[str, Any]]:
+        """
+        Прочитать чат аккаунтом-владельцем шарда, при сбое - следующим по кольцу
+
+        Параметры те же, что у TelegramService.get_group_messages.
+        """
+        order = self.preference_list(group_id)
+        candidates = [account for account in order if self.is_available(account)] or order[:1]
+
+        for index, account in enumerate(candidates):
+            service = self.services[account]
+            try:
+                messages = await self._read_with(service, group_id, kwargs)
+                self._mark_success(account)
+                if account != order[0]:
+                    self.health[order[0]]['failovers_from'] += 1
+                return messages
+            except Exception as e:
+                self._mark_failure(account, e)
+                if index + 1 < len(candidates):
+                    logger.warning(f"🔀 Чат {group_id}: аккаунт {account} недоступен ({e}) - "
+                                   f"переключаемся на {candidates[index + 1]}")
+
+        return []
+
+    async def _read_with(self, service: TelegramService, group_id: str, kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Чтение через конкретный аккаунт
+
+        access_hash у каждого аккаунта свой: если аккаунт еще не видел чат по id,
+        резолвим его по username, известному другим аккаунтам пула.
+        """
+        try:
+            return await service.get_group_messages(group_id, raise_errors=True, **kwargs)
+        except ValueError:
+            # Telethon: "Could not find the input entity" - аккаунт не знает peer по id
+            username = await self._known_username(group_id)
+            if not username:
+                raise
+            await service.ensure_connected()
+            await service.get_peer('@' + username)
+            return await service.get_group_messages(group_id, raise_errors=True, **kwargs)
+
+    async def _known_username(self, chat_id: str) -> Optional[str]:
+        """username чата из кэша peer'ов любого аккаунта"""
+        for service in self.services.values():
+            if service.peer_cache is None:
+                continue
+            cached = await service.peer_cache.get(chat_id)
+            if cached and cached[0].get('username'):
+                return cached[0]['username']
+        return None
+
+    def _mark_success(self, account: str):
+        health = self.health[account]
+        health['reads'] += 1
+        health['consecutive_errors'] = 0
+        if health['state'] != STATE_HEALTHY:
+            logger.info(f"✅ Telegram аккаунт {account} снова в ротации")
+        health['state'] = STATE_HEALTHY
+
+    def _mark_failure(self, account: str, error: Exception):
+        """Классифицировать ошибку и при необходимости вывести аккаунт из ротации"""
+        health = self.health[account]
+        health['consecutive_errors'] += 1
+        health['last_error'] = str(error)
+        now = time.time()
+
+        if isinstance(error, FloodWaitError):
+            # Паузу держит регулятор аккаунта - is_available учитывает ее сам
+            health['state'] = STATE_FLOOD_LIMITED
+            health['retry_at'] = now + error.seconds
+        elif isinstance(error, _UNAUTHORIZED_ERRORS) or 'not authorized' in str(error):
+            health['state'] = STATE_UNAUTHORIZED
+            health['retry_at'] = now + settings.TELEGRAM_ACCOUNT_RETRY_SECONDS
+            logger.error(f"🔒 Telegram аккаунт {account} не авторизован - выведен из ротации")
+        elif health['consecutive_errors'] >= MAX_CONSECUTIVE_ERRORS:
+            health['state'] = STATE_FAILING
+            health['retry_at'] = now + settings.TELEGRAM_ACCOUNT_RETRY_SECONDS
+            logger.error(f"⚠️ Telegram аккаунт {account}: {health['consecutive_errors']} ошибок подряд - выведен из ротации")
+
+    async def connect(self):
+        """Подключить все аккаунты; неавторизованные сразу выводятся из ротации"""
+        results = await asyncio.gather(
+            *(service.ensure_connected() for service in self.services.values()),
+            return_exceptions=True
+        )
+        for account, result in zip(self.accounts, results):
+            if isinstance(result, Exception):
+                self._mark_failure(account, result)
+
+    async def warm_peer_caches(self):
+        for service in self.services.values():
+            await service.warm_peer_cache()
+
+    async def close(self):
+        for service in self.services.values():
+            await service.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Состояние аккаунтов: здоровье и регулятор запросов"""
+        now = time.time()
+        return {
+            account: {
+                **health,
+                'available': self.is_available(account),
+                'retry_in_seconds': round(max(0.0, health['retry_at'] - now), 1),
+                'governor': self.services[account].governor.stats()
+            }
+            for account, health in self.health.items()
+        }
@@ -1,35 +1,78 @@
 # backend/app/services/telegram_service.py - ОЧИЩЕННАЯ ВЕРСИЯ
 
 import asyncio
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
+import math
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timezone, timedelta
 
-from telethon import TelegramClient
-from telethon.types import User, Chat, Channel, Message
+from telethon import TelegramClient, events, utils
+from telethon.errors import FloodWaitError
+from telethon.types import User, Chat, Channel, Message, InputPeerChannel, InputPeerChat, InputPeerUser
 from telethon.sessions import StringSession
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.core.database import supabase_client
+from app.services.peer_cache import PeerCache, normalize_peer_key
+from app.services.telegram_governor import (
+    get_governor,
+    METHOD_READ, METHOD_RESOLVE, METHOD_ENTITY, METHOD_SEND, METHOD_PARTICIPANTS, METHOD_DEFAULT,
+    PRIORITY_MONITORING, PRIORITY_NOTIFICATIONS, PRIORITY_RESOLVE
+)
 
 logger = logging.getLogger(__name__)
 
+# Профили отправителей общие для всех чатов, шаблонов, циклов и экземпляров сервиса
+profile_cache = TTLCache(maxsize=settings.PROFILE_CACHE_SIZE, ttl=settings.PROFILE_CACHE_TTL_MINUTES * 60)
+
+# Откуда брались профили: из самого сообщения, из кэша или отдельным запросом
+profile_sources = {'message': 0, 'cache': 0, 'rpc': 0}
+
+# Неудачный запрос профиля кэшируем ненадолго, чтобы не повторять его на каждом сообщении
+FAILED_PROFILE_TTL_SECONDS = 300
+
 class TelegramService:
-    def __init__(self):
-        """Инициализация Telegram сервиса"""
+    def __init__(self, session_string: Optional[str] = None):
+        """
+        Инициализация Telegram сервиса
+        
+        Args:
+            session_string: сессия аккаунта (по умолчанию TELEGRAM_SESSION_STRING)
+        """
         self.api_id = settings.TELEGRAM_API_ID
         self.api_hash = settings.TELEGRAM_API_HASH
-        self.session_string = settings.TELEGRAM_SESSION_STRING
+        self.session_string = session_string or settings.TELEGRAM_SESSION_STRING
         
         # Инициализируем клиент с существующей сессией
         session = StringSession(self.session_string) if self.session_string else StringSession()
-        self.client = TelegramClient(session, self.api_id, self.api_hash)
+        # FloodWait не пересыпаем внутри Telethon - паузу держит регулятор запросов для всего аккаунта
+        self.client = TelegramClient(session, self.api_id, self.api_hash, flood_sleep_threshold=0)
         
         # Блокировка для безопасного доступа к клиенту
         self.client_lock = asyncio.Lock()
         
+        # Кэш peer'ов: chat_id / username -> input peer без повторного резолва.
+        # access_hash действителен только для своего аккаунта - namespace по сессии
+        self.peer_cache = PeerCache(self._session_namespace()) if settings.PEER_CACHE_ENABLED else None
+        
+        # Все запросы аккаунта идут через общий регулятор: лимиты методов, FloodWait, приоритеты
+        self.governor = get_governor(self._session_namespace())
+        
         logger.info("🚀 Telegram Service initialized")
     
+    def _session_namespace(self) -> str:
+        """Идентификатор аккаунта для кэша peer'ов (хэш строки сессии)"""
+        if not self.session_string:
+            return 'default'
+        return hashlib.sha1(self.session_string.encode('utf-8')).hexdigest()[:12]
+    
+    async def warm_peer_cache(self):
+        """Подгрузить кэш peer'ов в память при старте приложения"""
+        if self.peer_cache is not None:
+            await self.peer_cache.warm()
+    
     async def start(self) -> bool:
         """Запуск Telegram клиента"""
         try:
@@ -56,6 +99,9 @@ class TelegramService:
                 logger.info("✅ Telegram client disconnected")
         except Exception as e:
             logger.error(f"❌ Error closing Telegram client: {e}")
+        
+        if self.peer_cache is not None:
+            self.peer_cache.close()
     
     async def is_connected(self) -> bool:
         """Проверка подключения к Telegram"""
@@ -89,7 +135,7 @@ class TelegramService:
         """Проверка состояния Telegram сервиса"""
         try:
             await self.ensure_connected()
-            me = await self.client.get_me()
+            me = await self.governor.run(METHOD_DEFAULT, self.client.get_me)
             
             return {
                 "status": "healthy",
@@ -105,28 +151,37 @@ class TelegramService:
                 "error": str(e)
             }
     
-    async def execute_telegram_operation(self, operation):
+    async def execute_telegram_operation(
+        self,
+        operation,
+        method: str = METHOD_DEFAULT,
+        priority: int = PRIORITY_MONITORING
+    ):
         """
         Безопасное выполнение операций с Telegram
         
         Этот метод гарантирует, что:
         1. Клиент подключен
-        2. Операция выполняется эксклюзивно (без конкурентного доступа)
-        3. Операция повторяется при временных проблемах
+        2. Операция проходит через регулятор запросов аккаунта (лимит метода, приоритет, пауза FloodWait)
+        3. Операция повторяется при временных проблемах (FloodWait повторяет сам регулятор)
         """
         max_retries = 3
         retry_delay = 2
         
         for attempt in range(max_retries):
             try:
-                # Используем блокировку для предотвращения конкурентного доступа
+                # Блокировка - чтобы параллельные вызовы не подключались одновременно
                 async with self.client_lock:
                     # Проверяем и восстанавливаем соединение
                     await self.ensure_connected()
+                
+                # Выполняем операцию
+                return await self.governor.run(method, operation, priority)
                     
-                    # Выполняем операцию
-                    return await operation()
-                    
+            except FloodWaitError:
+                # Регулятор уже выдержал паузу и исчерпал повторы
+                raise
+                
             except asyncio.CancelledError:
                 logger.warning(f"Operation was cancelled (attempt {attempt+1}/{max_retries})")
                 if attempt == max_retries - 1:
@@ -153,24 +208,31 @@ class TelegramService:
         include_replies: bool = True,
         get_users: bool = True,
         save_to_db: bool = False,
-        days_back: Optional[int] = None
+        days_back: Optional[int] = None,
+        min_id: Optional[int] = None,
+        priority: int = PRIORITY_MONITORING,
+        raise_errors: bool = False
     ) -> List[Dict[str, Any]]:
         """
         БЕЗОПАСНЫЙ метод получения сообщений из группы
         Основан на рабочей версии + логика offset_date
+        
+        min_id - вернуть только сообщения новее этого id (курсор мониторинга).
+            Чтение идет вперед от курсора (от старых к новым): если новых сообщений
+            больше limit, возвращаются ближайшие к курсору, остальные - следующим вызовом
+        raise_errors - пробросить ошибку вместо пустого списка (пулу аккаунтов нужен failover)
         """
         try:
             # Подключаемся если нужно
             await self.ensure_connected()
             
-            # Получаем entity напрямую
+            # Peer из кэша - без get_entity на каждый вызов
             try:
-                if str(group_id).lstrip('-').isdigit():
-                    entity = await self.client.get_entity(int(group_id))
-                else:
-                    entity = await self.client.get_entity(group_id)
+                peer, peer_entry = await self.get_peer(group_id, priority=priority)
             except Exception as e:
                 logger.error(f"Failed to get entity for group {group_id}: {e}")
+                if raise_errors:
+                    raise
                 return []
             
             # Логика фильтрации по времени
@@ -186,70 +248,47 @@ class TelegramService:
             else:
                 logger.info(f"Getting last {limit} messages (no date filtering)")
             
+            # С курсором читаем вперед: при reverse=False iter_messages отдает самые новые
+            # limit сообщений, и все между курсором и ними терялись бы
+            reverse = bool(min_id)
+            
+            async def read_history():
+                raw_messages = []
+                async for message in self.client.iter_messages(peer, limit=limit, min_id=min_id or 0, reverse=reverse):
+                    # КЛЮЧЕВАЯ ЛОГИКА: Если сообщение старше cutoff_date - останавливаемся
+                    if cutoff_date is not None and message.date < cutoff_date:
+                        if reverse:
+                            continue
+                        logger.info(f"Reached message from {message.date.strftime('%Y-%m-%d %H:%M:%S')} - stopping")
+                        break
+                    raw_messages.append(message)
+                return raw_messages
+            
+            # Чтение истории - через регулятор; iter_messages берет до 100 сообщений за запрос
+            raw_messages = await self.governor.run(
+                METHOD_READ, read_history, priority,
+                tokens=max(1, math.ceil(limit / 100)),
+                retry_on_flood=not raise_errors
+            )
+            
             messages = []
-            users_cache = {}
             
-            # Основной цикл получения сообщений
-            async for message in self.client.iter_messages(entity, limit=limit):
-                # КЛЮЧЕВАЯ ЛОГИКА: Если сообщение старше cutoff_date - останавливаемся
-                if cutoff_date is not None and message.date < cutoff_date:
-                    logger.info(f"Reached message from {message.date.strftime('%Y-%m-%d %H:%M:%S')} - stopping")
-                    break
-                
+            # Профили отправителей добираем уже после чтения, чтобы не держать слот регулятора
+            for message in raw_messages:
                 # Обрабатываем сообщение
                 try:
-                    msg_data = {
-                        'message_id': str(message.id),
-                        'text': message.text or "",
-                        'date': message.date.isoformat(),
-                        'sender_id': str(message.sender_id) if message.sender_id else None,
-                        'is_reply': message.is_reply,
-                        'reply_to_message_id': str(message.reply_to_msg_id) if message.reply_to_msg_id else None,
-                        'forward_from': None,
-                        'media_type': None,
-                        'edit_date': message.edit_date.isoformat() if message.edit_date else None,
-                        'views': getattr(message, 'views', None),
-                        'user_info': None,
-                        'chat_id': str(group_id),
-                        'chat_title': getattr(entity, 'title', f'Chat {group_id}') 
-                    }
+                    user_info = None
                     
                     # Добавляем информацию о пользователе если запрошено
                     if get_users and message.sender_id:
-                        user_id_str = str(message.sender_id)
-                        
-                        # Проверяем кэш пользователей
-                        if user_id_str not in users_cache:
-                            try:
-                                user = await self.client.get_entity(message.sender_id)
-                                users_cache[user_id_str] = {
-                                    'telegram_id': str(user.id),
-                                    'username': user.username,
-                                    'first_name': user.first_name,
-                                    'last_name': user.last_name,
-                                    'is_bot': getattr(user, 'bot', False)
-                                }
-                            except:
-                                users_cache[user_id_str] = {
-                                    'telegram_id': user_id_str,
-                                    'username': None,
-                                    'first_name': None,
-                                    'last_name': None,
-                                    'is_bot': False
-                                }
-                        
-                        msg_data['user_info'] = users_cache[user_id_str]
+                        user_info = await self.get_sender_info(message)
                     
-                    # Определяем тип медиа
-                    if message.media:
-                        if hasattr(message.media, 'photo'):
-                            msg_data['media_type'] = 'photo'
-                        elif hasattr(message.media, 'video'):
-                            msg_data['media_type'] = 'video'
-                        elif hasattr(message.media, 'document'):
-                            msg_data['media_type'] = 'document'
-                        else:
-                            msg_data['media_type'] = 'other'
+                    msg_data = self.message_to_dict(
+                        message,
+                        chat_id=str(group_id),
+                        chat_title=peer_entry.get('title') or f'Chat {group_id}',
+                        user_info=user_info
+                    )
                     
                     messages.append(msg_data)
                     
@@ -267,18 +306,216 @@ class TelegramService:
             
         except Exception as e:
             logger.error(f"Error getting messages from group {group_id}: {e}")
+            if raise_errors:
+                raise
             return []
     
+    async def get_peer(self, identifier, priority: int = PRIORITY_MONITORING) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Input peer и описание чата/пользователя по chat_id или username
+        
+        Сначала кэш peer'ов; устаревшая запись обновляется запросом по id
+        (дешевле ResolveUsername), а если он не удался - используется как есть.
+        Промах кэша - обычный get_entity с сохранением результата.
+        """
+        cached = await self.peer_cache.get(identifier) if self.peer_cache is not None else None
+        
+        if cached is not None:
+            entry, fresh = cached
+            input_peer = self._input_peer_from_entry(entry)
+            if fresh:
+                return input_peer, entry
+            try:
+                entity = await self.governor.run(METHOD_ENTITY, lambda: self.client.get_entity(input_peer), priority)
+                return input_peer, await self._remember_peer(entity, identifier)
+            except Exception as e:
+                logger.warning(f"Failed to refresh cached peer {identifier}, using stale entry: {e}")
+                return input_peer, entry
+        
+        if str(identifier).lstrip('-').isdigit():
+            target, method = int(identifier), METHOD_ENTITY
+        else:
+            target, method = identifier, METHOD_RESOLVE
+        entity = await self.governor.run(method, lambda: self.client.get_entity(target), priority)
+        return utils.get_input_peer(entity), await self._remember_peer(entity, identifier)
+    
+    async def _remember_peer(self, entity, identifier) -> Dict[str, Any]:
+        """Сохранить entity в кэш peer'ов под chat_id, username и исходным идентификатором"""
+        entry = self._peer_entry_from_entity(entity)
+        if self.peer_cache is not None:
+            username = entry.get('username')
+            # Ключ по id самой entity, а не chat_id после миграции - он указывает на другой peer
+            await self.peer_cache.set([identifier, utils.get_peer_id(entity), username and '@' + username], entry)
+        return entry
+    
+    def _peer_entry_from_entity(self, entity) -> Dict[str, Any]:
+        """Сериализуемое описание peer'а: все, что нужно для запросов без резолва"""
+        input_peer = utils.get_input_peer(entity)
+        
+        if isinstance(input_peer, InputPeerChannel):
+            peer_type, peer_id, access_hash = 'channel', input_peer.channel_id, input_peer.access_hash
+            # Для каналов и супергрупп нужен отрицательный ID с префиксом -100
+            chat_id = f"-100{entity.id}"
+        elif isinstance(input_peer, InputPeerChat):
+            peer_type, peer_id, access_hash = 'chat', input_peer.chat_id, None
+            # Для обычных групп просто отрицательный ID
+            chat_id = f"-{entity.id}"
+        else:
+            peer_type, peer_id, access_hash = 'user', input_peer.user_id, input_peer.access_hash
+            chat_id = str(entity.id)
+        
+        # Обработка миграции: группа мигрировала в супергруппу
+        if getattr(entity, 'migrated_to', None):
+            chat_id = f"-100{entity.migrated_to.channel_id}"
+        
+        return {
+            'peer_type': peer_type,
+            'peer_id': peer_id,
+            'access_hash': access_hash,
+            'chat_id': chat_id,
+            'title': getattr(entity, 'title', None) or getattr(entity, 'first_name', None),
+            'username': getattr(entity, 'username', None),
+            'entity_type': type(entity).__name__
+        }
+    
+    def _input_peer_from_entry(self, entry: Dict[str, Any]):
+        """Восстановить input peer из записи кэша"""
+        if entry['peer_type'] == 'channel':
+            return InputPeerChannel(entry['peer_id'], entry['access_hash'])
+        if entry['peer_type'] == 'chat':
+            return InputPeerChat(entry['peer_id'])
+        return InputPeerUser(entry['peer_id'], entry['access_hash'])
+    
+    def message_to_dict(
+        self,
+        message: Message,
+        chat_id: str,
+        chat_title: str,
+        user_info: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Преобразовать сообщение Telethon в словарь, общий для polling и realtime"""
+        msg_data = {
+            'message_id': str(message.id),
+            'text': message.text or "",
+            'date': message.date.isoformat(),
+            'sender_id': str(message.sender_id) if message.sender_id else None,
+            'is_reply': message.is_reply,
+            'reply_to_message_id': str(message.reply_to_msg_id) if message.reply_to_msg_id else None,
+            'forward_from': None,
+            'media_type': None,
+            'edit_date': message.edit_date.isoformat() if message.edit_date else None,
+            'views': getattr(message, 'views', None),
+            'user_info': user_info,
+            'chat_id': chat_id,
+            'chat_title': chat_title
+        }
+        
+        # Определяем тип медиа
+        if message.media:
+            if hasattr(message.media, 'photo'):
+                msg_data['media_type'] = 'photo'
+            elif hasattr(message.media, 'video'):
+                msg_data['media_type'] = 'video'
+            elif hasattr(message.media, 'document'):
+                msg_data['media_type'] = 'document'
+            else:
+                msg_data['media_type'] = 'other'
+        
+        return msg_data
+    
+    async def get_sender_info(self, message: Message) -> Dict[str, Any]:
+        """
+        Профиль отправителя сообщения
+        
+        iter_messages обычно уже заполняет message.sender - он бесплатный и
+        самый свежий. Иначе берем профиль из общего кэша и только при промахе
+        делаем get_entity.
+        """
+        user_id_str = str(message.sender_id)
+        
+        sender = getattr(message, 'sender', None)
+        if sender is not None:
+            profile_sources['message'] += 1
+            user_info = self._user_info_from_entity(sender)
+            profile_cache.set(user_id_str, user_info)
+            return user_info
+        
+        user_info = profile_cache.get(user_id_str)
+        if user_info is not None:
+            profile_sources['cache'] += 1
+            return user_info
+        
+        profile_sources['rpc'] += 1
+        try:
+            user = await self.governor.run(METHOD_ENTITY, lambda: self.client.get_entity(message.sender_id))
+            user_info = self._user_info_from_entity(user)
+            profile_cache.set(user_id_str, user_info)
+        except Exception:
+            user_info = self._user_info_from_entity(None, user_id_str)
+            profile_cache.set(user_id_str, user_info, ttl=FAILED_PROFILE_TTL_SECONDS)
+        return user_info
+    
+    def get_profile_cache_stats(self) -> Dict[str, Any]:
+        """Размер кэша профилей и доля профилей, полученных без запроса к Telegram"""
+        total = sum(profile_sources.values())
+        return {
+            'cache': profile_cache.stats(),
+            'sources': dict(profile_sources),
+            'rpc_avoided_rate': round(1 - profile_sources['rpc'] / total, 3) if total else None
+        }
+    
+    def _user_info_from_entity(self, user, fallback_id: Optional[str] = None) -> Dict[str, Any]:
+        """Собрать user_info из entity отправителя"""
+        if user is None:
+            return {
+                'telegram_id': fallback_id,
+                'username': None,
+                'first_name': None,
+                'last_name': None,
+                'is_bot': False
+            }
+        return {
+            'telegram_id': str(user.id),
+            'username': getattr(user, 'username', None),
+            'first_name': getattr(user, 'first_name', None),
+            'last_name': getattr(user, 'last_name', None),
+            'is_bot': getattr(user, 'bot', False)
+        }
+    
+    def add_new_message_handler(self, callback) -> None:
+        """Подписаться на новые сообщения (push-режим вместо опроса)"""
+        self.client.add_event_handler(callback, events.NewMessage())
+        logger.info("📡 NewMessage handler registered")
+    
+    def remove_new_message_handler(self, callback) -> None:
+        """Отписаться от новых сообщений"""
+        self.client.remove_event_handler(callback, events.NewMessage)
+        logger.info("📴 NewMessage handler removed")
+    
     async def get_entity(self, identifier):
-        """Получить entity по идентификатору"""
+        """
+        Получить peer по идентификатору для запросов Telethon
+
+        Возвращает input peer из кэша peer'ов: при промахе get_peer сам
+        резолвит и кэширует entity, повторный get_entity не нужен.
+        """
         await self.ensure_connected()
-        return await self.client.get_entity(identifier)
+        peer, _ = await self.get_peer(identifier)
+        return peer
     
     async def get_group_info(self, link_or_username: str) -> Dict[str, Any]:
         """Получить информацию о группе/канале"""
+        # Peer резолвим до операции: внутри слота регулятора нельзя делать другие его запросы
+        try:
+            await self.ensure_connected()
+            peer, _ = await self.get_peer(link_or_username)
+        except Exception as e:
+            logger.error(f"Error getting entity {link_or_username}: {e}")
+            return {}
+        
         async def operation():
             try:
-                entity = await self.client.get_entity(link_or_username)
+                entity = await self.client.get_entity(peer)
                 
                 if isinstance(entity, (Chat, Channel)):
                     group_info = {
@@ -301,24 +538,33 @@ class TelegramService:
                 
                 logger.warning(f"Entity {link_or_username} is not a group or channel")
                 return {}
+            except FloodWaitError:
+                # FloodWait обрабатывает регулятор
+                raise
             except Exception as e:
                 logger.error(f"Error getting entity {link_or_username}: {e}")
                 return {}
                 
         try:
-            return await self.execute_telegram_operation(operation)
+            return await self.execute_telegram_operation(operation, method=METHOD_ENTITY)
         except Exception as e:
             logger.error(f"Error retrieving group info for {link_or_username}: {e}")
             return {}
     
     async def get_moderators(self, group_id: str, save_to_db: bool = False) -> List[Dict[str, Any]]:
         """Получить модераторов группы"""
+        try:
+            await self.ensure_connected()
+            peer, _ = await self.get_peer(group_id)
+        except Exception as e:
+            logger.error(f"Error getting moderators for group {group_id}: {e}")
+            return []
+        
         async def operation():
             try:
-                entity = await self.client.get_entity(group_id)
                 moderators = []
                 
-                async for participant in self.client.iter_participants(entity, filter=None):
+                async for participant in self.client.iter_participants(peer, filter=None):
                     if hasattr(participant.participant, 'admin_rights') and participant.participant.admin_rights:
                         moderator = {
                             'telegram_id': str(participant.id),
@@ -333,12 +579,14 @@ class TelegramService:
                 logger.info(f"Found {len(moderators)} moderators in group {group_id}")
                 return moderators
                 
+            except FloodWaitError:
+                raise
             except Exception as e:
                 logger.error(f"Error getting moderators for group {group_id}: {e}")
                 return []
         
         try:
-            return await self.execute_telegram_operation(operation)
+            return await self.execute_telegram_operation(operation, method=METHOD_PARTICIPANTS)
         except Exception as e:
             logger.error(f"Error retrieving moderators for group {group_id}: {e}")
             return []
@@ -351,8 +599,13 @@ class TelegramService:
             # Убираем @ если есть
             clean_username = username.lstrip('@')
             
-            # Отправляем сообщение
-            await self.client.send_message(clean_username, message)
+            # Отправляем сообщение (username резолвится один раз и берется из кэша)
+            peer, _ = await self.get_peer(clean_username, priority=PRIORITY_NOTIFICATIONS)
+            await self.governor.run(
+                METHOD_SEND,
+                lambda: self.client.send_message(peer, message),
+                PRIORITY_NOTIFICATIONS
+            )
             logger.info(f"✅ Sent notification to {username}")
             return True
             
@@ -360,12 +613,13 @@ class TelegramService:
             logger.error(f"❌ Failed to send message to {username}: {e}")
             return False
         
-    async def resolve_chat_link(self, chat_link: str) -> Optional[str]:
+    async def resolve_chat_link(self, chat_link: str, priority: int = PRIORITY_RESOLVE) -> Optional[str]:
         """
         Конвертировать ссылку t.me в chat_id
         
         Args:
             chat_link: Ссылка вида https://t.me/username или @username
+            priority: приоритет в очереди регулятора (массовый резолв - самый низкий)
             
         Returns:
             chat_id как строка или None если не удалось найти
@@ -381,29 +635,12 @@ class TelegramService:
                 
             logger.info(f"Resolving username: {username}")
             
-            # Получаем entity через Telethon
-            entity = await self.client.get_entity(username)
-            
-            # Получаем chat_id
-            if isinstance(entity, Channel):
-            # Для каналов и супергрупп нужен отрицательный ID с префиксом -100
-                chat_id = f"-100{entity.id}"
-            elif isinstance(entity, Chat):
-                # Для обычных групп просто отрицательный ID
-                chat_id = f"-{entity.id}"
-            else:
-                # Для пользователей оставляем как есть
-                chat_id = str(entity.id)
-
-            # Обработка миграции
-            if hasattr(entity, 'migrated_to') and entity.migrated_to:
-                # Если канал мигрировал в супергруппу
-                chat_id = f"-100{entity.migrated_to.channel_id}"
-
-            print(f"🔗 RESOLVE: Entity type: {type(entity).__name__}, Raw ID: {entity.id}, Chat ID: {chat_id}")
+            # Получаем peer через кэш - ResolveUsername только при промахе
+            _, entry = await self.get_peer(username, priority=priority)
+            chat_id = entry['chat_id']
 
+            logger.debug(f"🔗 RESOLVE: Entity type: {entry['entity_type']}, Raw ID: {entry['peer_id']}, Chat ID: {chat_id}")
 
-                
             logger.info(f"✅ Resolved {username} -> {chat_id}")
             return chat_id
             
@@ -441,36 +678,48 @@ class TelegramService:
             logger.error(f"Error extracting username from {chat_link}: {e}")
             return None
 
-    async def resolve_multiple_chat_links(self, chat_links: List[str]) -> Dict[str, Optional[str]]:
+    def normalize_chat_link(self, chat_link: str) -> Optional[str]:
+        """Ключ ссылки для дедупликации: '@username' в нижнем регистре или числовой chat_id"""
+        username = self._extract_username_from_link(chat_link or '')
+        return normalize_peer_key(username) if username else None
+
+    async def get_cached_chat_id(self, chat_link: str) -> Optional[str]:
+        """chat_id из кэша peer'ов без запросов к Telegram (устаревшая запись тоже подходит)"""
+        key = self.normalize_chat_link(chat_link)
+        if key is None or self.peer_cache is None:
+            return None
+        cached = await self.peer_cache.get(key)
+        return cached[0].get('chat_id') if cached else None
+
+    async def resolve_multiple_chat_links(
+        self,
+        chat_links: List[str],
+        priority: int = PRIORITY_RESOLVE
+    ) -> Dict[str, Optional[str]]:
         """
         Конвертировать несколько ссылок одновременно
         
+        Ссылки на один и тот же чат (@Name, t.me/name, https://t.me/name/)
+        резолвятся один раз. Попадания кэша peer'ов отдаются сразу, остальные
+        запросы идут параллельно - темп и FloodWait держит регулятор аккаунта.
+        
         Returns:
             Словарь {ссылка: chat_id или None}
         """
-        results = {}
+        keys = {link: self.normalize_chat_link(link) for link in chat_links}
+        unique_keys = list(dict.fromkeys(key for key in keys.values() if key))
         
-        print(f"🔗 RESOLVING {len(chat_links)} chat links:")
-        for i, link in enumerate(chat_links):
-            print(f"  {i+1}. '{link}'")
+        logger.info(f"🔗 Resolving {len(chat_links)} chat links ({len(unique_keys)} unique)")
         
-        for link in chat_links:
-            chat_id = await self.resolve_chat_link(link)
-            results[link] = chat_id
-            print(f"🔗 RESULT: '{link}' -> {chat_id}")
-            
-            # Небольшая пауза между запросами чтобы не нарваться на лимиты
-            await asyncio.sleep(0.5)
+        chat_ids = await asyncio.gather(*(self.resolve_chat_link(key, priority=priority) for key in unique_keys))
+        resolved = dict(zip(unique_keys, chat_ids))
         
-        return results
+        return {link: resolved.get(key) if key else None for link, key in keys.items()}
         
     def generate_session_string(self) -> str:
         """Получить строку сессии"""
         return self.client.session.save()
-    
 
-# Глобальный экземпляр сервиса
-telegram_service = TelegramService()
 
 
     
\ No newline at end of file
@@ -0,0 +1,152 @@
+# backend/app/services/verdict_cache.py
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from ..core.cache import TTLCache
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Как часто (в записях) чистить устаревшие и лишние строки SQLite
+_EVICTION_EVERY = 500
+
+
+def verdict_key(message_text: str, matched_keywords: List[str], template_id: Any, prompt_version: str) -> str:
+    """Ключ вердикта: хэш нормализованного текста, ключевых слов, шаблона и версии промпта"""
+    normalized_text = re.sub(r'\s+', ' ', (message_text or '').lower()).strip()
+    payload = json.dumps(
+        [normalized_text, sorted(k.lower() for k in matched_keywords), str(template_id), prompt_version],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class VerdictCache:
+    """
+    Кэш вердиктов ИИ по содержимому сообщения
+
+    Два уровня: in-memory LRU и локальный SQLite-файл (переживает рестарт).
+    Оба с TTL, SQLite дополнительно ограничен по числу строк.
+    Попадание в кэш означает, что запрос в OpenAI не нужен.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: Optional[int] = None,
+        memory_size: Optional[int] = None,
+        max_rows: Optional[int] = None
+    ):
+        self.path = path or settings.AI_VERDICT_CACHE_PATH
+        self.ttl_seconds = ttl_seconds or settings.AI_VERDICT_CACHE_TTL_HOURS * 3600
+        self.max_rows = max_rows or settings.AI_VERDICT_CACHE_MAX_ROWS
+        self.memory = TTLCache(maxsize=memory_size or settings.AI_VERDICT_CACHE_MEMORY_SIZE, ttl=self.ttl_seconds)
+
+        self.persistent_hits = 0
+        self.misses = 0
+        self._writes = 0
+
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._open_db()
+
+    def _open_db(self):
+        """Открыть SQLite; при ошибке кэш работает только в памяти"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS ai_verdicts ('
+                'key TEXT PRIMARY KEY, verdict TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS ai_verdicts_created_at ON ai_verdicts (created_at)')
+            self._db.commit()
+            logger.info(f"💾 AI verdict cache opened: {self.path}")
+        except Exception as e:
+            logger.error(f"Failed to open AI verdict cache {self.path}, using memory only: {e}")
+            self._db = None
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Вердикт {'is_client', 'reasoning'} или None"""
+        verdict = self.memory.get(key)
+        if verdict is not None:
+            return verdict
+
+        if self._db is not None:
+            verdict = await asyncio.to_thread(self._db_get, key)
+            if verdict is not None:
+                self.persistent_hits += 1
+                self.memory.set(key, verdict)
+                return verdict
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, verdict: Dict[str, Any]):
+        """Сохранить вердикт в оба уровня"""
+        verdict = {'is_client': verdict['is_client'], 'reasoning': verdict.get('reasoning', '')}
+        self.memory.set(key, verdict)
+
+        if self._db is not None:
+            await asyncio.to_thread(self._db_set, key, verdict)
+
+    def _db_get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT verdict FROM ai_verdicts WHERE key = ? AND created_at >= ?',
+                (key, time.time() - self.ttl_seconds)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _db_set(self, key: str, verdict: Dict[str, Any]):
+        try:
+            with self._lock:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO ai_verdicts (key, verdict, created_at) VALUES (?, ?, ?)',
+                    (key, json.dumps(verdict, ensure_ascii=False), time.time())
+                )
+                self._writes += 1
+                if self._writes % _EVICTION_EVERY == 0:
+                    self._evict()
+                self._db.commit()
+        except Exception as e:
+            logger.error(f"Error writing AI verdict cache: {e}")
+
+    def _evict(self):
+        """Удалить устаревшие записи и самые старые сверх лимита строк"""
+        self._db.execute('DELETE FROM ai_verdicts WHERE created_at < ?', (time.time() - self.ttl_seconds,))
+        self._db.execute(
+            'DELETE FROM ai_verdicts WHERE key IN ('
+            'SELECT key FROM ai_verdicts ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_rows,)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий по уровням"""
+        memory_stats = self.memory.stats()
+        hits = memory_stats['hits'] + self.persistent_hits
+        total = hits + self.misses
+        return {
+            'memory': memory_stats,
+            'persistent_enabled': self._db is not None,
+            'persistent_hits': self.persistent_hits,
+            'hits': hits,
+            'misses': self.misses,
+            'hit_rate': round(hits / total, 3) if total else None
+        }
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+            self._db = None
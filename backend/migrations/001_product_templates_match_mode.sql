@@ -0,0 +1,13 @@
+-- backend/migrations/001_product_templates_match_mode.sql
+-- Режим сопоставления ключевых слов шаблона (см. services/keyword_matcher.py).
+-- NULL - используется глобальная настройка KEYWORD_MATCH_MODE.
+
+ALTER TABLE product_templates
+    ADD COLUMN IF NOT EXISTS match_mode text;
+
+ALTER TABLE product_templates
+    DROP CONSTRAINT IF EXISTS product_templates_match_mode_check;
+
+ALTER TABLE product_templates
+    ADD CONSTRAINT product_templates_match_mode_check
+    CHECK (match_mode IS NULL OR match_mode IN ('substring', 'stem'));
@@ -0,0 +1,54 @@
+-- backend/migrations/002_potential_clients_unique_lead.sql
+-- Уникальный ключ клиента для пакетного upsert LeadWriter:
+--     (user_id, chat_id, message_id, product_template_id)
+--
+-- Старый код сохранял клиентов с message_id = 0 (брал несуществующее поле
+-- сообщения), поэтому перед созданием индекса:
+--   1. удаляем дубли - одно и то же сообщение, сохраненное несколько раз;
+--   2. заполняем message_id устаревших строк уникальным отрицательным
+--      значением (-id строки): настоящие id сообщений Telegram положительные
+--      и с ними не пересекаются.
+
+BEGIN;
+
+-- 1a. Устаревшие строки без message_id: дубль - тот же автор и текст
+--     в том же чате для того же шаблона
+WITH ranked AS (
+    SELECT id,
+           row_number() OVER (
+               PARTITION BY user_id, chat_id, product_template_id, author_id, message_text
+               -- Оставляем строку, с которой уже работали, иначе самую раннюю
+               ORDER BY (client_status IS DISTINCT FROM 'new') DESC, created_at, id
+           ) AS position
+    FROM potential_clients
+    WHERE message_id IS NULL OR message_id = 0
+)
+DELETE FROM potential_clients
+WHERE id IN (SELECT id FROM ranked WHERE position > 1);
+
+-- 1b. Строки с настоящим message_id: дубль - совпадение по будущему ключу
+WITH ranked AS (
+    SELECT id,
+           row_number() OVER (
+               PARTITION BY user_id, chat_id, message_id, product_template_id
+               ORDER BY (client_status IS DISTINCT FROM 'new') DESC, created_at, id
+           ) AS position
+    FROM potential_clients
+    WHERE message_id IS NOT NULL AND message_id <> 0
+)
+DELETE FROM potential_clients
+WHERE id IN (SELECT id FROM ranked WHERE position > 1);
+
+-- 2. Уникальный message_id для устаревших строк
+UPDATE potential_clients
+SET message_id = -id
+WHERE message_id IS NULL OR message_id = 0;
+
+ALTER TABLE potential_clients
+    ALTER COLUMN message_id SET NOT NULL;
+
+-- 3. Ключ конфликта upsert (LeadWriter.CONFLICT_KEY)
+CREATE UNIQUE INDEX IF NOT EXISTS potential_clients_lead_key
+    ON potential_clients (user_id, chat_id, message_id, product_template_id);
+
+COMMIT;
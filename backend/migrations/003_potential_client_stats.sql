@@ -0,0 +1,30 @@
+-- backend/migrations/003_potential_client_stats.sql
+-- Счетчики клиентов для дашборда одним запросом (services/lead_stats.py).
+-- created_at хранится без часового пояса во времени сервера - границы
+-- "сегодня" и "неделя" передает сервер.
+
+DROP FUNCTION IF EXISTS potential_client_stats(bigint, timestamp);
+
+CREATE OR REPLACE FUNCTION potential_client_stats(p_user_id bigint, p_since timestamp, p_today timestamp)
+RETURNS json
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'total_clients', count(*),
+        'clients_this_week', count(*) FILTER (WHERE created_at >= p_since),
+        'clients_today', count(*) FILTER (WHERE created_at >= p_today),
+        'status_distribution', json_build_object(
+            'new', count(*) FILTER (WHERE client_status = 'new'),
+            'contacted', count(*) FILTER (WHERE client_status = 'contacted'),
+            'ignored', count(*) FILTER (WHERE client_status = 'ignored'),
+            'converted', count(*) FILTER (WHERE client_status = 'converted')
+        )
+    )
+    FROM potential_clients
+    WHERE user_id = p_user_id;
+$$;
+
+-- Фильтр по пользователю и диапазону created_at
+CREATE INDEX IF NOT EXISTS potential_clients_user_created_at
+    ON potential_clients (user_id, created_at);
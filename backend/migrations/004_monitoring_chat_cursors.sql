@@ -0,0 +1,15 @@
+-- backend/migrations/004_monitoring_chat_cursors.sql
+-- Курсоры мониторинга (services/cursor_store.py): последний обработанный
+-- message_id чата для каждого шаблона, который за ним следит.
+
+CREATE TABLE IF NOT EXISTS monitoring_chat_cursors (
+    id bigserial PRIMARY KEY,
+    product_template_id bigint NOT NULL REFERENCES product_templates (id) ON DELETE CASCADE,
+    chat_id text NOT NULL,
+    last_message_id bigint NOT NULL,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- Ключ конфликта upsert (ChatCursorStore.flush) и выборка курсоров по шаблонам (load)
+CREATE UNIQUE INDEX IF NOT EXISTS monitoring_chat_cursors_template_chat
+    ON monitoring_chat_cursors (product_template_id, chat_id);
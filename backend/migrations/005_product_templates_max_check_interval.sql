@@ -0,0 +1,14 @@
+-- backend/migrations/005_product_templates_max_check_interval.sql
+-- Максимальный интервал опроса тихих чатов шаблона в минутах
+-- (см. ClientMonitoringService._poll_bounds).
+-- NULL - используется глобальная настройка CHAT_POLL_MAX_INTERVAL_MINUTES.
+
+ALTER TABLE product_templates
+    ADD COLUMN IF NOT EXISTS max_check_interval_minutes integer;
+
+ALTER TABLE product_templates
+    DROP CONSTRAINT IF EXISTS product_templates_max_check_interval_minutes_check;
+
+ALTER TABLE product_templates
+    ADD CONSTRAINT product_templates_max_check_interval_minutes_check
+    CHECK (max_check_interval_minutes IS NULL OR max_check_interval_minutes > 0);
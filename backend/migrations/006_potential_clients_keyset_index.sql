@@ -0,0 +1,12 @@
+-- backend/migrations/006_potential_clients_keyset_index.sql
+-- Keyset-пагинация /potential-clients: ORDER BY created_at DESC, id DESC
+-- с условием (created_at, id) < курсора. Индекс отдает страницу любой
+-- глубины одним проходом, включая разрыв ничьей по id.
+--
+-- Он же обслуживает фильтр по диапазону created_at в potential_client_stats,
+-- поэтому индекс (user_id, created_at) из 003 больше не нужен.
+
+CREATE INDEX IF NOT EXISTS potential_clients_user_created_at_id
+    ON potential_clients (user_id, created_at DESC, id DESC);
+
+DROP INDEX IF EXISTS potential_clients_user_created_at;
@@ -0,0 +1,26 @@
+-- backend/migrations/007_potential_clients_duplicate_count.sql
+-- Сколько почти-дубликатов сообщения клиента (тот же автор, похожий текст)
+-- отсечено до AI-анализа (services/near_duplicate_detector.py).
+-- Дубликаты, найденные после записи клиента, LeadWriter добавляет функцией
+-- potential_client_add_duplicates по ключу клиента.
+
+ALTER TABLE potential_clients
+    ADD COLUMN IF NOT EXISTS duplicate_count integer NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION potential_client_add_duplicates(
+    p_user_id bigint,
+    p_chat_id text,
+    p_message_id bigint,
+    p_product_template_id bigint,
+    p_count integer
+)
+RETURNS void
+LANGUAGE sql
+AS $$
+    UPDATE potential_clients
+    SET duplicate_count = duplicate_count + p_count
+    WHERE user_id = p_user_id
+      AND chat_id = p_chat_id
+      AND message_id = p_message_id
+      AND product_template_id = p_product_template_id;
+$$;
@@ -0,0 +1,19 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+# Настройки, без которых не импортируется app.core.config; внешние сервисы в тестах не вызываются
+os.environ.setdefault('API_V1_STR', '/api/v1')
+os.environ.setdefault('PROJECT_NAME', 'ClientHunter')
+os.environ.setdefault('SECRET_KEY', 'test')
+os.environ.setdefault('SUPABASE_URL', 'https://test.supabase.co')
+os.environ.setdefault('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.test')
+os.environ.setdefault('TELEGRAM_API_ID', '1')
+os.environ.setdefault('TELEGRAM_API_HASH', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+# Без файловых кэшей в рабочем каталоге
+os.environ.setdefault('PEER_CACHE_ENABLED', 'false')
+os.environ.setdefault('AI_VERDICT_CACHE_ENABLED', 'false')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,161 @@
+# backend/tests/test_ai_analysis.py
+import asyncio
+
+import httpx
+import openai
+
+from app.core.config import settings
+from app.services.ai_analysis_pool import estimate_tokens
+from app.services.client_monitoring_service import ClientMonitoringService
+from app.services.openai_service import OpenAIService
+from app.services.telegram_pool import TelegramSessionPool
+from app.services.verdict_cache import VerdictCache
+
+TEMPLATE = {'id': 1, 'name': 'Test', 'keywords': ['купить']}
+
+
+def rate_limit_error():
+    request = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+    return openai.RateLimitError('rate limited', response=httpx.Response(429, request=request), body=None)
+
+
+class FakeOpenAI(OpenAIService):
+    """Ответы пакета и одиночных запросов задаются списками (исключение - ошибка запроса)"""
+
+    def __init__(self, batch_responses, single_responses=()):
+        super().__init__()
+        self.batch_responses = list(batch_responses)
+        self.single_responses = list(single_responses)
+        self.batch_calls = 0
+        self.batch_sizes = []
+        self.single_calls = 0
+
+    async def analyze_potential_clients_batch(self, items, product_name):
+        self.batch_calls += 1
+        self.batch_sizes.append(len(items))
+        response = self.batch_responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return [
+            None if is_client is None else self._verdict(item, is_client)
+            for item, is_client in zip(items, response)
+        ]
+
+    async def analyze_single(self, item, product_name):
+        self.single_calls += 1
+        response = self.single_responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return self._verdict(item, response)
+
+    def _verdict(self, item, is_client):
+        return self._build_result(is_client, 'ДА' if is_client else 'НЕТ', item['matched_keywords'],
+                                  item['author_info'], item['chat_info'], item['message_text'])
+
+
+def candidates(count):
+    return [
+        {
+            'message': {'message_id': str(idx), 'text': f'хочу купить {idx}'},
+            'template': TEMPLATE,
+            'matched_keywords': ['купить'],
+            'chat_id': '-1001',
+            'chat_name': 'Test chat'
+        }
+        for idx in range(count)
+    ]
+
+
+def analyze(openai_service, count, verdict_cache=None, cached=()):
+    """
+    Прогнать пакет через AI-анализ
+
+    Returns:
+        (вердикты, оценки токенов запросов через AI-пул, сохраненные клиенты, расход AI)
+    """
+    saved = []
+
+    async def save(**kwargs):
+        saved.append(kwargs['message']['message_id'])
+        return {}
+
+    async def run():
+        monitoring = ClientMonitoringService(TelegramSessionPool(session_strings=[]), openai=openai_service)
+        monitoring._save_potential_client = save
+        monitoring.verdict_cache = verdict_cache
+        batch = candidates(count)
+        for idx, is_client in cached:
+            await verdict_cache.set(monitoring._verdict_key(batch[idx]), {'is_client': is_client, 'reasoning': ''})
+        submitted = []
+        submit = monitoring.ai_pool.submit
+
+        def counting_submit(job, estimated_tokens):
+            submitted.append(estimated_tokens)
+            return submit(job, estimated_tokens)
+
+        monitoring.ai_pool.submit = counting_submit
+        outcomes, usage = await monitoring._submit_candidates(1, {}, batch)
+        await monitoring.ai_pool.stop()
+        # Запросы через AI-пул и есть запросы к OpenAI
+        assert usage['ai_requests'] == len(submitted)
+        return outcomes, submitted, usage
+
+    outcomes, requests, usage = asyncio.run(run())
+    return outcomes, requests, saved, usage
+
+
+def test_rate_limited_batch_is_retried_whole_without_single_fallback(monkeypatch):
+    monkeypatch.setattr(settings, 'AI_RETRY_BASE_SECONDS', 0)
+    openai_service = FakeOpenAI([rate_limit_error(), [True, False, True]])
+
+    outcomes, requests, saved, usage = analyze(openai_service, 3)
+
+    assert outcomes == [True, False, True]
+    assert (openai_service.batch_calls, openai_service.single_calls, len(requests)) == (2, 0, 2)
+    assert usage == {'ai_requests': 2, 'ai_analyzed': 3, 'cache_hits': 0}
+    assert saved == ['0', '2']
+
+
+def test_missing_verdicts_go_back_through_the_pool_and_errors_are_not_clients():
+    openai_service = FakeOpenAI([[True, None, None]], [RuntimeError('bad request'), True])
+
+    outcomes, requests, saved, usage = analyze(openai_service, 3)
+
+    assert outcomes == [True, False, True]
+    assert (openai_service.single_calls, len(requests)) == (2, 3)
+    assert usage == {'ai_requests': 3, 'ai_analyzed': 2, 'cache_hits': 0}
+    assert saved == ['0', '2']
+
+
+def test_cache_hits_do_not_take_ai_pool_tokens(tmp_path):
+    openai_service = FakeOpenAI([[False]])
+    verdict_cache = VerdictCache(path=str(tmp_path / 'verdicts.sqlite3'))
+
+    outcomes, requests, saved, usage = analyze(openai_service, 3, verdict_cache, cached=[(0, True), (2, False)])
+    verdict_cache.close()
+
+    assert outcomes == [True, False, False]
+    assert usage == {'ai_requests': 1, 'ai_analyzed': 1, 'cache_hits': 2}
+    assert openai_service.batch_sizes == [1]
+    assert requests == [estimate_tokens(candidates(3)[1]['message']['text'])]
+    assert saved == ['0']
+
+
+def test_candidates_without_verdict_are_retried_next_cycle(monkeypatch):
+    monkeypatch.setattr(settings, 'AI_MAX_RETRIES', 0)
+    openai_service = FakeOpenAI([rate_limit_error(), [True, False]])
+
+    async def run():
+        monitoring = ClientMonitoringService(TelegramSessionPool(session_strings=[]), openai=openai_service)
+        monitoring.verdict_cache = None
+        failed, _ = await monitoring._submit_candidates(1, {}, candidates(2))
+        deferred = monitoring._take_deferred_candidates(1, [TEMPLATE])
+        retried, _ = await monitoring._submit_candidates(1, {}, deferred[TEMPLATE['id']])
+        await monitoring.ai_pool.stop()
+        return failed, retried, monitoring._take_deferred_candidates(1, [TEMPLATE])
+
+    failed, retried, left = asyncio.run(run())
+
+    assert failed == [False, False]
+    assert retried == [True, False]
+    assert left == {}
@@ -0,0 +1,51 @@
+# backend/tests/test_chat_rate_tracker.py
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.services.chat_rate_tracker import ChatRateTracker
+
+
+def messages_at(ids_and_minutes_ago):
+    now = datetime.now(timezone.utc)
+    return [
+        {'message_id': str(message_id), 'date': (now - timedelta(minutes=minutes_ago)).isoformat()}
+        for message_id, minutes_ago in ids_and_minutes_ago
+    ]
+
+
+def poll_twice(chat_id, second_poll):
+    tracker = ChatRateTracker(half_life_minutes=60, target_messages=20)
+    tracker.observe(1, chat_id, messages_at([(100, 15)]), window_minutes=30)
+    # Второй опрос - через 10 минут после первого
+    tracker._chats[chat_id]['last_observed_at'] = time.time() - 600
+    tracker.observe(1, chat_id, messages_at(second_poll), window_minutes=10)
+    return tracker._chats[chat_id]['last_new_messages']
+
+
+def test_supergroup_counts_new_messages_by_id_growth():
+    # Часть сообщений не попала в выборку (limit) - прирост id их учитывает
+    assert poll_twice('-1001', [(140, 5), (150, 1)]) == 50
+
+
+def test_basic_group_counts_new_messages_by_date():
+    # В обычной группе id сквозные по аккаунту: скачок id - не сообщения этого чата
+    assert poll_twice('-42', [(5000, 5), (9000, 1), (90, 20)]) == 2
+
+
+def test_users_watching_the_same_chat_keep_their_own_poll_times():
+    """Опрос одного пользователя не делает чат "тихим" для другого и не сокращает его окно"""
+    chat_id = '-1001'
+    tracker = ChatRateTracker(half_life_minutes=60, target_messages=20)
+    tracker.observe(2, chat_id, messages_at([(100, 30)]), window_minutes=30)
+    tracker._readers[(2, chat_id)]['last_poll_at'] = time.time() - 1800
+    tracker._chats[chat_id]['last_observed_at'] = time.time() - 60
+
+    # Пользователь 1 только что прочитал тихий чат
+    tracker.observe(1, chat_id, messages_at([(100, 30)]), window_minutes=1)
+    assert not tracker.should_poll(1, chat_id, 5, 60)
+
+    # Пользователь 2 читает по своему расписанию, окно - с его прошлого чтения
+    assert tracker.should_poll(2, chat_id, 5, 20)
+    assert round(tracker.minutes_since_last_poll(2, chat_id)) == 30
+    assert tracker.minutes_since_last_poll(3, chat_id) is None
+    assert tracker.should_poll(3, chat_id, 5, 60)
@@ -0,0 +1,68 @@
+# backend/tests/test_keyword_matcher.py
+import random
+
+from app.services.keyword_matcher import KeywordMatcher, StemKeywordMatcher
+
+KEYWORDS = ['купить', 'куп', 'пить', 'ремонт квартиры', 'Ёлка', 'елка', 'iPhone', 'он', '']
+
+CORPUS = [
+    'Хочу КУПИТЬ ёлку к новому году',
+    'Где купить елку недорого?',
+    'ЁЛКА искусственная, самовывоз',
+    'Нужен РЕМОНТ КВАРТИРЫ под ключ',
+    'ремонт  квартиры',
+    'Продам айфон, почти новый IPHONE 13',
+    'пить',
+    'скупить оптом',
+    '',
+    'İstanbul, kupit',
+]
+
+
+def expected(keywords, text):
+    """Прежняя проверка по каждому ключевому слову"""
+    return [keyword for keyword in keywords if keyword.lower() in text.lower()] if text else []
+
+
+def test_overlapping_keywords_are_all_found():
+    matcher = KeywordMatcher(['купить', 'куп', 'пить', 'упи'])
+
+    assert matcher.find('скупить') == ['купить', 'куп', 'пить', 'упи']
+    assert matcher.find('куп пить') == ['куп', 'пить']
+
+
+def test_case_folding_and_template_order():
+    matcher = KeywordMatcher(['Ремонт', 'КВАРТИРА'])
+
+    assert matcher.find('квартира, РЕМОНТ') == ['Ремонт', 'КВАРТИРА']
+    assert matcher.find('Ремонт') == ['Ремонт']
+
+
+def test_yo_and_ye_stay_different_in_substring_mode():
+    matcher = KeywordMatcher(['ёлка'])
+
+    assert matcher.find('ЁЛКА') == ['ёлка']
+    assert matcher.find('елка') == []
+
+    # В режиме основ стеммер приводит ё к е
+    assert StemKeywordMatcher(['ёлка']).find('купил елку') == ['ёлка']
+
+
+def test_multi_word_phrase_keeps_spacing():
+    matcher = KeywordMatcher(['ремонт квартиры'])
+
+    assert matcher.find('Нужен ремонт квартиры') == ['ремонт квартиры']
+    assert matcher.find('ремонт  квартиры') == []
+    assert matcher.find('квартиры ремонт') == []
+
+
+def test_matches_plain_substring_check_on_corpus():
+    rng = random.Random(42)
+    alphabet = 'купитьёелкаон ЁЛКАIiРЕМОНТ'
+    corpus = CORPUS + [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 40))) for _ in range(500)]
+    keyword_sets = [KEYWORDS, KEYWORDS[:3], ['a'], []]
+
+    for keywords in keyword_sets:
+        matcher = KeywordMatcher(keywords)
+        for text in corpus:
+            assert matcher.find(text) == expected(keywords, text), (keywords, text)
@@ -0,0 +1,41 @@
+# backend/tests/test_lead_events.py
+import asyncio
+
+from app.services.lead_events import LeadEventBroker
+
+
+def subscribe(broker, last_event_id):
+    async def run():
+        async with broker.subscribe(1, last_event_id) as subscription:
+            return subscription
+    return asyncio.run(run())
+
+
+def test_last_event_id_from_before_restart_gets_resync():
+    old_broker = LeadEventBroker(buffer_size=10, queue_size=10)
+    old_broker.publish([{'user_id': 1, 'id': 1}])
+    last_event_id = old_broker._last_id
+
+    broker = LeadEventBroker(buffer_size=10, queue_size=10)
+    broker._start_id = last_event_id + 1000
+    broker._last_id = broker._start_id
+    broker.publish([{'user_id': 1, 'id': 2}])
+    subscription = subscribe(broker, last_event_id)
+
+    assert subscription.gap
+    assert [row['id'] for _, row in subscription.replay] == [2]
+
+    # После resync браузер переподключается уже с его id - повторного resync нет
+    assert not subscribe(broker, subscription.resync_id).gap
+
+
+def test_reconnect_within_buffer_replays_without_resync():
+    broker = LeadEventBroker(buffer_size=10, queue_size=10)
+    broker.publish([{'user_id': 1, 'id': 1}])
+    last_event_id = broker._last_id
+    broker.publish([{'user_id': 1, 'id': 2}])
+
+    subscription = subscribe(broker, last_event_id)
+
+    assert not subscription.gap
+    assert [row['id'] for _, row in subscription.replay] == [2]
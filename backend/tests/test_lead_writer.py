@@ -0,0 +1,89 @@
+# backend/tests/test_lead_writer.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import lead_writer as lead_writer_module
+from app.services.lead_writer import LeadWriter
+
+
+class FakeTable:
+    """upsert с ignore_duplicates: возвращает только строки, которых еще нет в таблице"""
+
+    def __init__(self, existing=(), failures=0):
+        self.rows = {LeadWriter.row_key(row): row for row in existing}
+        self.failures = failures
+
+    def table(self, name):
+        return self
+
+    def upsert(self, batch, on_conflict, ignore_duplicates):
+        return batch
+
+    async def execute(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('database unavailable')
+        inserted = []
+        for row in batch:
+            key = LeadWriter.row_key(row)
+            if key not in self.rows:
+                self.rows[key] = row
+                inserted.append(dict(row, id=len(self.rows)))
+        return SimpleNamespace(data=inserted)
+
+
+def lead(message_id, **overrides):
+    return dict({'user_id': 1, 'chat_id': '-1001', 'message_id': message_id, 'product_template_id': 7}, **overrides)
+
+
+def write(monkeypatch, table, rows):
+    """Поставить строки в LeadWriter и сбросить; вернуть строки, для которых вызван on_inserted"""
+    monkeypatch.setattr(lead_writer_module, 'supabase_client', table)
+    monkeypatch.setattr(lead_writer_module, 'db_execute', table.execute)
+    notified = []
+
+    async def run():
+        writer = LeadWriter(batch_size=10, flush_seconds=60, max_retries=0)
+        for row in rows:
+            writer.add(row, on_inserted=notified.append)
+        await writer.flush()
+        failed = list(notified)
+        await writer.flush()
+        await writer.stop()
+        return failed
+
+    after_first_flush = asyncio.run(run())
+    return after_first_flush, [row['message_id'] for row in notified]
+
+
+def test_on_inserted_runs_only_for_new_rows(monkeypatch):
+    table = FakeTable(existing=[lead(1)])
+
+    _, notified = write(monkeypatch, table, [lead(1), lead(2), lead(2)])
+
+    # Клиент уже был в БД, повтор в буфере - уведомление одно и только о новом
+    assert notified == [2]
+
+
+def test_on_inserted_waits_for_successful_write(monkeypatch):
+    table = FakeTable(failures=1)
+
+    after_first_flush, notified = write(monkeypatch, table, [lead(1)])
+
+    assert after_first_flush == []
+    assert notified == [1]
+
+
+def test_row_without_conflict_key_column_is_rejected(monkeypatch):
+    with pytest.raises(ValueError):
+        LeadWriter.row_key(lead(None))
+
+    async def run():
+        writer = LeadWriter(batch_size=10, flush_seconds=60)
+        with pytest.raises(ValueError):
+            writer.add(lead(1, chat_id=None))
+        return writer.pending()
+
+    assert asyncio.run(run()) == 0
@@ -0,0 +1,37 @@
+# backend/tests/test_match_stats.py
+import asyncio
+
+from app.services.client_monitoring_service import ClientMonitoringService
+from app.services.telegram_pool import TelegramSessionPool
+
+CHAT_ID = '-1001'
+
+
+def test_shadow_counters_track_the_other_match_mode():
+    """Шаблон в режиме substring: теневые счетчики показывают, что совпало бы в режиме stem"""
+    template = {'id': 1, 'name': 'Test', 'keywords': ['купить'], 'match_mode': 'substring'}
+    messages = [
+        {'message_id': '1', 'text': 'хочу купить доллары'},  # оба режима
+        {'message_id': '2', 'text': 'купил бы доллары'},     # только stem
+        {'message_id': '3', 'text': 'распокупить'}           # только substring
+    ]
+
+    async def no_save(**kwargs):
+        return None
+
+    async def run():
+        monitoring = ClientMonitoringService(TelegramSessionPool(session_strings=[]))
+        monitoring._save_potential_client = no_save
+        _, candidates = monitoring._match_template_messages(template, template['keywords'], CHAT_ID, messages)
+        for candidate, is_client in zip(candidates, (True, False)):
+            await monitoring._handle_ai_result(1, {}, candidate, {'is_client': is_client, 'reasoning': ''})
+        return monitoring.get_match_stats()['1']
+
+    stats = asyncio.run(run())
+
+    assert stats['substring']['keyword_matches'] == 2
+    assert stats['substring']['precision'] == 0.5
+    assert stats['stem']['keyword_matches'] == 0
+    assert stats['stem']['shadow_matches'] == 2
+    assert stats['stem']['shadow_unjudged'] == 1
+    assert stats['stem']['shadow_precision'] == 1.0
@@ -0,0 +1,235 @@
+# backend/tests/test_monitoring_cursor.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.services.client_monitoring_service import ClientMonitoringService
+from app.services.telegram_pool import TelegramSessionPool
+
+CHAT_ID = '-1001'
+CURSOR = 1000
+
+
+class FakeTelegramClient:
+    """Семантика iter_messages Telegram: min_id, limit и порядок по reverse"""
+
+    def __init__(self, message_ids):
+        now = datetime.now(timezone.utc)
+        self.messages = [
+            SimpleNamespace(
+                id=message_id, text=f'message {message_id}',
+                date=now - timedelta(seconds=max(message_ids) - message_id),
+                sender_id=None, is_reply=False, reply_to_msg_id=None,
+                edit_date=None, views=None, media=None
+            )
+            for message_id in message_ids
+        ]
+
+    async def iter_messages(self, peer, limit=None, min_id=0, reverse=False):
+        selected = sorted((m for m in self.messages if m.id > min_id), key=lambda m: m.id, reverse=not reverse)
+        for message in selected[:limit]:
+            yield message
+
+
+def make_pool(message_ids):
+    pool = TelegramSessionPool(session_strings=[])
+    service = pool.primary
+    service.client = FakeTelegramClient(message_ids)
+
+    async def ensure_connected():
+        return True
+
+    async def get_peer(identifier, priority=0):
+        return None, {'title': 'Test chat'}
+
+    service.ensure_connected = ensure_connected
+    service.get_peer = get_peer
+    return pool
+
+
+def test_read_after_cursor_returns_oldest_messages_first():
+    async def read():
+        pool = make_pool(range(CURSOR - 10, CURSOR + 251))
+        return await pool.get_group_messages(CHAT_ID, limit=100, min_id=CURSOR)
+
+    messages = asyncio.run(read())
+
+    assert [int(m['message_id']) for m in messages] == list(range(CURSOR + 1, CURSOR + 101))
+
+
+def test_busy_chat_loses_no_messages_after_cursor():
+    """Новых сообщений больше limit: следующие циклы дочитывают их без пропусков"""
+    new_ids = list(range(CURSOR + 1, CURSOR + 251))
+    processed = []
+
+    def match(template, keywords, chat_id, messages):
+        processed.extend(int(m['message_id']) for m in messages)
+        return {'messages': len(messages)}, []
+
+    async def no_db(*args, **kwargs):
+        return None
+
+    template = {
+        'id': 1, 'name': 'Test', 'keywords': ['test'], 'chat_ids': [CHAT_ID],
+        'lookback_minutes': 60, 'check_interval_minutes': 5
+    }
+
+    async def run_cycles():
+        monitoring = ClientMonitoringService(make_pool(range(CURSOR - 10, CURSOR + 251)))
+        monitoring.chat_rates = None
+        monitoring.duplicate_detector = None
+        monitoring.cursor_store.load = no_db
+        monitoring.cursor_store.flush = no_db
+        monitoring.cursor_store.advance(1, CHAT_ID, CURSOR)
+        monitoring._match_template_messages = match
+
+        for _ in range(4):
+            await monitoring.search_and_analyze(1, {}, templates=[template])
+        return monitoring.cursor_store.get(1, CHAT_ID)
+
+    cursor = asyncio.run(run_cycles())
+
+    assert processed == new_ids
+    assert cursor == new_ids[-1]
+
+
+def test_realtime_cursor_advances_only_along_contiguous_ids():
+    """Курсор не перепрыгивает пропущенное событие - его дочитывает опрос"""
+    async def receive_events():
+        monitoring = ClientMonitoringService(make_pool([]))
+        monitoring.cursor_store.advance(1, CHAT_ID, CURSOR)
+        cursors = []
+        for message_id in (CURSOR + 1, CURSOR + 3, CURSOR + 4, CURSOR + 2):
+            monitoring._advance_realtime_cursor(1, CHAT_ID, message_id)
+            cursors.append(monitoring.cursor_store.get(1, CHAT_ID))
+        return cursors
+
+    cursors = asyncio.run(receive_events())
+
+    assert cursors == [CURSOR + 1, CURSOR + 1, CURSOR + 1, CURSOR + 4]
+
+
+def test_template_without_cursor_sees_messages_from_skipped_polls():
+    """Окно шаблона без курсора расширяется до времени с прошлого опроса чата"""
+    now = datetime.now(timezone.utc)
+    messages = [
+        {'message_id': '1', 'date': (now - timedelta(minutes=40)).isoformat()},
+        {'message_id': '2', 'date': (now - timedelta(minutes=20)).isoformat()},
+        {'message_id': '3', 'date': (now - timedelta(minutes=2)).isoformat()}
+    ]
+
+    async def select():
+        monitoring = ClientMonitoringService(make_pool([]))
+        return monitoring._select_messages_for_template({'id': 1, 'lookback_minutes': 5}, CHAT_ID, messages, 31)
+
+    selected = asyncio.run(select())
+
+    assert [m['message_id'] for m in selected] == ['2', '3']
+
+
+def test_template_without_cursor_does_not_cut_reads_of_templates_with_cursor():
+    """Шаблон без курсора читается окном отдельно - шаблон с курсором читает вперед от него"""
+    processed = {}
+
+    def match(template, keywords, chat_id, messages):
+        processed.setdefault(template['id'], []).extend(int(m['message_id']) for m in messages)
+        return {'messages': len(messages)}, []
+
+    async def no_db(*args, **kwargs):
+        return None
+
+    templates = [
+        {
+            'id': template_id, 'name': 'Test', 'keywords': ['test'], 'chat_ids': [CHAT_ID],
+            'lookback_minutes': 60, 'check_interval_minutes': 5
+        }
+        for template_id in (1, 2)
+    ]
+
+    async def run_cycle():
+        monitoring = ClientMonitoringService(make_pool(range(CURSOR - 10, CURSOR + 251)))
+        monitoring.chat_rates = None
+        monitoring.duplicate_detector = None
+        monitoring.cursor_store.load = no_db
+        monitoring.cursor_store.flush = no_db
+        monitoring.cursor_store.advance(1, CHAT_ID, CURSOR)
+        monitoring._match_template_messages = match
+        await monitoring.search_and_analyze(1, {}, templates=templates)
+
+    asyncio.run(run_cycle())
+
+    assert processed[1] == list(range(CURSOR + 1, CURSOR + 101))
+    assert sorted(processed[2]) == list(range(CURSOR + 151, CURSOR + 251))
+
+
+def test_saved_cursor_stays_before_messages_without_verdict():
+    """Позиция чтения идет дальше, а в БД курсор - перед сообщением, ждущим вердикта AI"""
+    async def no_db(*args, **kwargs):
+        return None
+
+    async def failed_ai(user_id, settings, candidates):
+        return [monitoring._defer_candidate(user_id, c) or False for c in candidates], monitoring._new_ai_usage()
+
+    template = {
+        'id': 1, 'name': 'Test', 'keywords': ['message'], 'chat_ids': [CHAT_ID],
+        'lookback_minutes': 60, 'check_interval_minutes': 5
+    }
+    monitoring = ClientMonitoringService(make_pool(range(CURSOR - 10, CURSOR + 6)))
+    monitoring.chat_rates = None
+    monitoring.duplicate_detector = None
+    monitoring.cursor_store.load = no_db
+    monitoring.cursor_store.advance(1, CHAT_ID, CURSOR)
+    monitoring._analyze_candidates_with_ai = failed_ai
+    saved = []
+
+    async def flush():
+        saved.append(monitoring.cursor_store.saved_value(1, CHAT_ID))
+
+    monitoring.cursor_store.flush = flush
+
+    async def run_cycle():
+        await monitoring.search_and_analyze(1, {}, templates=[template])
+        await monitoring.ai_pool.stop()
+
+    asyncio.run(run_cycle())
+
+    assert monitoring.cursor_store.get(1, CHAT_ID) == CURSOR + 5
+    assert saved[-1] == CURSOR
+
+    # Вердикт получен - сохраняемый курсор догоняет позицию чтения
+    for candidate in monitoring._take_deferred_candidates(1, [template])[1]:
+        monitoring._release_cursor(candidate)
+    assert monitoring.cursor_store.saved_value(1, CHAT_ID) == CURSOR + 5
+
+
+def test_second_user_reads_a_chat_just_polled_by_the_first():
+    """Адаптивный опрос ведется по (user_id, chat_id): чат не пропускается из-за чужого опроса"""
+    read_by = []
+
+    def match(template, keywords, chat_id, messages):
+        read_by.append(template['user_id'])
+        return {'messages': len(messages)}, []
+
+    async def no_db(*args, **kwargs):
+        return None
+
+    def template(user_id):
+        return {
+            'id': user_id, 'user_id': user_id, 'name': 'Test', 'keywords': ['test'], 'chat_ids': [CHAT_ID],
+            'lookback_minutes': 60, 'check_interval_minutes': 5, 'max_check_interval_minutes': 60
+        }
+
+    async def run_cycles():
+        monitoring = ClientMonitoringService(make_pool(range(CURSOR - 10, CURSOR + 1)))
+        monitoring.duplicate_detector = None
+        monitoring.cursor_store.load = no_db
+        monitoring.cursor_store.flush = no_db
+        monitoring._match_template_messages = match
+        # Чат тихий: для одного пользователя следующий опрос - через час
+        await monitoring.search_and_analyze(1, {}, templates=[template(1)])
+        await monitoring.search_and_analyze(1, {}, templates=[template(1)])
+        await monitoring.search_and_analyze(2, {}, templates=[template(2)])
+
+    asyncio.run(run_cycles())
+
+    assert read_by == [1, 2]
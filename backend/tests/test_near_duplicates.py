@@ -0,0 +1,75 @@
+# backend/tests/test_near_duplicates.py
+import asyncio
+
+from app.services.client_monitoring_service import ClientMonitoringService
+from app.services.near_duplicate_detector import NearDuplicateDetector
+from app.services.telegram_pool import TelegramSessionPool
+
+TEMPLATE = {'id': 1, 'name': 'Test', 'keywords': ['куплю']}
+
+SPAM = 'Срочно куплю доллары наличными по хорошему курсу в центре Москвы, пишите в личку'
+# Та же рассылка с другой пунктуацией и эмодзи
+SPAM_COPY = 'Срочно куплю доллары наличными по хорошему курсу в центре Москвы!!! пишите в личку 🔥'
+
+
+def candidate(message_id, sender_id, text):
+    return {
+        'message': {'message_id': str(message_id), 'sender_id': sender_id, 'text': text},
+        'template': TEMPLATE,
+        'matched_keywords': ['куплю'],
+        'chat_id': '-1001',
+        'chat_name': 'Test chat'
+    }
+
+
+def test_copy_from_the_same_sender_is_a_duplicate():
+    detector = NearDuplicateDetector(max_distance=3, window=100, min_tokens=4, max_age_hours=24)
+
+    assert detector.check(1, SPAM, {'chat_id': '-1001', 'message_id': 1, 'sender_id': 7}) is None
+    original = detector.check(1, SPAM_COPY, {'chat_id': '-1002', 'message_id': 5, 'sender_id': 7})
+
+    assert original['message_id'] == 1
+
+
+def test_similar_requests_from_different_senders_are_kept():
+    detector = NearDuplicateDetector(max_distance=3, window=100, min_tokens=4, max_age_hours=24)
+
+    assert detector.check(1, 'ищу 2-комн квартиру в аренду недорого без посредников',
+                          {'chat_id': '-1001', 'message_id': 1, 'sender_id': 7}) is None
+    assert detector.check(1, 'ищу 1-комн квартиру в аренду недорого без посредников',
+                          {'chat_id': '-1001', 'message_id': 2, 'sender_id': 8}) is None
+
+
+def test_old_messages_are_not_duplicate_originals():
+    detector = NearDuplicateDetector(max_distance=3, window=100, min_tokens=4, max_age_hours=24)
+    detector.check(1, SPAM, {'chat_id': '-1001', 'message_id': 1, 'sender_id': 7})
+    index = detector._indices['1']
+    next(iter(index._entries.values()))['added_at'] -= 25 * 3600
+
+    assert detector.check(1, SPAM_COPY, {'chat_id': '-1001', 'message_id': 2, 'sender_id': 7}) is None
+    assert len(index) == 1
+
+
+def test_suppressed_copies_are_counted_on_the_original_lead():
+    async def run():
+        monitoring = ClientMonitoringService(TelegramSessionPool(session_strings=[]))
+        monitoring.duplicate_detector = NearDuplicateDetector(max_distance=3, window=100, min_tokens=4, max_age_hours=24)
+
+        first = monitoring._filter_near_duplicates([candidate(1, 7, SPAM), candidate(2, 8, SPAM)])
+        # Копия до вердикта AI по исходному сообщению
+        assert monitoring._filter_near_duplicates([candidate(3, 7, SPAM_COPY)]) == []
+
+        lead = await monitoring._save_potential_client(
+            user_id=1, message=first[0]['message'], template=TEMPLATE, matched_keywords=['куплю'],
+            ai_result={}, chat_id='-1001', chat_name='Test chat', duplicate_info=first[0]['duplicate_info']
+        )
+        # Копия после постановки клиента в очередь записи
+        assert monitoring._filter_near_duplicates([candidate(4, 7, SPAM_COPY)]) == []
+
+        monitoring.lead_writer._task.cancel()
+        return first, lead
+
+    first, lead = asyncio.run(run())
+
+    assert [c['message']['message_id'] for c in first] == ['1', '2']
+    assert lead['duplicate_count'] == 2
@@ -0,0 +1,26 @@
+# backend/tests/test_peer_cache.py
+import asyncio
+
+from app.services.peer_cache import PeerCache
+
+ENTRY = {'peer_type': 'channel', 'peer_id': 1, 'access_hash': 2, 'chat_id': '-1001', 'title': 'Chat'}
+
+
+def test_entry_evicted_from_memory_is_read_back_from_sqlite(tmp_path):
+    async def run():
+        cache = PeerCache('account', path=str(tmp_path / 'peers.sqlite3'), memory_size=1)
+        await cache.set(['-1001'], ENTRY)
+        # Вторая запись вытесняет первую из памяти размером в одну запись
+        await cache.set(['-1002'], {**ENTRY, 'chat_id': '-1002'})
+        evicted_in_memory = cache.memory.get('-1001')
+        result = await cache.get('-1001')
+        in_memory_again = cache.memory.get('-1001') is not None
+        cache.close()
+        return evicted_in_memory, result, in_memory_again, cache.persistent_hits
+
+    evicted_in_memory, result, in_memory_again, persistent_hits = asyncio.run(run())
+
+    assert evicted_in_memory is None
+    assert result == (ENTRY, True)
+    assert in_memory_again
+    assert persistent_hits == 1
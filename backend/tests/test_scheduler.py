@@ -0,0 +1,122 @@
+# backend/tests/test_scheduler.py
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from app.services.scheduler_service import SchedulerService
+
+
+class FakeMonitoring:
+    """Запоминает запуски циклов: (user_id, id шаблонов)"""
+
+    def __init__(self):
+        self.runs = []
+        self.ran = asyncio.Event()
+
+    async def search_and_analyze(self, user_id, user_settings, templates):
+        self.runs.append((user_id, [template['id'] for template in templates]))
+        self.ran.set()
+
+
+def scheduler_with(users, templates):
+    scheduler = SchedulerService(FakeMonitoring())
+    scheduler.running = True
+    scheduler._active_users = {user['user_id']: user for user in users}
+    scheduler._active_templates = {(t['user_id'], str(t['id'])): t for t in templates}
+
+    scheduler._update_last_monitoring_check = lambda user_id: asyncio.sleep(0)
+    return scheduler
+
+
+def test_due_templates_start_in_deadline_order_and_stale_entries_are_skipped():
+    async def run():
+        scheduler = scheduler_with(
+            users=[{'user_id': 1}, {'user_id': 2}],
+            templates=[{'id': 'a', 'user_id': 1}, {'id': 'b', 'user_id': 2}, {'id': 'c', 'user_id': 1}]
+        )
+        now = time.time()
+        scheduler._schedule_template((1, 'a'), now - 5)
+        scheduler._schedule_template((1, 'c'), now + 100)
+        scheduler._schedule_template((2, 'b'), now - 10)
+        # Перенос оставляет в куче устаревшую запись
+        scheduler._schedule_template((1, 'c'), now - 1)
+        scheduler._schedule_template((1, 'a'), now + 50)
+
+        scheduler._dispatch_due_templates()
+        await asyncio.gather(*scheduler.user_tasks.values())
+
+        assert scheduler.monitoring_service.runs == [(2, ['b']), (1, ['c'])]
+        # Отработавшие шаблоны снова в расписании, отложенный 'a' - ближайший
+        assert scheduler._schedule[0][1:] == (1, 'a')
+        assert set(scheduler._due_at) == {(1, 'a'), (1, 'c'), (2, 'b')}
+
+    asyncio.run(run())
+
+
+def test_settings_change_reschedules_without_waiting_for_resync():
+    async def run():
+        user = {'user_id': 1, 'last_monitoring_check': datetime.now(timezone.utc).isoformat()}
+        template = {'id': 'a', 'user_id': 1, 'check_interval_minutes': 60}
+        scheduler = SchedulerService(FakeMonitoring())
+
+        async def active_users():
+            return [user]
+
+        async def active_templates(user_ids):
+            return [dict(template)]
+
+        scheduler._get_active_monitoring_users = active_users
+        scheduler._get_active_templates = active_templates
+        scheduler._update_last_monitoring_check = lambda user_id: asyncio.sleep(0)
+
+        await scheduler.start()
+        await asyncio.sleep(0.05)
+        assert scheduler.monitoring_service.runs == []
+        assert scheduler._due_at[(1, 'a')] > time.time() + 59 * 60
+
+        # Интервал сократили через API - шаблон уже просрочен
+        template['check_interval_minutes'] = 0.001
+        scheduler.notify_settings_changed(1)
+        await asyncio.wait_for(scheduler.monitoring_service.ran.wait(), timeout=1)
+
+        assert scheduler.monitoring_service.runs == [(1, ['a'])]
+
+        scheduler.running = False
+        scheduler.task.cancel()
+        await asyncio.gather(scheduler.task, *scheduler.user_tasks.values(), return_exceptions=True)
+
+    asyncio.run(run())
+
+
+def test_lookback_window_covers_time_since_last_run_up_to_the_limit(monkeypatch):
+    monkeypatch.setattr('app.core.config.settings.SCHEDULER_MAX_LOOKBACK_MINUTES', 120)
+    template = {'id': 'a', 'user_id': 1, 'lookback_minutes': 15}
+    scheduler = scheduler_with(users=[{'user_id': 1}], templates=[template])
+    key = (1, 'a')
+
+    # До первого запуска - окно шаблона
+    assert scheduler._get_lookback_minutes(key, template) == 15
+
+    scheduler._template_runs[key] = {'started_at': time.time() - 90}
+    assert scheduler._get_lookback_minutes(key, template) == 3
+
+    # После долгого перерыва окно не больше SCHEDULER_MAX_LOOKBACK_MINUTES
+    scheduler._template_runs[key] = {'started_at': time.time() - 3 * 24 * 3600}
+    assert scheduler._prepare_template_run(key, time.time())['lookback_minutes'] == 120
+
+
+def test_each_template_is_rescheduled_by_its_own_interval():
+    scheduler = scheduler_with(
+        users=[{'user_id': 1}],
+        templates=[
+            {'id': 'fast', 'user_id': 1, 'check_interval_minutes': 1},
+            {'id': 'slow', 'user_id': 1, 'check_interval_minutes': 30}
+        ]
+    )
+    scheduler._running_templates[1] = {'fast', 'slow'}
+
+    scheduler._on_user_cycle_done(1)
+
+    finished_at = scheduler._template_runs[(1, 'fast')]['finished_at']
+    assert scheduler._due_at[(1, 'fast')] == finished_at + 60
+    assert scheduler._due_at[(1, 'slow')] == finished_at + 30 * 60
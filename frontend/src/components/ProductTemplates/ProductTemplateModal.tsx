@@ -6,7 +6,7 @@ import {
   useCreateProductTemplate, 
   useUpdateProductTemplate 
 } from '../../hooks/useClientHunterApi';
-import { ProductTemplate } from '../../types/api';
+import { KeywordMatchMode, ProductTemplate } from '../../types/api';
 
 interface ProductTemplateModalProps {
   isOpen: boolean;
@@ -25,6 +25,8 @@ export const ProductTemplateModal: React.FC<ProductTemplateModalProps> = ({
     monitored_chats: [] as string[],
     check_interval_minutes: 5,
     lookback_minutes: 60,
+    match_mode: '' as KeywordMatchMode | '',
+    max_check_interval_minutes: '' as number | '',
     ai_prompt: ''
   });
   const [currentKeyword, setCurrentKeyword] = useState('');
@@ -55,6 +57,8 @@ export const ProductTemplateModal: React.FC<ProductTemplateModalProps> = ({
           monitored_chats: [...(template.monitored_chats || [])],
           check_interval_minutes: template.check_interval_minutes || 5,
           lookback_minutes: template.lookback_minutes || 60,
+          match_mode: template.match_mode || '',
+          max_check_interval_minutes: template.max_check_interval_minutes || '',
           ai_prompt: template.ai_prompt || defaultPrompt
         });
       } else {
@@ -64,6 +68,8 @@ export const ProductTemplateModal: React.FC<ProductTemplateModalProps> = ({
           monitored_chats: [],
           check_interval_minutes: 5,
           lookback_minutes: 60,
+          match_mode: '',
+          max_check_interval_minutes: '',
           ai_prompt: defaultPrompt
         });
       }
@@ -158,14 +164,21 @@ export const ProductTemplateModal: React.FC<ProductTemplateModalProps> = ({
       return;
     }
 
+    // Пустые режим и максимальный интервал - глобальные настройки сервера
+    const payload = {
+      ...formData,
+      match_mode: formData.match_mode || null,
+      max_check_interval_minutes: formData.max_check_interval_minutes || null
+    };
+
     try {
       if (isEditing && template) {
         await updateMutation.mutateAsync({
           id: template.id,
-          template: formData
+          template: payload
         });
       } else {
-        await createMutation.mutateAsync(formData);
+        await createMutation.mutateAsync(payload);
       }
       onClose();
     } catch (error) {
@@ -342,7 +355,7 @@ export const ProductTemplateModal: React.FC<ProductTemplateModalProps> = ({
             Параметры поиска
           </label>
           
-          <div className="grid grid-cols-3 gap-4">
+          <div className="grid grid-cols-2 gap-4">
             <div>
               <label className="block text-xs text-gray-400 mb-1">
                 Интервал проверки (мин)
@@ -370,7 +383,37 @@ export const ProductTemplateModal: React.FC<ProductTemplateModalProps> = ({
                 className="w-full px-3 py-2 bg-gray-700 border border-gray-600 rounded-lg text-gray-100 focus:outline-none focus:ring-2 focus:ring-green-500 focus:border-transparent"
                 disabled={isLoading}
               />
-            </div>            
+            </div>
+            <div>
+              <label className="block text-xs text-gray-400 mb-1">
+                Поиск ключевых слов
+              </label>
+              <select
+                value={formData.match_mode}
+                onChange={(e) => setFormData(prev => ({ ...prev, match_mode: e.target.value as KeywordMatchMode | '' }))}
+                className="w-full px-3 py-2 bg-gray-700 border border-gray-600 rounded-lg text-gray-100 focus:outline-none focus:ring-2 focus:ring-green-500 focus:border-transparent"
+                disabled={isLoading}
+              >
+                <option value="">По умолчанию</option>
+                <option value="substring">Подстрока</option>
+                <option value="stem">По основам слов</option>
+              </select>
+            </div>
+            <div>
+              <label className="block text-xs text-gray-400 mb-1">
+                Макс. интервал опроса тихих чатов (мин)
+              </label>
+              <input
+                type="number"
+                min="1"
+                max="1440"
+                placeholder="По умолчанию"
+                value={formData.max_check_interval_minutes}
+                onChange={(e) => setFormData(prev => ({ ...prev, max_check_interval_minutes: parseInt(e.target.value) || '' }))}
+                className="w-full px-3 py-2 bg-gray-700 border border-gray-600 rounded-lg text-gray-100 focus:outline-none focus:ring-2 focus:ring-green-500 focus:border-transparent"
+                disabled={isLoading}
+              />
+            </div>
           </div>
         </div>
 
@@ -1,7 +1,8 @@
 // frontend/src/hooks/useClientHunterApi.ts
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
-import { clientHunterApi } from '../services/clientHunterApi';
-import { ProductTemplateCreate, ProductTemplateUpdate, MonitoringSettingsUpdate, ClientStatusUpdate } from '../types/api';
+import { useEffect } from 'react';
+import { useQuery, useInfiniteQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import { clientHunterApi, LEAD_STREAM_URL } from '../services/clientHunterApi';
+import { ProductTemplateCreate, ProductTemplateUpdate, MonitoringSettingsUpdate, ClientStatusUpdate, PotentialClientsParams } from '../types/api';
 
 // ==================== QUERY KEYS ====================
 export const queryKeys = {
@@ -97,17 +98,23 @@ export const useStopMonitoring = () => {
 };
 
 // ==================== POTENTIAL CLIENTS ====================
-export const usePotentialClients = (params?: {
-  status?: string;
-  limit?: number;
-  offset?: number;
-}) => {
+export const usePotentialClients = (params?: PotentialClientsParams) => {
   return useQuery({
     queryKey: queryKeys.potentialClients(params),
     queryFn: () => clientHunterApi.getPotentialClients(params),
   });
 };
 
+// Бесконечный список: каждая следующая страница - по next_cursor предыдущей
+export const useInfinitePotentialClients = (params?: Omit<PotentialClientsParams, 'cursor' | 'offset'>) => {
+  return useInfiniteQuery({
+    queryKey: [...queryKeys.potentialClients(params), 'infinite'],
+    queryFn: ({ pageParam }) => clientHunterApi.getPotentialClients({ ...params, cursor: pageParam }),
+    initialPageParam: undefined as string | undefined,
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
+  });
+};
+
 export const useUpdateClientStatus = () => {
   const queryClient = useQueryClient();
   
@@ -116,6 +123,8 @@ export const useUpdateClientStatus = () => {
       clientHunterApi.updateClientStatus(clientId, statusUpdate),
     onSuccess: () => {
       queryClient.invalidateQueries({ queryKey: ['potentialClients'] });
+      // Конверсия на дашборде зависит от статусов
+      queryClient.invalidateQueries({ queryKey: queryKeys.dashboardStats });
     },
   });
 };
@@ -128,3 +137,32 @@ export const useDashboardStats = () => {
   });
 };
 
+// ==================== LIVE LEADS (SSE) ====================
+// Новые клиенты приходят через SSE: списки и статистика обновляются по событию, без опроса
+export const useLeadStream = (enabled: boolean = true) => {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    if (!enabled) return;
+
+    const source = new EventSource(LEAD_STREAM_URL);
+    let refreshTimer: ReturnType<typeof setTimeout> | undefined;
+
+    // Пачку клиентов из одного цикла мониторинга обрабатываем одним обновлением
+    const refresh = () => {
+      clearTimeout(refreshTimer);
+      refreshTimer = setTimeout(() => {
+        queryClient.invalidateQueries({ queryKey: ['potentialClients'] });
+        queryClient.invalidateQueries({ queryKey: queryKeys.dashboardStats });
+      }, 500);
+    };
+
+    source.addEventListener('lead', refresh);
+    source.addEventListener('resync', refresh);
+
+    return () => {
+      clearTimeout(refreshTimer);
+      source.close();
+    };
+  }, [enabled, queryClient]);
+};
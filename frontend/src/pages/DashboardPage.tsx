@@ -16,10 +16,11 @@ import {
 
 import { 
   useDashboardStats, 
-  usePotentialClients, 
+  useInfinitePotentialClients, 
   useProductTemplates,
   useUpdateClientStatus,
-  useMonitoringSettings
+  useMonitoringSettings,
+  useLeadStream
 } from '../hooks/useClientHunterApi';
 import { PotentialClient, ProductTemplate } from '../types/api';
 import { ProductTemplateModal } from '../components/ProductTemplates/ProductTemplateModal';
@@ -31,14 +32,25 @@ export const DashboardPage: React.FC = () => {
 
   // API хуки
   const { data: stats, isLoading: statsLoading, error: statsError } = useDashboardStats();
-  const { data: clientsResponse, isLoading: clientsLoading, error: clientsError } = usePotentialClients({ limit: 10 });
+  // Список клиентов подгружается страницами по курсору (кнопка "Показать еще")
+  const {
+    data: clientsPages,
+    isLoading: clientsLoading,
+    error: clientsError,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage
+  } = useInfinitePotentialClients({ limit: 10 });
   const { data: templatesResponse, isLoading: templatesLoading } = useProductTemplates();
   const { data: monitoringResponse } = useMonitoringSettings();
   
+  // Живые обновления новых клиентов
+  useLeadStream();
+  
   const updateClientStatusMutation = useUpdateClientStatus();
 
   // Обработка данных
-  const clients = clientsResponse?.data || [];
+  const clients = clientsPages?.pages.flatMap(page => page.data || []) || [];
   const templates = templatesResponse?.data || [];
   const monitoringSettings = monitoringResponse?.data;
   const isMonitoringActive = monitoringSettings?.is_active || false;
@@ -293,11 +305,18 @@ export const DashboardPage: React.FC = () => {
                 </div>
               )}
               
-              <div className="px-6 py-4 border-t border-gray-700">
-                <button className="w-full text-center text-green-400 hover:text-green-300 text-sm">
-                  Показать всех клиентов →
-                </button>
-              </div>
+              {hasNextPage && (
+                <div className="px-6 py-4 border-t border-gray-700">
+                  <button
+                    onClick={() => fetchNextPage()}
+                    disabled={isFetchingNextPage}
+                    className="w-full flex items-center justify-center text-green-400 hover:text-green-300 disabled:text-gray-500 text-sm"
+                  >
+                    {isFetchingNextPage && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+                    Показать еще клиентов →
+                  </button>
+                </div>
+              )}
             </div>
           </div>
 
@@ -8,11 +8,17 @@ import {
   PotentialClient,
   ClientStatusUpdate,
   ApiResponse,
+  PaginatedResponse,
+  PotentialClientsParams,
+  MonitoringStats,
   DashboardStats
 } from '../types/api';
 
 const API_BASE = 'http://localhost:8000/api/v1/client-monitoring';
 
+// SSE-поток новых клиентов (EventSource)
+export const LEAD_STREAM_URL = `${API_BASE}/leads/stream`;
+
 class ClientHunterApi {
   private async request<T>(
     endpoint: string, 
@@ -89,19 +95,21 @@ class ClientHunterApi {
 
   // ==================== POTENTIAL CLIENTS ====================
   
-  async getPotentialClients(params?: {
-    status?: string;
-    limit?: number;
-    offset?: number;
-  }): Promise<ApiResponse<PotentialClient[]>> {
+  async getPotentialClients(params?: PotentialClientsParams): Promise<PaginatedResponse<PotentialClient[]>> {
     const queryParams = new URLSearchParams();
     
     if (params?.status) queryParams.append('status', params.status);
     if (params?.limit) queryParams.append('limit', params.limit.toString());
     if (params?.offset) queryParams.append('offset', params.offset.toString());
+    if (params?.cursor) queryParams.append('cursor', params.cursor);
+    if (params?.fields) queryParams.append('fields', params.fields);
+    if (params?.template_id) queryParams.append('template_id', params.template_id.toString());
+    if (params?.chat_id) queryParams.append('chat_id', params.chat_id);
+    if (params?.date_from) queryParams.append('date_from', params.date_from);
+    if (params?.date_to) queryParams.append('date_to', params.date_to);
 
     const endpoint = `/potential-clients${queryParams.toString() ? `?${queryParams}` : ''}`;
-    return this.request<ApiResponse<PotentialClient[]>>(endpoint);
+    return this.request<PaginatedResponse<PotentialClient[]>>(endpoint);
   }
 
   async updateClientStatus(clientId: number, statusUpdate: ClientStatusUpdate): Promise<ApiResponse<PotentialClient>> {
@@ -113,14 +121,18 @@ class ClientHunterApi {
 
   // ==================== DASHBOARD STATS ====================
   
+  async getMonitoringStats(): Promise<ApiResponse<MonitoringStats>> {
+    return this.request<ApiResponse<MonitoringStats>>('/monitoring/stats');
+  }
+
   async getDashboardStats(): Promise<DashboardStats> {
-    // Получаем клиентов и шаблоны
-    const [clientsResponse, templatesResponse] = await Promise.all([
-      this.getPotentialClients({ limit: 1000 }),
+    // Счетчики клиентов считает сервер одним запросом, шаблоны - для числа чатов
+    const [statsResponse, templatesResponse] = await Promise.all([
+      this.getMonitoringStats(),
       this.getProductTemplates()
     ]);
     
-    const clients = clientsResponse.data || [];
+    const stats = statsResponse.data;
     const templates = templatesResponse.data || [];
 
     // Подсчитываем уникальные чаты из активных шаблонов
@@ -133,31 +145,15 @@ class ClientHunterApi {
         }
       });
 
-    const now = new Date();
-    const today = new Date(now.getFullYear(), now.getMonth(), now.getDate());
-    const weekAgo = new Date(today.getTime() - 7 * 24 * 60 * 60 * 1000);
-
-    const clientsToday = clients.filter(client => 
-      new Date(client.created_at) >= today
-    ).length;
-
-    const clientsWeek = clients.filter(client => 
-      new Date(client.created_at) >= weekAgo
-    ).length;
-
-    const convertedClients = clients.filter(client => 
-      client.client_status === 'converted'
-    ).length;
-
-    const conversionRate = clients.length > 0 
-      ? Math.round((convertedClients / clients.length) * 100 * 10) / 10 
+    const conversionRate = stats.total_clients > 0 
+      ? Math.round((stats.status_distribution.converted / stats.total_clients) * 100 * 10) / 10 
       : 0;
     
     return {
-      clientsToday,
-      clientsWeek,
-      totalClients: clients.length,
-      totalChats: uniqueChats.size, // ✅ Исправлено!
+      clientsToday: stats.clients_today,
+      clientsWeek: stats.clients_this_week,
+      totalClients: stats.total_clients,
+      totalChats: uniqueChats.size,
       conversionRate
     };
   }
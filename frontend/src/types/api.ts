@@ -1,4 +1,7 @@
 // frontend/src/types/api.ts
+// Режим сопоставления ключевых слов; null - глобальная настройка сервера
+export type KeywordMatchMode = 'substring' | 'stem';
+
 export interface ProductTemplate {
   id: number;
   user_id: number;
@@ -8,6 +11,8 @@ export interface ProductTemplate {
   chat_ids: string[];
   check_interval_minutes: number;
   lookback_minutes: number;
+  match_mode: KeywordMatchMode | null;
+  max_check_interval_minutes: number | null;
   ai_prompt: string;
   is_active: boolean;
   created_at: string;
@@ -20,6 +25,8 @@ export interface ProductTemplateCreate {
   monitored_chats?: string[];
   check_interval_minutes?: number;
   lookback_minutes?: number;
+  match_mode?: KeywordMatchMode | null;
+  max_check_interval_minutes?: number | null;
   ai_prompt: string;
 }
 
@@ -29,6 +36,8 @@ export interface ProductTemplateUpdate {
   monitored_chats?: string[];
   check_interval_minutes?: number;
   lookback_minutes?: number;
+  match_mode?: KeywordMatchMode | null;
+  max_check_interval_minutes?: number | null;
   ai_prompt?: string;
   is_active?: boolean;
 }
@@ -62,6 +71,7 @@ export interface PotentialClient {
   chat_id: string;
   message_id: number;
   client_status: 'new' | 'contacted' | 'ignored' | 'converted';
+  duplicate_count?: number;  // Почти-дубликаты сообщения того же автора, отсеченные до AI-анализа
   created_at: string;
   updated_at: string;
 }
@@ -76,6 +86,31 @@ export interface ApiResponse<T> {
   message?: string;
 }
 
+// Страница списка с keyset-пагинацией: next_cursor = null на последней странице
+export interface PaginatedResponse<T> extends ApiResponse<T> {
+  next_cursor?: string | null;
+}
+
+export interface PotentialClientsParams {
+  status?: string;
+  limit?: number;
+  offset?: number;
+  cursor?: string;
+  fields?: 'full' | 'list';  // list - без текста сообщения и объяснения ИИ
+  template_id?: number;
+  chat_id?: string;
+  date_from?: string;
+  date_to?: string;
+}
+
+// Ответ /monitoring/stats - счетчики считает сервер
+export interface MonitoringStats {
+  total_clients: number;
+  clients_this_week: number;
+  clients_today: number;
+  status_distribution: Record<'new' | 'contacted' | 'ignored' | 'converted', number>;
+}
+
 export interface DashboardStats {
   clientsToday: number;
   clientsWeek: number;